@@ -1,8 +1,11 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request, Depends
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import numpy as np
 import pandas as pd
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import asyncio
 import subprocess
 import uuid
 import os
@@ -10,10 +13,19 @@ import shutil
 import json
 import base64
 import logging
+import re
 import sys
 import tempfile
 import platform
 
+# Sandbox helpers live in sandbox.py so workers never import the API module
+from sandbox import (sandbox_pool, limit_resources, clean_for_json, deep_clean,  # noqa: F401
+                     load_dataframe, save_dataframe, Emit)
+from sessions import session_manager, SessionError
+from serialization import dumps_response
+from scheduler import scheduler
+import orjson
+
 from colorama import Fore, Style, init as colorama_init
 colorama_init(autoreset=True)
 
@@ -29,44 +41,313 @@ class CodeRequest(BaseModel):
 
 class CodeWithFileRequest(BaseModel):
     code: str
-    file_content: str  # Base64 encoded file content
-    file_name: str
+    file_content: Optional[str] = None  # Base64 encoded file content
+    file_ref: Optional[str] = None  # Name of a file in the shared store, used instead of file_content
+    file_name: Optional[str] = None
     timeout: int = 5
 
 class ModifyFileRequest(BaseModel):
     code: str
-    file_content: str  # Base64 encoded file content
-    file_name: str
+    file_content: Optional[str] = None  # Base64 encoded file content
+    file_ref: Optional[str] = None  # Name of a file in the shared store, used instead of file_content
+    file_name: Optional[str] = None
     timeout: int = 5
 
-def limit_resources():
-    pass
+class SessionCodeRequest(BaseModel):
+    code: str
+    timeout: int = 30
+
+MAX_TIMEOUT = int(os.environ.get("CES_MAX_TIMEOUT", "300"))
+# Comment lines sent on quiet streams so proxies do not drop the connection
+SSE_KEEPALIVE_SECONDS = 15
+# Content-addressed store shared with the orchestrator, mounted read-only. Files in it are named
+# <blake2b-160 hex digest><extension> and are read in place instead of being sent as base64.
+SHARED_STORE_DIR = os.environ.get("CES_SHARED_STORE_DIR", "")
+FILE_REF_PATTERN = re.compile(r"^[0-9a-f]{40}(\.[A-Za-z0-9]{1,10})?$")
+
+def _decode_file(file_content: str) -> bytes:
+    try:
+        return base64.b64decode(file_content, validate=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="file_content is not valid base64")
+
+def _resolve_file_ref(file_ref: str) -> str:
+    """Path of a file in the shared store; the sandbox reads it there without a copy."""
+    if not SHARED_STORE_DIR:
+        raise HTTPException(status_code=400, detail="file_ref is not supported: CES_SHARED_STORE_DIR is not set")
+    if not FILE_REF_PATTERN.match(file_ref):
+        raise HTTPException(status_code=400, detail=f"Invalid file_ref '{file_ref}'")
+    path = os.path.join(SHARED_STORE_DIR, file_ref)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"file_ref '{file_ref}' not found in the shared store")
+    return path
+
+def _file_source(file_content: Optional[str], file_ref: Optional[str]) -> dict:
+    """Keyword arguments for run_in_sandbox from a base64 payload or a shared store reference."""
+    if file_ref:
+        return {"shared_path": _resolve_file_ref(file_ref)}
+    if file_content is None:
+        raise HTTPException(status_code=422, detail="Either file_content or file_ref is required")
+    return {"file_bytes": _decode_file(file_content)}
+
+def _user_id(request: Request) -> str:
+    """Fair-queuing key: the caller's X-User-Id header, or its address."""
+    return request.headers.get("X-User-Id") or (request.client.host if request.client else "anonymous")
+
+def _check_timeout(timeout: int) -> int:
+    if timeout <= 0:
+        raise HTTPException(status_code=400, detail="timeout must be positive")
+    return min(timeout, MAX_TIMEOUT)
+
+def _json_response(reply: Dict[str, Any]) -> Response:
+    """Execution replies carry their result already encoded by the worker; splice it in without re-parsing."""
+    return Response(dumps_response(reply), media_type="application/json")
+
+def _sse(event: str, payload: bytes) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
 
-def clean_for_json(obj):
-    pass
+async def _event_stream(start: Dict[str, Any], run: Callable[[Emit], Awaitable[Dict[str, Any]]],
+                        cancel: Callable[[], Any]) -> AsyncIterator[bytes]:
+    """Server-sent events for one execution: `start`, then stdout/stderr/figure/progress as they happen,
+    then `result` with the usual response body. If the client disconnects first, `cancel` is called,
+    or the execution is dropped from the queue if it has not started.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(run(lambda event: loop.call_soon_threadsafe(queue.put_nowait, event)))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    finished = False
+    try:
+        yield _sse("start", orjson.dumps(start))
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            yield _sse(event.pop("event"), orjson.dumps(event))
+        finished = True
+        try:
+            yield _sse("result", dumps_response(task.result()))
+        except HTTPException as e:
+            yield _sse("error", orjson.dumps({"status_code": e.status_code, "detail": e.detail}))
+        except SessionError as e:
+            yield _sse("error", orjson.dumps({"status_code": e.status_code, "detail": str(e)}))
+    finally:
+        if not finished and not task.done():
+            logger.info(f"Stream client disconnected; cancelling {start}")
+            if not cancel():
+                task.cancel()
 
-def deep_clean(data):
-    pass
+def _streaming_response(events: AsyncIterator[bytes]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def run_in_sandbox(code: str, timeout: int, file_name: Optional[str] = None,
+                         file_bytes: Optional[bytes] = None, save_file: bool = False,
+                         emit: Optional[Emit] = None, execution_id: Optional[str] = None,
+                         shared_path: Optional[str] = None, user: str = "anonymous") -> dict:
+    """Run code on a warm sandbox worker inside a private working directory, once the scheduler admits it.
+
+    The input file is either written from `file_bytes` into the working directory or, with
+    `shared_path`, read in place from the read-only shared store. A saved file always goes
+    to the working directory.
+    """
+    timeout = _check_timeout(timeout)
+    async with scheduler.enqueue(user, timeout):
+        return await _run_admitted(code, timeout, file_name, file_bytes, save_file, emit, execution_id, shared_path)
+
+async def _run_admitted(code: str, timeout: int, file_name: Optional[str], file_bytes: Optional[bytes],
+                        save_file: bool, emit: Optional[Emit], execution_id: Optional[str],
+                        shared_path: Optional[str]) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ces-")
+    try:
+        file_path = output_path = None
+        if shared_path is not None:
+            file_path = shared_path
+            file_name = file_name or os.path.basename(shared_path)
+            if save_file:
+                output_path = os.path.join(workdir, os.path.basename(file_name))
+        elif file_bytes is not None:
+            file_path = os.path.join(workdir, os.path.basename(file_name or "data.csv"))
+            with open(file_path, "wb") as f:
+                f.write(file_bytes)
+            if save_file:
+                output_path = file_path
+        result = await sandbox_pool.execute({
+            "code": code,
+            "timeout": timeout,
+            "workdir": workdir,
+            "file_path": file_path,
+            "output_path": output_path,
+            "execution_id": execution_id,
+        }, emit)
+        if output_path and result["success"]:
+            with open(output_path, "rb") as f:
+                result["file_content"] = base64.b64encode(f.read()).decode("utf-8")
+            result["file_name"] = file_name
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
 
 @app.post("/execute")
-async def execute_code(request: CodeRequest):
-    pass
+async def execute_code(request: CodeRequest, user: str = Depends(_user_id)):
+    return _json_response(await run_in_sandbox(request.code, request.timeout, user=user))
 
 @app.post("/execute_file")
-async def execute_code_with_file(request: CodeWithFileRequest):
-    pass
+async def execute_code_with_file(request: CodeWithFileRequest, user: str = Depends(_user_id)):
+    return _json_response(await run_in_sandbox(request.code, request.timeout, request.file_name, user=user,
+                                               **_file_source(request.file_content, request.file_ref)))
+
+def _parse_form_request(request: str) -> dict:
+    try:
+        params = json.loads(request)
+        params["code"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="request must be a JSON object with a 'code' field")
+    return params
+
+async def _form_file_source(params: dict, file: Optional[UploadFile]) -> dict:
+    """run_in_sandbox file arguments from an uploaded file or a `file_ref` in the form's JSON."""
+    if params.get("file_ref"):
+        return {"file_name": params.get("file_name"), "shared_path": _resolve_file_ref(params["file_ref"])}
+    if file is None:
+        return {}
+    return {"file_name": file.filename, "file_bytes": await file.read()}
 
 @app.post("/execute_file_form")
 async def execute_code_with_file_form(
     request: str = Form(...),
-    file: UploadFile = File(...)
+    file: Optional[UploadFile] = File(None),
+    user: str = Depends(_user_id)
 ):
-    pass
+    params = _parse_form_request(request)
+    source = await _form_file_source(params, file)
+    if not source:
+        raise HTTPException(status_code=422, detail="Either a file upload or file_ref is required")
+    return _json_response(await run_in_sandbox(params["code"], int(params.get("timeout", 5)), user=user,
+                                               save_file=bool(params.get("save_file", False)), **source))
 
 @app.post("/modify_file")
-async def modify_file(request: ModifyFileRequest):
-    pass
+async def modify_file(request: ModifyFileRequest, user: str = Depends(_user_id)):
+    return _json_response(await run_in_sandbox(request.code, request.timeout, request.file_name, save_file=True,
+                                               user=user, **_file_source(request.file_content, request.file_ref)))
+
+@app.post("/execute_stream")
+async def execute_code_stream(
+    request: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    user: str = Depends(_user_id)
+):
+    """Like /execute_file_form (the file is optional), but streams output as server-sent events.
+
+    Code can call `progress(value, total, message)` and `plt.show()` to send progress and figures.
+    The execution is cancelled if the client disconnects or calls DELETE /executions/{execution_id}.
+    """
+    params = _parse_form_request(request)
+    timeout = _check_timeout(int(params.get("timeout", 5)))
+    source = await _form_file_source(params, file)
+    scheduler.check(user)
+    execution_id = uuid.uuid4().hex
+
+    def run(emit: Emit):
+        return run_in_sandbox(params["code"], timeout, save_file=bool(params.get("save_file", False)),
+                              emit=emit, execution_id=execution_id, user=user, **source)
+
+    return _streaming_response(_event_stream({"execution_id": execution_id}, run,
+                                             lambda: sandbox_pool.cancel(execution_id)))
+
+@app.delete("/executions/{execution_id}")
+async def cancel_execution(execution_id: str):
+    if not sandbox_pool.cancel(execution_id):
+        raise HTTPException(status_code=404, detail=f"Execution '{execution_id}' is not running")
+    return {"success": True, "execution_id": execution_id}
+
+@app.get("/pool")
+async def pool_stats():
+    return sandbox_pool.stats()
+
+@app.get("/scheduler")
+async def scheduler_stats():
+    return scheduler.stats()
+
+@app.exception_handler(SessionError)
+async def session_error_handler(request: Request, exc: SessionError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+@app.post("/sessions")
+async def open_session(
+    file: Optional[UploadFile] = File(None),
+    file_ref: Optional[str] = Form(None),
+    sheet_name: Optional[str] = Form(None)
+):
+    """Start a persistent kernel; an attached or shared-store file is parsed once into `df`."""
+    if file_ref:
+        session = await session_manager.open(file_ref, sheet_name=sheet_name, file_path=_resolve_file_ref(file_ref))
+    else:
+        file_bytes = await file.read() if file is not None else None
+        session = await session_manager.open(file.filename if file else None, file_bytes, sheet_name)
+    return session.info()
+
+@app.get("/sessions")
+async def list_sessions():
+    return session_manager.stats()
+
+@app.get("/sessions/{session_id}")
+async def session_info(session_id: str):
+    return session_manager.get(session_id).info()
+
+@app.post("/sessions/{session_id}/execute")
+async def execute_in_session(session_id: str, request: SessionCodeRequest, user: str = Depends(_user_id)):
+    """Run a snippet against the session's in-memory state; variables persist between calls."""
+    timeout = _check_timeout(request.timeout)
+    session_manager.get(session_id)
+    scheduler.check(user)
+    return _json_response(await session_manager.execute(session_id, request.code, timeout,
+                                                        admit=lambda: scheduler.enqueue(user, timeout)))
+
+@app.post("/sessions/{session_id}/execute_stream")
+async def execute_in_session_stream(session_id: str, request: SessionCodeRequest, user: str = Depends(_user_id)):
+    """Streaming variant of /sessions/{session_id}/execute; a disconnect interrupts the snippet."""
+    timeout = _check_timeout(request.timeout)
+    session_manager.get(session_id)
+    scheduler.check(user)
+
+    async def run(emit: Emit):
+        return await session_manager.execute(session_id, request.code, timeout, emit,
+                                             admit=lambda: scheduler.enqueue(user, timeout))
+
+    return _streaming_response(_event_stream(
+        {"session_id": session_id}, run, lambda: session_manager.interrupt(session_id),
+    ))
+
+@app.post("/sessions/{session_id}/interrupt")
+async def interrupt_session(session_id: str):
+    """Stop the running snippet with KeyboardInterrupt; the session and its variables stay alive."""
+    session_manager.get(session_id)
+    return {"success": True, "session_id": session_id, "interrupted": session_manager.interrupt(session_id)}
+
+@app.get("/sessions/{session_id}/export")
+async def export_session_dataframe(session_id: str, file_name: Optional[str] = None):
+    """Download the session's current `df`, in the format given by file_name (defaults to the uploaded file's)."""
+    path = await session_manager.export(session_id, file_name)
+    return FileResponse(path, filename=os.path.basename(file_name or session_manager.get(session_id).file_name or path),
+                        background=BackgroundTask(os.remove, path))
+
+@app.delete("/sessions/{session_id}")
+async def close_session(session_id: str):
+    if not session_manager.close(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found or expired")
+    return {"success": True, "session_id": session_id}
 
 @app.on_event("startup")
 async def startup_event():
-    pass
\ No newline at end of file
+    await sandbox_pool.start()
+    await session_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await session_manager.shutdown()
+    await sandbox_pool.shutdown()
\ No newline at end of file
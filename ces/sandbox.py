@@ -0,0 +1,536 @@
+"""
+Warm worker pool for sandboxed code execution.
+
+Starting a fresh interpreter per request and importing numpy/pandas costs several
+hundred milliseconds before any user code runs. Sandbox workers are instead forked
+from a forkserver that has already imported the scientific stack, so a new worker
+is ready in milliseconds, and each worker serves several executions.
+
+A worker is recycled after CES_WORKER_MAX_RUNS executions, once its resident memory
+has grown by more than CES_WORKER_MAX_RSS_GROWTH_MB, when user code overruns its
+timeout (it is killed) or when it dies. Every worker calls `limit_resources` before
+taking work, and the CPU limit is re-armed before each execution.
+
+Process-wide state a job changes is reset before the next job runs on the same
+worker: open figures are closed; matplotlib settings, pandas options, warning filters,
+`os.environ` and `sys.path` are restored; numpy's and `random`'s global generators are
+reseeded. A job that imported a package the worker had not loaded before (which can
+patch other modules on import) or replaced builtins gets its worker recycled instead.
+
+Streaming jobs send event messages (stdout/stderr chunks, figures, progress) over
+the worker pipe while the code runs, followed by the usual final result. A running
+job can be cancelled, which kills its worker.
+"""
+
+import asyncio
+import base64
+import builtins
+import datetime
+import io
+import logging
+import math
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+import warnings
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from serialization import dumps_result
+
+logger = logging.getLogger(__name__)
+
+CES_WORKERS = int(os.environ.get("CES_WORKERS", "4"))
+CES_WORKER_MAX_RUNS = int(os.environ.get("CES_WORKER_MAX_RUNS", "50"))
+CES_WORKER_MAX_RSS_GROWTH_MB = int(os.environ.get("CES_WORKER_MAX_RSS_GROWTH_MB", "256"))
+CES_MEMORY_LIMIT_MB = int(os.environ.get("CES_MEMORY_LIMIT_MB", "2048"))
+CES_MAX_FILE_SIZE_MB = int(os.environ.get("CES_MAX_FILE_SIZE_MB", "512"))
+# Streamed output is batched: pending output is sent this often, or as soon as it reaches STREAM_CHUNK_BYTES
+STREAM_FLUSH_INTERVAL = float(os.environ.get("CES_STREAM_FLUSH_INTERVAL", "0.1"))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Imported once in the forkserver; every worker inherits them already initialised
+PRELOAD_MODULES = ["sandbox", "numpy", "pandas", "matplotlib.pyplot", "pyarrow.parquet"]
+
+# Workers provide the parallelism, so native thread pools stay single-threaded
+WORKER_ENVIRONMENT = {
+    "OMP_NUM_THREADS": "1",
+    "OPENBLAS_NUM_THREADS": "1",
+    "MKL_NUM_THREADS": "1",
+    "MPLBACKEND": "Agg",
+}
+
+def forkserver_context():
+    """Multiprocessing context whose forkserver has the scientific stack preloaded."""
+    os.environ.update({key: os.environ.get(key, value) for key, value in WORKER_ENVIRONMENT.items()})
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+def limit_resources(memory_limit_mb: int = CES_MEMORY_LIMIT_MB) -> None:
+    """Cap memory and file sizes for the current sandbox process."""
+    import resource
+
+    memory = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    file_size = CES_MAX_FILE_SIZE_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_size, file_size))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+def _arm_cpu_limit(timeout: float) -> None:
+    """Allow `timeout` more seconds of CPU time on top of what this worker has already used."""
+    import resource
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime + timeout) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def clean_for_json(obj: Any) -> Any:
+    """Convert a single value into something json.dumps accepts."""
+    if obj is None or isinstance(obj, (str, bool, int)):
+        return obj
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, np.generic):
+        return clean_for_json(obj.item())
+    if isinstance(obj, np.ndarray):
+        return deep_clean(obj.tolist())
+    if isinstance(obj, pd.DataFrame):
+        return deep_clean(obj.to_dict(orient="records"))
+    if isinstance(obj, pd.Series):
+        return deep_clean(obj.to_dict())
+    if isinstance(obj, (datetime.date, datetime.datetime, pd.Timestamp)):
+        return obj.isoformat()
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode("utf-8")
+    return str(obj)
+
+def deep_clean(data: Any) -> Any:
+    """Recursively make nested containers JSON-safe."""
+    if isinstance(data, dict):
+        return {str(key): deep_clean(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple, set)):
+        return [deep_clean(value) for value in data]
+    return clean_for_json(data)
+
+def load_dataframe(file_path: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
+    """Load a tabular file by extension; Parquet/Arrow working copies keep their column types.
+
+    Parquet, Arrow and CSV files are memory-mapped rather than read into a buffer first.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(file_path, memory_map=True)
+    if ext in (".arrow", ".feather"):
+        import pyarrow.feather as feather
+
+        return feather.read_table(file_path, memory_map=True).to_pandas()
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(file_path, sheet_name=sheet_name or 0)
+    if ext == ".json":
+        return pd.read_json(file_path)
+    return pd.read_csv(file_path, memory_map=True)
+
+def save_dataframe(df: pd.DataFrame, file_path: str) -> str:
+    """Write a DataFrame back in the format given by the file extension."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".parquet":
+        df.to_parquet(file_path, index=False)
+    elif ext in (".arrow", ".feather"):
+        df.reset_index(drop=True).to_feather(file_path)
+    elif ext in (".xlsx", ".xls"):
+        df.to_excel(file_path, index=False)
+    elif ext == ".json":
+        df.to_json(file_path, orient="records")
+    else:
+        df.to_csv(file_path, index=False)
+    return file_path
+
+def new_namespace(file_path: Optional[str] = None, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Globals for user code: `pd`, `np`, the file helpers and, when a tabular file is attached, `df`."""
+    namespace: Dict[str, Any] = {"__name__": "__main__", "pd": pd, "np": np,
+                                 "load_dataframe": load_dataframe, "save_dataframe": save_dataframe}
+    if file_path:
+        namespace["file_path"] = file_path
+        try:
+            namespace["df"] = load_dataframe(file_path, sheet_name)
+        except Exception:
+            pass
+    return namespace
+
+Emit = Callable[[Dict[str, Any]], None]
+
+class _EventStream:
+    """Sends the events of one streaming run. Output is batched and flushed by a background thread
+    every STREAM_FLUSH_INTERVAL; other events flush pending output first so the order is preserved."""
+
+    def __init__(self, send: Emit):
+        self._send = send
+        self._lock = threading.Lock()
+        self._pending: Dict[str, list] = {"stdout": [], "stderr": []}
+        self._pending_size = 0
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def _flush_locked(self) -> None:
+        for name, chunks in self._pending.items():
+            if chunks:
+                self._send({"event": name, "data": "".join(chunks)})
+                chunks.clear()
+        self._pending_size = 0
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(STREAM_FLUSH_INTERVAL):
+            with self._lock:
+                self._flush_locked()
+
+    def output(self, name: str, text: str) -> None:
+        with self._lock:
+            self._pending[name].append(text)
+            self._pending_size += len(text)
+            if self._pending_size >= STREAM_CHUNK_BYTES:
+                self._flush_locked()
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._send(event)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._flusher.join()
+        with self._lock:
+            self._flush_locked()
+
+class _StreamWriter(io.StringIO):
+    """Captures output like StringIO and also passes it to an _EventStream."""
+
+    def __init__(self, name: str, events: _EventStream):
+        super().__init__()
+        self.name = name
+        self.events = events
+
+    def write(self, text: str) -> int:
+        self.events.output(self.name, text)
+        return super().write(text)
+
+def _emit_figures(emit: Emit) -> None:
+    """Send every open matplotlib figure as a PNG `figure` event and close it."""
+    import matplotlib.pyplot as plt
+
+    for number in plt.get_fignums():
+        figure = plt.figure(number)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png", bbox_inches="tight")
+        emit({"event": "figure", "data": base64.b64encode(buffer.getvalue()).decode("utf-8"), "format": "png"})
+        plt.close(figure)
+
+def _encode_result(result: Any) -> bytes:
+    try:
+        return dumps_result(result)
+    except Exception:
+        logger.exception("Could not serialize execution result")
+        return dumps_result(repr(result)[:10000])
+
+def run_code(code: str, namespace: Dict[str, Any], timeout: float, workdir: str,
+             emit: Optional[Emit] = None) -> Dict[str, Any]:
+    """Execute code in the given namespace with output captured. A variable named `result` is returned
+    as pre-encoded JSON bytes (`result_json`, see serialization.py).
+
+    With `emit`, output is also streamed while the code runs, `plt.show()` sends the open figures,
+    and `progress(value, total=None, message=None)` reports progress. Without it, `progress` is a no-op.
+    """
+    events = None
+    if emit is None:
+        stdout, stderr = io.StringIO(), io.StringIO()
+        namespace["progress"] = lambda value, total=None, message=None: None
+    else:
+        import matplotlib.pyplot as plt
+
+        events = _EventStream(emit)
+        stdout, stderr = _StreamWriter("stdout", events), _StreamWriter("stderr", events)
+        namespace["progress"] = lambda value, total=None, message=None: events.emit(
+            {"event": "progress", "value": clean_for_json(value), "total": clean_for_json(total), "message": message})
+        original_show, plt.show = plt.show, lambda *args, **kwargs: _emit_figures(events.emit)
+
+    _arm_cpu_limit(timeout)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    start = time.perf_counter()
+    error = None
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exec(compile(code, "<sandbox>", "exec"), namespace)
+    except BaseException:
+        error = traceback.format_exc()
+    finally:
+        os.chdir(previous_cwd)
+        if events is not None:
+            plt.show = original_show
+            events.close()
+
+    return {
+        "success": error is None,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "error": error,
+        "result_json": _encode_result(namespace.get("result")),
+        "execution_time": round(time.perf_counter() - start, 4),
+    }
+
+def receive_reply(conn, timeout: Optional[float], emit: Optional[Emit] = None) -> Optional[Dict[str, Any]]:
+    """Wait for the final reply on a sandbox pipe, passing event messages to `emit` on the way.
+
+    Returns None if no final reply arrives within `timeout` (None waits forever); raises EOFError
+    if the process died.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not conn.poll(remaining):
+                return None
+        message = conn.recv()
+        if "event" not in message:
+            return message
+        if emit is not None:
+            emit(message)
+
+def _packages() -> set:
+    return {name.partition(".")[0] for name in list(sys.modules)}
+
+def _snapshot_process_state() -> Dict[str, Any]:
+    """Process-wide state a job can change without touching its namespace."""
+    return {"environ": dict(os.environ), "path": list(sys.path), "packages": _packages(),
+            "builtins": dict(vars(builtins)), "warnings": list(warnings.filters)}
+
+def _reset_process_state(saved: Dict[str, Any]) -> Optional[str]:
+    """Undo what a job changed outside its namespace; returns a recycle reason if that is not possible."""
+    # Checked before the reset, which may import modules of its own
+    recycle = "global_state" if _packages() - saved["packages"] else None
+    current = vars(builtins)
+    if len(current) != len(saved["builtins"]) or any(current.get(name) is not value
+                                                     for name, value in saved["builtins"].items()):
+        # Put builtins back first so the rest of the reset (and sending the result) works, then retire the worker
+        current.clear()
+        current.update(saved["builtins"])
+        recycle = "global_state"
+    try:
+        plt = sys.modules.get("matplotlib.pyplot")
+        if plt is not None:
+            plt.close("all")
+            import matplotlib
+
+            matplotlib.rc_file_defaults()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            pd.reset_option("all")
+        np.random.seed(None)
+        random.seed()
+        warnings.filters[:] = saved["warnings"]
+        if os.environ != saved["environ"]:
+            os.environ.clear()
+            os.environ.update(saved["environ"])
+        sys.path[:] = saved["path"]
+    except Exception:
+        logger.error(f"Could not reset the worker after a job:\n{traceback.format_exc()}")
+        return "reset_failed"
+    return recycle
+
+def execute_job(job: Dict[str, Any], emit: Optional[Emit] = None) -> Dict[str, Any]:
+    """Run one piece of user code in a fresh namespace inside the current worker.
+
+    If `output_path` is set and `df` is still a DataFrame afterwards, it is written there.
+    """
+    saved = _snapshot_process_state()
+    try:
+        namespace = new_namespace(job.get("file_path"), job.get("sheet_name"))
+        result = run_code(job["code"], namespace, job["timeout"], job["workdir"], emit)
+        output_path = job.get("output_path")
+        if result["success"] and output_path and isinstance(namespace.get("df"), pd.DataFrame):
+            try:
+                save_dataframe(namespace["df"], output_path)
+            except Exception:
+                result.update(success=False, error=traceback.format_exc())
+    finally:
+        recycle = _reset_process_state(saved)
+    if recycle:
+        result["recycle"] = recycle
+    return result
+
+def _worker_main(conn, max_runs: int, max_rss_growth: int) -> None:
+    import psutil
+
+    limit_resources()
+    process = psutil.Process()
+    baseline = process.memory_info().rss
+    runs = 0
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        result = execute_job(job, conn.send if job.get("stream") else None)
+        runs += 1
+        growth = process.memory_info().rss - baseline
+        if runs >= max_runs:
+            result.setdefault("recycle", "max_runs")
+        elif growth > max_rss_growth:
+            result.setdefault("recycle", "memory_growth")
+        conn.send(result)
+        if result.get("recycle"):
+            return
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.runs = 0
+        self.cancelled = False
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+class SandboxPool:
+    """Fixed-size pool of warm sandbox workers, each running one execution at a time."""
+
+    def __init__(self, size: int = CES_WORKERS, max_runs: int = CES_WORKER_MAX_RUNS,
+                 max_rss_growth_mb: int = CES_WORKER_MAX_RSS_GROWTH_MB):
+        self.size = max(1, size)
+        self.max_runs = max_runs
+        self.max_rss_growth = max_rss_growth_mb * 1024 * 1024
+        self._context = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers = set()
+        self._running: Dict[str, _Worker] = {}
+        self.executions = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.recycled: Dict[str, int] = {}
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, daemon=True,
+                                        args=(child_conn, self.max_runs, self.max_rss_growth))
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self._workers.add(worker)
+        return worker
+
+    async def start(self) -> None:
+        if self._idle is not None:
+            return
+        self._context = forkserver_context()
+        self._idle = asyncio.Queue()
+        start = time.perf_counter()
+        for worker in await asyncio.gather(*[asyncio.to_thread(self._spawn) for _ in range(self.size)]):
+            self._idle.put_nowait(worker)
+        logger.info(f"Started {self.size} sandbox workers in {time.perf_counter() - start:.2f}s")
+
+    async def shutdown(self) -> None:
+        for worker in list(self._workers):
+            worker.stop()
+        self._workers.clear()
+        self._idle = None
+
+    def _retire(self, worker: _Worker, reason: str) -> None:
+        self.recycled[reason] = self.recycled.get(reason, 0) + 1
+        self._workers.discard(worker)
+        worker.stop()
+
+    def _run_on(self, worker: _Worker, job: Dict[str, Any], emit: Optional[Emit] = None) -> Dict[str, Any]:
+        """Blocking round trip to one worker; kills it if the job overruns its timeout."""
+        worker.conn.send(job)
+        try:
+            # Small grace period for result serialization on top of the user timeout
+            result = receive_reply(worker.conn, job["timeout"] + 1.0, emit)
+        except (EOFError, OSError):
+            if worker.cancelled:
+                self.cancelled += 1
+                self._retire(worker, "cancelled")
+                return {"success": False, "error": "Execution cancelled",
+                        "stdout": "", "stderr": "", "result": None, "recycle": "cancelled"}
+            self._retire(worker, "crashed")
+            return {"success": False, "error": "Sandbox worker exited (CPU or memory limit exceeded)",
+                    "stdout": "", "stderr": "", "result": None, "recycle": "crashed"}
+        if result is None:
+            self.timeouts += 1
+            self._retire(worker, "timeout")
+            return {"success": False, "error": f"Execution timed out after {job['timeout']} seconds",
+                    "stdout": "", "stderr": "", "result": None, "recycle": "timeout"}
+        worker.runs += 1
+        if result.get("recycle"):
+            self._retire(worker, result["recycle"])
+        return result
+
+    async def execute(self, job: Dict[str, Any], emit: Optional[Emit] = None) -> Dict[str, Any]:
+        """Run a job on the next idle worker, replacing the worker if it had to be retired.
+
+        With `emit`, the job streams its events to it (called from a worker thread). Jobs that carry
+        an `execution_id` can be stopped with `cancel` while they run.
+        """
+        if self._idle is None:
+            await self.start()
+        worker = await self._idle.get()
+        if not worker.process.is_alive():
+            self._retire(worker, "crashed")
+            worker = await asyncio.to_thread(self._spawn)
+        execution_id = job.get("execution_id")
+        if execution_id:
+            self._running[execution_id] = worker
+        try:
+            result = await asyncio.to_thread(self._run_on, worker, {**job, "stream": emit is not None}, emit)
+        except BaseException:
+            self._retire(worker, "error")
+            self._idle.put_nowait(await asyncio.to_thread(self._spawn))
+            raise
+        finally:
+            self._running.pop(execution_id, None)
+        self.executions += 1
+        if result.pop("recycle", None):
+            worker = await asyncio.to_thread(self._spawn)
+        self._idle.put_nowait(worker)
+        return result
+
+    def cancel(self, execution_id: str) -> bool:
+        """Stop a running execution by killing its worker; the caller gets a cancelled result."""
+        worker = self._running.get(execution_id)
+        if worker is None:
+            return False
+        worker.cancelled = True
+        worker.process.kill()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "running": len(self._running),
+            "executions": self.executions,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "recycled": dict(self.recycled),
+            "max_runs": self.max_runs,
+            "max_rss_growth_mb": self.max_rss_growth // (1024 * 1024),
+        }
+
+sandbox_pool = SandboxPool()
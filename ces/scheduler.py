@@ -0,0 +1,209 @@
+"""
+Admission control for code executions.
+
+Every execution (pool or session) needs a slot, and at most CES_MAX_CONCURRENCY run at
+once. Requests beyond that wait in a bounded queue and are picked in this order:
+
+1. Short jobs (timeout <= CES_SHORT_TIMEOUT_SECONDS) before long ones. A long job that
+   has waited CES_QUEUE_AGING_SECONDS is treated as short, so it cannot starve.
+2. Round robin across users within a class, so one user's burst does not delay others.
+3. First come, first served within a user.
+
+When the queue, or one user's share of it, is full, requests are rejected at once with
+429 and a Retry-After estimated from recent run times.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+CES_MAX_CONCURRENCY = int(os.environ.get("CES_MAX_CONCURRENCY", os.environ.get("CES_WORKERS", "4")))
+CES_MAX_QUEUE = int(os.environ.get("CES_MAX_QUEUE", str(CES_MAX_CONCURRENCY * 4)))
+CES_MAX_QUEUED_PER_USER = int(os.environ.get("CES_MAX_QUEUED_PER_USER", str(max(1, CES_MAX_QUEUE // 2))))
+CES_SHORT_TIMEOUT_SECONDS = float(os.environ.get("CES_SHORT_TIMEOUT_SECONDS", "10"))
+CES_QUEUE_AGING_SECONDS = float(os.environ.get("CES_QUEUE_AGING_SECONDS", "30"))
+# Recent queue waits kept for the percentiles in stats()
+WAIT_SAMPLES = 1000
+
+class Ticket:
+    """One execution's place in the scheduler. Await `wait()` before running and call `release()` after."""
+
+    def __init__(self, scheduler: "Scheduler", user: str, timeout: float):
+        self.scheduler = scheduler
+        self.user = user
+        self.timeout = timeout
+        self.short = timeout <= scheduler.short_timeout
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    async def wait(self) -> None:
+        try:
+            await self.future
+        except asyncio.CancelledError:
+            if self.future.done() and not self.future.cancelled():
+                self.release()
+            else:
+                self.scheduler._withdraw(self)
+            raise
+
+    def release(self) -> None:
+        if self.started_at is not None:
+            self.scheduler._release(self)
+            self.started_at = None
+
+    async def __aenter__(self) -> "Ticket":
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+class Scheduler:
+    def __init__(self, max_concurrency: int = CES_MAX_CONCURRENCY, max_queue: int = CES_MAX_QUEUE,
+                 max_queued_per_user: int = CES_MAX_QUEUED_PER_USER,
+                 short_timeout: float = CES_SHORT_TIMEOUT_SECONDS, aging_seconds: float = CES_QUEUE_AGING_SECONDS):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_queued_per_user = max(1, max_queued_per_user)
+        self.short_timeout = short_timeout
+        self.aging_seconds = aging_seconds
+        # Per user: (short queue, long queue); `_rotation` is the round-robin order of users with waiting jobs
+        self._queues: Dict[str, tuple] = {}
+        self._rotation: Deque[str] = deque()
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.completed = 0
+        self.rejected: Dict[str, int] = {}
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._avg_run_seconds = 1.0
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_run_seconds * (self.queued + 1) / self.max_concurrency))
+
+    def _reject(self, reason: str, detail: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(self._retry_after())})
+
+    def check(self, user: str) -> None:
+        """Raise 429 if an execution for `user` would be rejected now, without enqueueing anything."""
+        if self.running < self.max_concurrency and self.queued == 0:
+            return
+        if self.queued >= self.max_queue:
+            self._reject("queue_full", "Code execution queue is full, retry later")
+        queues = self._queues.get(user)
+        if queues is not None and len(queues[0]) + len(queues[1]) >= self.max_queued_per_user:
+            self._reject("user_queue_full", f"Too many queued executions for user '{user}', retry later")
+
+    def enqueue(self, user: str, timeout: float) -> Ticket:
+        """Admit an execution or reject it with 429 right away; use the returned ticket with `async with`."""
+        self.check(user)
+        ticket = Ticket(self, user, timeout)
+        if self.running < self.max_concurrency and self.queued == 0:
+            self._start(ticket)
+            return ticket
+        queues = self._queues.get(user)
+        if queues is None:
+            queues = self._queues[user] = (deque(), deque())
+            self._rotation.append(user)
+        queues[0 if ticket.short else 1].append(ticket)
+        self.queued += 1
+        return ticket
+
+    def _start(self, ticket: Ticket) -> None:
+        self.running += 1
+        self.admitted += 1
+        ticket.started_at = time.monotonic()
+        self._waits.append(ticket.started_at - ticket.enqueued_at)
+        ticket.future.set_result(None)
+
+    def _next(self) -> Optional[Ticket]:
+        """Pop the next ticket: short (or aged) jobs first, round robin across users, FIFO per user."""
+        now = time.monotonic()
+        chosen_user, chosen_index = None, None
+        for user in self._rotation:
+            short, long = self._queues[user]
+            if short and (not long or short[0].enqueued_at <= long[0].enqueued_at
+                          or now - long[0].enqueued_at < self.aging_seconds):
+                chosen_user, chosen_index = user, 0
+                break
+            if long and now - long[0].enqueued_at >= self.aging_seconds:
+                chosen_user, chosen_index = user, 1
+                break
+        if chosen_user is None:
+            chosen_user = next((user for user in self._rotation if self._queues[user][1]), None)
+            chosen_index = 1
+        if chosen_user is None:
+            return None
+        queues = self._queues[chosen_user]
+        ticket = queues[chosen_index].popleft()
+        self.queued -= 1
+        self._rotation.remove(chosen_user)
+        if queues[0] or queues[1]:
+            self._rotation.append(chosen_user)
+        else:
+            del self._queues[chosen_user]
+        return ticket
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrency:
+            ticket = self._next()
+            if ticket is None:
+                return
+            if not ticket.future.cancelled():
+                self._start(ticket)
+
+    def _withdraw(self, ticket: Ticket) -> None:
+        queues = self._queues.get(ticket.user)
+        if queues is None:
+            return
+        queue = queues[0 if ticket.short else 1]
+        if ticket in queue:
+            queue.remove(ticket)
+            self.queued -= 1
+            if not queues[0] and not queues[1]:
+                del self._queues[ticket.user]
+                self._rotation.remove(ticket.user)
+
+    def _release(self, ticket: Ticket) -> None:
+        self.running -= 1
+        self.completed += 1
+        # Exponential moving average of run time, used for Retry-After
+        self._avg_run_seconds = 0.9 * self._avg_run_seconds + 0.1 * (time.monotonic() - ticket.started_at)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_queued_per_user": self.max_queued_per_user,
+            "running": self.running,
+            "queued": self.queued,
+            "queued_by_user": {user: len(short) + len(long) for user, (short, long) in self._queues.items()},
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": dict(self.rejected),
+            "queue_wait_seconds": {
+                "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+            "avg_run_seconds": round(self._avg_run_seconds, 4),
+        }
+
+scheduler = Scheduler()
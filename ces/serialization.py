@@ -0,0 +1,165 @@
+"""
+Typed serializer for execution results.
+
+Results used to be walked value by value into nested Python lists before JSON encoding,
+which made large DataFrame/ndarray results slow and huge. They are now encoded with
+orjson inside the sandbox worker, and the API embeds the bytes as they are.
+
+- DataFrames and Series are encoded column by column. Numeric columns go to orjson as
+  numpy arrays, which writes NaN/Inf as null without a Python loop.
+- Frames, series, arrays and lists longer than CES_RESULT_MAX_ROWS are cut to their first
+  rows (and frames to their first CES_RESULT_MAX_COLUMNS columns), with `truncated` set
+  and a summary (nulls, min/max/mean) of the full rows.
+- If the encoded result is still over CES_RESULT_MAX_BYTES, only the summary is kept.
+"""
+
+import base64
+import datetime
+import decimal
+import logging
+import math
+import os
+from typing import Any, Dict
+
+import numpy as np
+import orjson
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CES_RESULT_MAX_ROWS = int(os.environ.get("CES_RESULT_MAX_ROWS", "1000"))
+CES_RESULT_MAX_COLUMNS = int(os.environ.get("CES_RESULT_MAX_COLUMNS", "500"))
+CES_RESULT_MAX_BYTES = int(float(os.environ.get("CES_RESULT_MAX_MB", "8")) * 1024 * 1024)
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(obj: Any) -> Any:
+    """orjson fallback for values it does not encode natively."""
+    if obj is pd.NaT or obj is pd.NA or obj is None:
+        return None
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray, pd.Index)):
+        return encode_value(obj)
+    if isinstance(obj, np.generic):
+        value = obj.item()
+        return None if isinstance(value, float) and not math.isfinite(value) else value
+    if isinstance(obj, (datetime.date, datetime.time, pd.Timestamp)):
+        return obj.isoformat()
+    if isinstance(obj, (pd.Timedelta, datetime.timedelta)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode("utf-8")
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return str(obj)
+
+def _values(values: Any) -> Any:
+    """One column as something orjson encodes quickly: a numeric ndarray, or a list with None for missing."""
+    if isinstance(values, pd.MultiIndex):
+        return [list(item) for item in values.to_flat_index()]
+    if isinstance(values, (pd.Series, pd.Index)):
+        dtype = values.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+            return np.ascontiguousarray(values.to_numpy())
+        if isinstance(dtype, np.dtype) and dtype.kind == "M":
+            array = values.to_numpy()
+            out = np.datetime_as_string(array, unit="auto").astype(object)
+            out[np.isnat(array)] = None
+            return out.tolist()
+        # Strings, nullable extension types, timezone-aware datetimes, categories...; _default handles the rest
+        return values.to_numpy(dtype=object, na_value=None).tolist()
+    array = np.asarray(values)
+    if array.dtype.kind in "biuf":
+        return np.ascontiguousarray(array)
+    return _values(pd.Series(array.ravel())) if array.ndim == 1 else [_values(row) for row in array]
+
+def _has_default_index(obj: Any) -> bool:
+    index = obj.index
+    return isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+
+def _frame_summary(df: pd.DataFrame) -> Dict[str, Any]:
+    numeric = df.select_dtypes(include="number")
+    summary: Dict[str, Any] = {"null_counts": {str(col): int(count) for col, count in df.isna().sum().items()}}
+    if not numeric.empty:
+        stats = numeric.agg(["min", "max", "mean"])
+        summary["numeric"] = {str(col): {stat: stats.at[stat, col] for stat in stats.index} for col in stats.columns}
+    return summary
+
+def _key(key: Any) -> Any:
+    """Dict key orjson accepts with OPT_NON_STR_KEYS; tuples and other objects become strings."""
+    if isinstance(key, np.generic):
+        key = key.item()
+    return key if key is None or isinstance(key, (str, int, float)) else str(key)
+
+def encode_value(obj: Any, max_rows: int = CES_RESULT_MAX_ROWS) -> Any:
+    """Typed, JSON-ready form of DataFrames, Series, arrays and (bounded) containers."""
+    if isinstance(obj, pd.DataFrame):
+        head = obj.iloc[:max_rows, :CES_RESULT_MAX_COLUMNS]
+        encoded: Dict[str, Any] = {
+            "type": "dataframe",
+            "shape": list(obj.shape),
+            "columns": [str(col) for col in head.columns],
+            "dtypes": [str(dtype) for dtype in head.dtypes],
+        }
+        if not _has_default_index(obj):
+            encoded["index"] = _values(head.index)
+        encoded["data"] = [_values(head.iloc[:, i]) for i in range(head.shape[1])]
+        encoded["truncated"] = head.shape != obj.shape
+        if encoded["truncated"]:
+            encoded["summary"] = _frame_summary(obj.iloc[:, :CES_RESULT_MAX_COLUMNS])
+        return encoded
+    if isinstance(obj, (pd.Series, pd.Index)):
+        head = obj[:max_rows]
+        encoded = {"type": "series" if isinstance(obj, pd.Series) else "index",
+                   "name": None if obj.name is None else str(obj.name),
+                   "dtype": str(obj.dtype), "length": len(obj)}
+        if isinstance(obj, pd.Series) and not _has_default_index(obj):
+            encoded["index"] = _values(head.index)
+        encoded["data"] = _values(head)
+        encoded["truncated"] = len(obj) > max_rows
+        if encoded["truncated"]:
+            encoded["summary"] = _frame_summary(obj.to_frame() if isinstance(obj, pd.Series) else obj.to_series().to_frame())
+        return encoded
+    if isinstance(obj, np.ndarray):
+        if obj.ndim == 0:
+            return obj.item()
+        encoded = {"type": "ndarray", "dtype": str(obj.dtype), "shape": list(obj.shape),
+                   "data": _values(obj[:max_rows]), "truncated": obj.shape[0] > max_rows}
+        if encoded["truncated"] and obj.dtype.kind in "biuf" and obj.size:
+            encoded["summary"] = {"min": np.nanmin(obj), "max": np.nanmax(obj), "mean": np.nanmean(obj)}
+        return encoded
+    if isinstance(obj, dict):
+        return {_key(key): encode_value(value, max_rows) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        if len(obj) > max_rows:
+            return {"type": "list", "length": len(obj), "truncated": True,
+                    "data": [encode_value(value, max_rows) for value in obj[:max_rows]]}
+        return [encode_value(value, max_rows) for value in obj]
+    return obj
+
+def _summary_only(obj: Any) -> Dict[str, Any]:
+    encoded = encode_value(obj, max_rows=0)
+    if isinstance(encoded, dict) and "type" in encoded:
+        encoded.pop("data", None)
+        encoded.pop("index", None)
+        return {**encoded, "truncated": True}
+    if isinstance(obj, dict):
+        return {"type": "dict", "length": len(obj), "keys": [str(key) for key in list(obj)[:CES_RESULT_MAX_ROWS]],
+                "truncated": True}
+    return {"type": type(obj).__name__, "truncated": True, "repr": repr(obj)[:1000]}
+
+def dumps_result(obj: Any, max_rows: int = CES_RESULT_MAX_ROWS, max_bytes: int = CES_RESULT_MAX_BYTES) -> bytes:
+    """JSON bytes for an execution result, bounded by max_rows and max_bytes."""
+    encoded = orjson.dumps(encode_value(obj, max_rows), default=_default, option=ORJSON_OPTIONS)
+    if len(encoded) > max_bytes:
+        logger.info(f"Result of {len(encoded)} bytes is over the {max_bytes} byte budget; returning a summary")
+        encoded = orjson.dumps(_summary_only(obj), default=_default, option=ORJSON_OPTIONS)
+    return encoded
+
+def dumps_response(reply: Dict[str, Any]) -> bytes:
+    """Encode an execution reply, embedding its pre-encoded `result_json` bytes as `result`."""
+    reply = dict(reply)
+    result_json = reply.pop("result_json", None)
+    reply["result"] = orjson.Fragment(result_json) if result_json is not None else reply.get("result")
+    return orjson.dumps(reply, default=_default, option=ORJSON_OPTIONS)
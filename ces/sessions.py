@@ -0,0 +1,285 @@
+"""
+Persistent per-session kernels.
+
+A session owns one dedicated sandbox process, forked from the same preloaded
+forkserver as the worker pool, that keeps its globals between snippets. The dataset
+is parsed once when the session is opened, and every later snippet works on the
+in-memory `df` instead of re-reading the file.
+
+Sessions end when they are deleted, after CES_SESSION_IDLE_SECONDS without use,
+when a snippet overruns its timeout (the process is killed, so its state is lost),
+or when the kernel's resident memory passes CES_SESSION_MEMORY_LIMIT_MB.
+
+A running snippet can be interrupted: the kernel gets SIGINT, the snippet fails with
+KeyboardInterrupt and the session keeps its state.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import time
+import traceback
+import uuid
+from typing import Any, AsyncContextManager, Callable, Dict, Optional
+
+import pandas as pd
+
+from sandbox import Emit, forkserver_context, limit_resources, new_namespace, receive_reply, run_code, save_dataframe
+
+logger = logging.getLogger(__name__)
+
+CES_MAX_SESSIONS = int(os.environ.get("CES_MAX_SESSIONS", "8"))
+CES_SESSION_IDLE_SECONDS = int(os.environ.get("CES_SESSION_IDLE_SECONDS", "900"))
+CES_SESSION_MEMORY_LIMIT_MB = int(os.environ.get("CES_SESSION_MEMORY_LIMIT_MB", "4096"))
+
+class SessionError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _frame_info(namespace: Dict[str, Any]) -> Dict[str, Any]:
+    df = namespace.get("df")
+    if not isinstance(df, pd.DataFrame):
+        return {"rows": None, "columns": None}
+    return {"rows": len(df), "columns": [str(col) for col in df.columns]}
+
+def _session_main(conn, memory_limit_mb: int) -> None:
+    """Kernel loop: keep one namespace alive and answer load / execute / export messages."""
+    import psutil
+
+    # The RSS check below is the real cap; the address-space limit only stops runaway allocations
+    limit_resources(memory_limit_mb * 2)
+    process = psutil.Process()
+    namespace: Dict[str, Any] = {}
+    workdir = None
+    executing = False
+
+    def interrupt(signum, frame):
+        # Interrupts only land inside user code; one arriving between snippets is dropped
+        if executing:
+            raise KeyboardInterrupt
+
+    signal.signal(signal.SIGINT, interrupt)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        op = message["op"]
+        try:
+            if op == "load":
+                workdir = message["workdir"]
+                namespace = new_namespace(message.get("file_path"), message.get("sheet_name"))
+                reply = {"success": True, **_frame_info(namespace)}
+            elif op == "execute":
+                namespace.pop("result", None)
+                executing = True
+                try:
+                    reply = run_code(message["code"], namespace, message["timeout"], workdir,
+                                     conn.send if message.get("stream") else None)
+                finally:
+                    executing = False
+                reply.update(_frame_info(namespace))
+            elif op == "export":
+                if not isinstance(namespace.get("df"), pd.DataFrame):
+                    raise ValueError("The session has no DataFrame named 'df' to export")
+                save_dataframe(namespace["df"], message["path"])
+                reply = {"success": True, **_frame_info(namespace)}
+            else:
+                raise ValueError(f"Unknown session operation '{op}'")
+        except BaseException:
+            reply = {"success": False, "error": traceback.format_exc()}
+
+        rss = process.memory_info().rss
+        reply["memory_mb"] = round(rss / (1024 * 1024), 1)
+        if rss > memory_limit_mb * 1024 * 1024:
+            reply["terminated"] = f"Session exceeded its memory limit of {memory_limit_mb} MB"
+        conn.send(reply)
+        if reply.get("terminated"):
+            return
+
+class Session:
+    def __init__(self, session_id: str, process, conn, workdir: str, file_name: Optional[str]):
+        self.session_id = session_id
+        self.process = process
+        self.conn = conn
+        self.workdir = workdir
+        self.file_name = file_name
+        self.created_at = time.time()
+        self.last_used = time.time()
+        self.executions = 0
+        self.memory_mb = 0.0
+        self.rows: Optional[int] = None
+        self.columns = None
+        # One snippet at a time per kernel
+        self.lock = asyncio.Lock()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "file_name": self.file_name,
+            "rows": self.rows,
+            "columns": self.columns,
+            "executions": self.executions,
+            "memory_mb": self.memory_mb,
+            "created_at": self.created_at,
+            "idle_seconds": round(time.time() - self.last_used, 1),
+        }
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+class SessionManager:
+    def __init__(self, max_sessions: int = CES_MAX_SESSIONS, idle_seconds: int = CES_SESSION_IDLE_SECONDS,
+                 memory_limit_mb: int = CES_SESSION_MEMORY_LIMIT_MB):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self._sessions: Dict[str, Session] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self.expired = 0
+
+    async def start(self) -> None:
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def shutdown(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for session_id in list(self._sessions):
+            self.close(session_id)
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(min(60, max(1, self.idle_seconds // 4)))
+            now = time.time()
+            for session in list(self._sessions.values()):
+                if not session.lock.locked() and now - session.last_used > self.idle_seconds:
+                    logger.info(f"Closing idle session {session.session_id}")
+                    self.expired += 1
+                    self.close(session.session_id)
+
+    def _spawn(self, session_id: str, workdir: str, file_name: Optional[str]) -> Session:
+        context = forkserver_context()
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_session_main, args=(child_conn, self.memory_limit_mb), daemon=True)
+        process.start()
+        child_conn.close()
+        return Session(session_id, process, parent_conn, workdir, file_name)
+
+    def _request(self, session: Session, message: Dict[str, Any], timeout: Optional[float],
+                 emit: Optional[Emit] = None) -> Dict[str, Any]:
+        """Blocking round trip to the kernel; kills the session if it overruns the timeout or dies."""
+        session.conn.send(message)
+        try:
+            reply = receive_reply(session.conn, timeout, emit)
+        except (EOFError, OSError):
+            self.close(session.session_id)
+            raise SessionError(f"Session {session.session_id} kernel exited (CPU or memory limit exceeded)",
+                               status_code=410)
+        if reply is None:
+            self.close(session.session_id)
+            raise SessionError(f"Execution timed out after {message.get('timeout')} seconds; "
+                               f"session {session.session_id} was terminated", status_code=408)
+        session.memory_mb = reply.pop("memory_mb", session.memory_mb)
+        if "rows" in reply:
+            session.rows, session.columns = reply.get("rows"), reply.get("columns")
+        if reply.get("terminated"):
+            self.close(session.session_id)
+        return reply
+
+    async def open(self, file_name: Optional[str] = None, file_bytes: Optional[bytes] = None,
+                   sheet_name: Optional[str] = None, file_path: Optional[str] = None) -> Session:
+        """Start a kernel and load `file_bytes`, or the existing file at `file_path`, as `df`."""
+        if len(self._sessions) >= self.max_sessions:
+            raise SessionError(f"Session limit of {self.max_sessions} reached; close an existing session",
+                               status_code=429)
+        session_id = uuid.uuid4().hex
+        workdir = tempfile.mkdtemp(prefix=f"ces-session-{session_id[:8]}-")
+        if file_bytes is not None:
+            file_path = os.path.join(workdir, os.path.basename(file_name or "data.csv"))
+            with open(file_path, "wb") as f:
+                f.write(file_bytes)
+
+        session = await asyncio.to_thread(self._spawn, session_id, workdir, file_name)
+        self._sessions[session_id] = session
+        async with session.lock:
+            reply = await asyncio.to_thread(self._request, session, {
+                "op": "load", "workdir": workdir, "file_path": file_path, "sheet_name": sheet_name,
+            }, None)
+        if not reply["success"]:
+            self.close(session_id)
+            raise SessionError(f"Failed to load dataset: {reply['error']}")
+        return session
+
+    def get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionError(f"Session '{session_id}' not found or expired", status_code=404)
+        return session
+
+    async def execute(self, session_id: str, code: str, timeout: float, emit: Optional[Emit] = None,
+                      admit: Optional[Callable[[], AsyncContextManager]] = None) -> Dict[str, Any]:
+        """Run a snippet in the session; with `emit`, its output events are streamed to it (from a worker thread).
+
+        `admit` (e.g. a scheduler slot) is entered only once the session lock is held, so calls
+        waiting behind a busy session do not hold a slot other executions could use.
+        """
+        session = self.get(session_id)
+        async with session.lock:
+            async with admit() if admit is not None else contextlib.nullcontext():
+                reply = await asyncio.to_thread(self._request, session, {
+                    "op": "execute", "code": code, "timeout": timeout, "stream": emit is not None,
+                }, timeout + 1.0, emit)
+            session.executions += 1
+            session.last_used = time.time()
+        reply["session_id"] = session_id
+        return reply
+
+    async def export(self, session_id: str, file_name: Optional[str] = None) -> str:
+        """Write the session's current `df` to a file in its working directory and return the path."""
+        session = self.get(session_id)
+        path = os.path.join(session.workdir, f"export-{uuid.uuid4().hex[:8]}-{os.path.basename(file_name or session.file_name or 'data.csv')}")
+        async with session.lock:
+            reply = await asyncio.to_thread(self._request, session, {"op": "export", "path": path}, None)
+            session.last_used = time.time()
+        if not reply["success"]:
+            raise SessionError(reply["error"])
+        return path
+
+    def interrupt(self, session_id: str) -> bool:
+        """Interrupt the snippet currently running in a session, keeping the session's state."""
+        session = self._sessions.get(session_id)
+        if session is None or not session.lock.locked() or not session.process.is_alive():
+            return False
+        os.kill(session.process.pid, signal.SIGINT)
+        return True
+
+    def close(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.stop()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": [session.info() for session in self._sessions.values()],
+            "max_sessions": self.max_sessions,
+            "idle_seconds": self.idle_seconds,
+            "memory_limit_mb": self.memory_limit_mb,
+            "expired": self.expired,
+        }
+
+session_manager = SessionManager()
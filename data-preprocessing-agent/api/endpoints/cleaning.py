@@ -1,6 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Header
 from pydantic import BaseModel
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from typing import Dict, List, Any, Optional, Union
+from functools import partial
+import base64
+import json
+import logging
+import os
+import tempfile
+
+from api.executor import worker_pool, run_cached
+from api.transport import (parse_params, read_upload, binary_file_response, negotiate_filename,
+                           save_upload_to_temp, remove_files, RESULT_HEADER)
+from utils import cleaning_tools, chunked_cleaning
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -13,49 +28,188 @@ class DataPreprocessingError(HTTPException):
     def __init__(self, detail: str = "Data preprocessing failed", status_code: int = 400):
         super().__init__(status_code=status_code, detail=detail)
 
-class FileOperationInput(BaseModel):
+class OperationParams(BaseModel):
+    sheet_name: Optional[str] = None
+
+class FileOperationInput(OperationParams):
     file_content_base64: str
     original_filename: str
-    sheet_name: Optional[str] = None
 
-class RemoveDuplicatesInput(FileOperationInput):
+class RemoveDuplicatesParams(OperationParams):
     subset: Optional[List[str]] = None
+    keep: str = "first"
+    # "exact" compares subset rows; "near" clusters similar texts in text_column with MinHash/LSH
+    method: str = "exact"
+    text_column: Optional[str] = None
+    similarity_threshold: float = 0.8
+    num_perm: int = 64
 
-class HandleMissingValuesInput(FileOperationInput):
+class HandleMissingValuesParams(OperationParams):
     strategy: str
     columns: Optional[List[str]] = None
     fill_value: Optional[Any] = None
 
-class DropRowsColumnsInput(FileOperationInput):
+class DropRowsColumnsParams(OperationParams):
     axis: int
     threshold: Optional[float] = None
     to_drop: Optional[List[Union[str,int]]] = None
 
-class CleanTextInput(FileOperationInput):
-    column: str
-    operation: str
+class CleanTextParams(OperationParams):
+    column: Optional[str] = None
+    operation: Optional[str] = None
+    # Several columns and an ordered chain of operations, applied in one pass per column
+    columns: Optional[List[str]] = None
+    operations: Optional[List[str]] = None
 
-class RemoveOutliersInput(FileOperationInput):
-    method: str
-    threshold: float
+class RemoveOutliersParams(OperationParams):
+    method: str = "zscore"
+    threshold: float = 3.0
     columns: List[str]
+    # Bounds returned by a previous call; when given, no statistics are recomputed
+    bounds: Optional[Dict[str, Dict[str, Optional[float]]]] = None
+
+class RemoveDuplicatesInput(FileOperationInput, RemoveDuplicatesParams):
+    pass
+
+class HandleMissingValuesInput(FileOperationInput, HandleMissingValuesParams):
+    pass
+
+class DropRowsColumnsInput(FileOperationInput, DropRowsColumnsParams):
+    pass
+
+class CleanTextInput(FileOperationInput, CleanTextParams):
+    pass
+
+class RemoveOutliersInput(FileOperationInput, RemoveOutliersParams):
+    pass
+
+# Operation name -> (parameter model, DataFrame-level function)
+OPERATIONS = {
+    "remove-duplicates": (RemoveDuplicatesParams, cleaning_tools.remove_duplicates_df),
+    "handle-missing-values": (HandleMissingValuesParams, cleaning_tools.handle_missing_values_df),
+    "drop-rows-columns": (DropRowsColumnsParams, cleaning_tools.drop_rows_columns_df),
+    "clean-text": (CleanTextParams, cleaning_tools.clean_text_df),
+    "remove-outliers": (RemoveOutliersParams, cleaning_tools.remove_outliers_df),
+}
+
+# Operations that can run out-of-core over row chunks
+CHUNKED_OPERATIONS = {
+    "remove-duplicates": (RemoveDuplicatesParams, chunked_cleaning.remove_duplicates_chunked),
+    "handle-missing-values": (HandleMissingValuesParams, chunked_cleaning.handle_missing_values_chunked),
+    "clean-text": (CleanTextParams, chunked_cleaning.clean_text_chunked),
+    "remove-outliers": (RemoveOutliersParams, chunked_cleaning.remove_outliers_chunked),
+}
+
+def operation_kwargs(params: OperationParams) -> Dict[str, Any]:
+    return params.model_dump(exclude={"sheet_name", "file_content_base64", "original_filename"})
+
+async def _run_json_operation(name: str, input: FileOperationInput) -> ResponseModel:
+    _, func = OPERATIONS[name]
+    params = operation_kwargs(input)
+    try:
+        content = base64.b64decode(input.file_content_base64)
+        output, result = await run_cached(
+            f"cleaning/{name}", content, {**params, "sheet_name": input.sheet_name}, input.original_filename,
+            partial(cleaning_tools.apply_binary, func, content, input.original_filename, input.sheet_name, **params),
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise DataPreprocessingError(str(e))
+    except Exception as e:
+        logger.error(f"{name} failed: {e}", exc_info=True)
+        raise DataPreprocessingError(f"{name} failed: {e}", status_code=500)
+    result["file_content_base64"] = base64.b64encode(output).decode("utf-8")
+    return ResponseModel(success=True, message=result["message"], data=result)
 
 @router.post("/remove-duplicates", response_model=ResponseModel)
 async def api_remove_duplicates(input: RemoveDuplicatesInput):
-    pass
+    return await _run_json_operation("remove-duplicates", input)
 
 @router.post("/handle-missing-values", response_model=ResponseModel)
 async def api_handle_missing_values(input: HandleMissingValuesInput):
-    pass
+    return await _run_json_operation("handle-missing-values", input)
 
 @router.post("/drop-rows-columns", response_model=ResponseModel)
 async def api_drop_rows_columns(input: DropRowsColumnsInput):
-    pass
+    return await _run_json_operation("drop-rows-columns", input)
 
 @router.post("/clean-text", response_model=ResponseModel)
 async def api_clean_text(input: CleanTextInput):
-    pass
+    return await _run_json_operation("clean-text", input)
 
 @router.post("/remove-outliers", response_model=ResponseModel)
 async def api_remove_outliers(input: RemoveOutliersInput):
-    pass
\ No newline at end of file
+    return await _run_json_operation("remove-outliers", input)
+
+@router.post("/{operation}/binary")
+async def api_binary_operation(
+    operation: str,
+    file: UploadFile = File(...),
+    params: str = Form("{}"),
+    accept: Optional[str] = Header(None)
+):
+    """Binary variant of the cleaning endpoints: multipart upload in, streamed file out."""
+    if operation not in OPERATIONS:
+        raise DataPreprocessingError(f"Unknown cleaning operation '{operation}'", status_code=404)
+    params_model, func = OPERATIONS[operation]
+    parsed = parse_params(params, params_model)
+    content = await read_upload(file)
+    filename = file.filename or "data.csv"
+    output_filename = negotiate_filename(filename, accept)
+
+    try:
+        output, result = await run_cached(
+            f"cleaning/{operation}", content, parsed.model_dump(), output_filename,
+            partial(cleaning_tools.apply_binary, func, content, filename, parsed.sheet_name,
+                    output_filename, **operation_kwargs(parsed)),
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise DataPreprocessingError(str(e))
+    except Exception as e:
+        logger.error(f"{operation} failed: {e}", exc_info=True)
+        raise DataPreprocessingError(f"{operation} failed: {e}", status_code=500)
+    return binary_file_response(output, output_filename, result)
+
+@router.post("/{operation}/stream")
+async def api_chunked_operation(
+    operation: str,
+    file: UploadFile = File(...),
+    params: str = Form("{}"),
+    chunksize: int = Form(chunked_cleaning.CHUNK_SIZE_ROWS)
+):
+    """Out-of-core variant for files larger than memory: the upload is spooled to disk and processed in row chunks."""
+    if operation not in CHUNKED_OPERATIONS:
+        raise DataPreprocessingError(f"Operation '{operation}' does not support chunked mode", status_code=404)
+    if chunksize <= 0:
+        raise DataPreprocessingError("chunksize must be positive")
+    params_model, func = CHUNKED_OPERATIONS[operation]
+    parsed = parse_params(params, params_model)
+    filename = file.filename or "data.csv"
+    src = await save_upload_to_temp(file)
+    fd, dst = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+
+    try:
+        result = await worker_pool.run(partial(func, src, dst, chunksize=chunksize, **operation_kwargs(parsed)),
+                                       os.path.getsize(src))
+    except HTTPException:
+        remove_files(src, dst)
+        raise
+    except ValueError as e:
+        remove_files(src, dst)
+        raise DataPreprocessingError(str(e))
+    except Exception as e:
+        remove_files(src, dst)
+        logger.error(f"Chunked {operation} failed: {e}", exc_info=True)
+        raise DataPreprocessingError(f"{operation} failed: {e}", status_code=500)
+
+    return FileResponse(
+        dst,
+        media_type=cleaning_tools.get_media_type(filename),
+        filename=filename,
+        headers={RESULT_HEADER: json.dumps(result, default=str)},
+        background=BackgroundTask(remove_files, src, dst),
+    )
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, File, UploadFile, Form, Header, HTTPException
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, Optional
+from functools import partial
+import logging
+
+from api.endpoints.cleaning import ResponseModel, DataPreprocessingError, operation_kwargs
+from api.executor import worker_pool
+from api.operations import resolve_operation
+from api.transport import read_upload, binary_file_response, negotiate_filename
+from utils import cleaning_tools
+from utils.dataset_store import dataset_store, DatasetEntry, StaleDatasetError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class DatasetOperationInput(BaseModel):
+    operation: str
+    params: Dict[str, Any] = {}
+
+def _get_entry(handle: str) -> DatasetEntry:
+    try:
+        return dataset_store.get(handle)
+    except KeyError:
+        raise DataPreprocessingError(f"Dataset handle '{handle}' not found or expired", status_code=404)
+
+@router.get("", response_model=ResponseModel)
+async def api_dataset_store_stats():
+    return ResponseModel(success=True, message="Dataset store statistics", data=dataset_store.stats())
+
+@router.post("", response_model=ResponseModel)
+async def api_open_dataset(
+    file: UploadFile = File(...),
+    sheet_name: Optional[str] = Form(None)
+):
+    """Parse an uploaded file once and keep it in memory under a new dataset handle."""
+    content = await read_upload(file)
+    filename = file.filename or "data.csv"
+    try:
+        df = await run_in_threadpool(cleaning_tools.load_df_from_bytes, content, filename, sheet_name)
+        entry = dataset_store.put(df, filename, sheet_name)
+    except MemoryError as e:
+        raise DataPreprocessingError(str(e), status_code=413)
+    except Exception as e:
+        raise DataPreprocessingError(f"Failed to load dataset: {e}")
+    return ResponseModel(success=True, message=f"Dataset loaded as {entry.handle}", data=entry.info())
+
+@router.get("/{handle}/info", response_model=ResponseModel)
+async def api_dataset_info(handle: str):
+    entry = _get_entry(handle)
+    return ResponseModel(success=True, message="Dataset info", data=entry.info())
+
+@router.post("/{handle}/operations", response_model=ResponseModel)
+async def api_apply_dataset_operation(handle: str, input: DatasetOperationInput):
+    """Apply a registered operation to the stored DataFrame without transferring the file."""
+    try:
+        name, params_model, func = resolve_operation(input.operation)
+    except KeyError as e:
+        raise DataPreprocessingError(e.args[0], status_code=404)
+    entry = _get_entry(handle)
+    try:
+        params = params_model.model_validate(input.params)
+        # One operation per handle at a time, so concurrent calls apply in turn instead of overwriting each other
+        async with entry.lock:
+            version = entry.version
+            # Frames over the inline limit are pickled to a worker process, so the work runs outside this GIL
+            df, result = await worker_pool.run(partial(func, entry.df, **operation_kwargs(params)), entry.nbytes)
+            entry = dataset_store.update(handle, df, name, expected_version=version)
+    except StaleDatasetError as e:
+        raise DataPreprocessingError(str(e), status_code=409)
+    except HTTPException:
+        # Busy (429) or crashed (503) worker pool
+        raise
+    except KeyError:
+        raise DataPreprocessingError(f"Dataset handle '{handle}' not found or expired", status_code=404)
+    except MemoryError as e:
+        raise DataPreprocessingError(str(e), status_code=413)
+    except ValueError as e:
+        raise DataPreprocessingError(str(e))
+    except Exception as e:
+        logger.error(f"{input.operation} on {handle} failed: {e}", exc_info=True)
+        raise DataPreprocessingError(f"{input.operation} failed: {e}", status_code=500)
+    result.update(handle=handle, rows=len(df), columns=df.columns.tolist())
+    return ResponseModel(success=True, message=result["message"], data=result)
+
+@router.get("/{handle}")
+async def api_materialize_dataset(handle: str, accept: Optional[str] = Header(None)):
+    """Serialize the stored DataFrame and stream it back, in its original format unless Parquet/Arrow is requested."""
+    entry = _get_entry(handle)
+    filename = negotiate_filename(entry.original_filename, accept)
+    content = await run_in_threadpool(cleaning_tools.df_to_bytes, entry.df, filename, entry.sheet_name)
+    return binary_file_response(content, filename, entry.info())
+
+@router.delete("/{handle}", response_model=ResponseModel)
+async def api_close_dataset(handle: str):
+    if not dataset_store.delete(handle):
+        raise DataPreprocessingError(f"Dataset handle '{handle}' not found or expired", status_code=404)
+    return ResponseModel(success=True, message=f"Dataset {handle} released")
@@ -0,0 +1,178 @@
+from fastapi import APIRouter, File, UploadFile, Form, Header
+from pydantic import BaseModel
+from typing import Dict, List, Any, Optional, Tuple
+from functools import partial
+import json
+import logging
+import time
+
+import pandas as pd
+
+from api.endpoints.cleaning import ResponseModel, DataPreprocessingError, operation_kwargs
+from api.executor import run_cached, worker_pool
+from api.operations import resolve_operation
+from api.transport import read_upload, binary_file_response, negotiate_filename
+from utils import cleaning_tools
+from utils.dataset_store import dataset_store, StaleDatasetError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class PipelineStep(BaseModel):
+    operation: str
+    params: Dict[str, Any] = {}
+
+class PipelineInput(BaseModel):
+    dataset_handle: str
+    steps: List[PipelineStep]
+
+class PipelineStepError(Exception):
+    def __init__(self, index: int, operation: str, error: str, report: List[Dict[str, Any]]):
+        super().__init__(f"Step {index} ({operation}) failed: {error}")
+        self.index, self.operation, self.error, self.report = index, operation, error, report
+
+    def __reduce__(self):
+        # Raised inside worker processes, so it must survive pickling with all of its fields
+        return PipelineStepError, (self.index, self.operation, self.error, self.report)
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+def execute_steps(df: pd.DataFrame, steps: List[PipelineStep]) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """Run the steps in order over one DataFrame, timing each one.
+
+    Every step's parameters are validated before the first step runs.
+    """
+    resolved = []
+    for index, step in enumerate(steps):
+        try:
+            name, params_model, func = resolve_operation(step.operation)
+            resolved.append((name, func, params_model.model_validate(step.params)))
+        except KeyError as e:
+            raise PipelineStepError(index, step.operation, e.args[0], [])
+        except ValueError as e:
+            raise PipelineStepError(index, step.operation, str(e), [])
+
+    report: List[Dict[str, Any]] = []
+    for index, (name, func, params) in enumerate(resolved):
+        start = time.perf_counter()
+        try:
+            df, details = func(df, **operation_kwargs(params))
+        except Exception as e:
+            report.append({"step": index, "operation": name, "success": False,
+                           "duration_ms": _elapsed_ms(start), "error": str(e)})
+            raise PipelineStepError(index, name, str(e), report)
+        report.append({
+            "step": index,
+            "operation": name,
+            "success": True,
+            "duration_ms": _elapsed_ms(start),
+            "message": details.pop("message", ""),
+            "details": details,
+        })
+    return df, report
+
+def run_pipeline_on_bytes(content: bytes, filename: str, sheet_name: Optional[str], steps: List[PipelineStep],
+                          output_filename: str) -> Tuple[bytes, Dict[str, Any]]:
+    """Parse, run every step and serialize in one go; runs inside a worker process for large files."""
+    start = time.perf_counter()
+    try:
+        df = cleaning_tools.load_df_from_bytes(content, filename, sheet_name)
+    except Exception as e:
+        raise ValueError(f"Failed to load dataset: {e}")
+    parse_ms = _elapsed_ms(start)
+
+    df, report = execute_steps(df, steps)
+
+    serialize_start = time.perf_counter()
+    output = cleaning_tools.df_to_bytes(df, output_filename, sheet_name)
+    return output, {
+        "message": f"Pipeline of {len(report)} steps completed",
+        "rows": len(df),
+        "columns": len(df.columns),
+        "parse_ms": parse_ms,
+        "serialize_ms": _elapsed_ms(serialize_start),
+        "total_ms": _elapsed_ms(start),
+        "steps": report,
+    }
+
+def _parse_steps(raw: str) -> List[PipelineStep]:
+    try:
+        return [PipelineStep.model_validate(step) for step in json.loads(raw)]
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        raise DataPreprocessingError(f"Invalid steps: {e}", status_code=422)
+
+def _normalize_steps(steps: List[PipelineStep]) -> List[Dict[str, Any]]:
+    """Resolve names and fill parameter defaults so equivalent pipelines share a cache key."""
+    normalized = []
+    for step in steps:
+        try:
+            name, params_model, _ = resolve_operation(step.operation)
+            normalized.append({"operation": name, "params": params_model.model_validate(step.params).model_dump()})
+        except (KeyError, ValueError):
+            # Invalid steps fail inside the job and are never cached
+            normalized.append(step.model_dump())
+    return normalized
+
+def _step_error(e: PipelineStepError) -> DataPreprocessingError:
+    return DataPreprocessingError({"error": str(e), "steps": e.report})
+
+@router.post("", response_model=ResponseModel)
+async def api_run_pipeline_on_handle(input: PipelineInput):
+    """Run an ordered list of operations against a dataset handle; the stored frame is only replaced if every step succeeds."""
+    try:
+        entry = dataset_store.get(input.dataset_handle)
+    except KeyError:
+        raise DataPreprocessingError(f"Dataset handle '{input.dataset_handle}' not found or expired", status_code=404)
+
+    start = time.perf_counter()
+    try:
+        async with entry.lock:
+            version = entry.version
+            df, report = await worker_pool.run(partial(execute_steps, entry.df, input.steps), entry.nbytes)
+            dataset_store.update(entry.handle, df, f"pipeline[{len(report)}]", expected_version=version)
+    except StaleDatasetError as e:
+        raise DataPreprocessingError(str(e), status_code=409)
+    except KeyError:
+        raise DataPreprocessingError(f"Dataset handle '{input.dataset_handle}' not found or expired", status_code=404)
+    except PipelineStepError as e:
+        raise _step_error(e)
+    except MemoryError as e:
+        raise DataPreprocessingError(str(e), status_code=413)
+
+    return ResponseModel(
+        success=True,
+        message=f"Pipeline of {len(report)} steps completed",
+        data={
+            "handle": entry.handle,
+            "rows": len(df),
+            "columns": df.columns.tolist(),
+            "total_ms": _elapsed_ms(start),
+            "steps": report,
+        },
+    )
+
+@router.post("/binary")
+async def api_run_pipeline_binary(
+    file: UploadFile = File(...),
+    steps: str = Form(...),
+    sheet_name: Optional[str] = Form(None),
+    accept: Optional[str] = Header(None)
+):
+    """Upload a file, run every step over one in-memory DataFrame and stream back the final file."""
+    parsed_steps = _parse_steps(steps)
+    content = await read_upload(file)
+    filename = file.filename or "data.csv"
+
+    output_filename = negotiate_filename(filename, accept)
+    try:
+        output, result = await run_cached(
+            "pipeline", content, {"sheet_name": sheet_name, "steps": _normalize_steps(parsed_steps)}, output_filename,
+            partial(run_pipeline_on_bytes, content, filename, sheet_name, parsed_steps, output_filename),
+        )
+    except PipelineStepError as e:
+        raise _step_error(e)
+    except ValueError as e:
+        raise DataPreprocessingError(str(e))
+    return binary_file_response(output, output_filename, result)
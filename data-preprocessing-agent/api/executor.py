@@ -0,0 +1,148 @@
+"""
+Process pool for CPU-bound preprocessing work.
+
+Handlers are `async def`, so pandas work run directly in them blocks the event loop
+for every other request. Self-contained jobs (bytes or file paths in, bytes or
+files out) are sent to a bounded pool of worker processes instead, which spreads
+them across cores. Small payloads run on a thread in the API process because
+pickling them to a worker would cost more than the work itself.
+
+When every worker is busy and the queue is full, new jobs are rejected right away
+with 429 and a Retry-After header instead of piling up.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from utils.result_cache import result_cache, cache_key, content_digest
+
+logger = logging.getLogger(__name__)
+
+WORKER_PROCESSES = int(os.environ.get("PREPROCESSING_WORKERS", str(os.cpu_count() or 2)))
+MAX_QUEUED_JOBS = int(os.environ.get("PREPROCESSING_MAX_QUEUE", str(WORKER_PROCESSES * 4)))
+RETRY_AFTER_SECONDS = int(os.environ.get("PREPROCESSING_RETRY_AFTER_SECONDS", "5"))
+INLINE_MAX_BYTES = int(float(os.environ.get("PREPROCESSING_INLINE_MAX_MB", "1")) * 1024 * 1024)
+# Forking a process that already runs threads and an event loop is unsafe, so workers are spawned
+START_METHOD = os.environ.get("PREPROCESSING_START_METHOD", "spawn")
+
+T = TypeVar("T")
+
+def _warm_up() -> None:
+    """Import the heavy modules once per worker so the first job does not pay for it."""
+    import utils.cleaning_tools  # noqa: F401
+    import utils.chunked_cleaning  # noqa: F401
+
+class WorkerPool:
+    def __init__(self, workers: int = WORKER_PROCESSES, max_queue: int = MAX_QUEUED_JOBS,
+                 inline_max_bytes: int = INLINE_MAX_BYTES):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.inline_max_bytes = inline_max_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.inline = 0
+        self.crashes = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(START_METHOD),
+                    initializer=_warm_up,
+                )
+            return self._executor
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, job: Callable[[], T], payload_bytes: int = 0) -> T:
+        """Run a picklable zero-argument callable (e.g. a functools.partial) off the event loop."""
+        if payload_bytes <= self.inline_max_bytes:
+            self.inline += 1
+            return await run_in_threadpool(job)
+
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Preprocessing workers are busy, retry later",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+        self.in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), job)
+        except BrokenProcessPool:
+            # A worker died (typically killed for using too much memory); start a fresh pool for later jobs
+            self.crashes += 1
+            logger.error("Preprocessing worker crashed; restarting the process pool")
+            self._reset()
+            raise HTTPException(
+                status_code=503,
+                detail="Preprocessing worker crashed, possibly out of memory",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    def start(self) -> None:
+        self._get_executor()
+
+    def shutdown(self) -> None:
+        self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "inline": self.inline,
+            "crashes": self.crashes,
+            "inline_max_bytes": self.inline_max_bytes,
+        }
+
+worker_pool = WorkerPool()
+
+async def run_cached(operation: str, content: bytes, params: Dict[str, Any], output_filename: str,
+                     job: Callable[[], Tuple[bytes, Dict[str, Any]]]) -> Tuple[bytes, Dict[str, Any]]:
+    """Serve an (output bytes, details) result from the result cache, or run the job in the pool and store it."""
+    if not result_cache.enabled:
+        return await worker_pool.run(job, len(content))
+
+    digest = await run_in_threadpool(content_digest, content)
+    key = cache_key(digest, operation, params, os.path.splitext(output_filename)[1].lower())
+    cached = await run_in_threadpool(result_cache.get, key)
+    if cached is not None:
+        output, details = cached
+        return output, {**details, "cache": "hit"}
+
+    start = time.perf_counter()
+    output, details = await worker_pool.run(job, len(content))
+    try:
+        await run_in_threadpool(result_cache.put, key, output, details, (time.perf_counter() - start) * 1000)
+    except Exception as e:
+        # The operation succeeded; a cache that cannot be written (disk full, permissions) only costs a rerun later
+        logger.warning(f"Could not cache the result of {operation}: {e}")
+    return output, {**details, "cache": "miss"}
@@ -0,0 +1,45 @@
+"""
+Registry of DataFrame-level operations exposed by the endpoint modules.
+
+Each endpoint module may define an `OPERATIONS` dict mapping an operation name to
+`(params_model, func)`, where `func(df, **params)` returns `(df, details)`. They are
+registered here as `<category>/<operation>` so dataset handles and the pipeline
+endpoint can run any of them against an in-memory DataFrame.
+"""
+
+from typing import Any, Callable, Dict, Tuple, Type
+
+from pydantic import BaseModel
+
+from api.endpoints import cleaning, transformation, feature_engineering, data_reduction, data_validation
+
+OperationSpec = Tuple[Type[BaseModel], Callable[..., Tuple[Any, Dict[str, Any]]]]
+
+OPERATION_MODULES = {
+    "cleaning": cleaning,
+    "transformation": transformation,
+    "feature-engineering": feature_engineering,
+    "data-reduction": data_reduction,
+    "data-validation": data_validation,
+}
+
+def _build_registry() -> Dict[str, OperationSpec]:
+    registry: Dict[str, OperationSpec] = {}
+    for category, module in OPERATION_MODULES.items():
+        for name, spec in getattr(module, "OPERATIONS", {}).items():
+            registry[f"{category}/{name}"] = spec
+    return registry
+
+OPERATIONS: Dict[str, OperationSpec] = _build_registry()
+
+def resolve_operation(name: str) -> Tuple[str, Type[BaseModel], Callable]:
+    """Look up an operation by `category/operation`, or by bare name when it is unambiguous."""
+    name = name.strip("/")
+    if name in OPERATIONS:
+        return (name, *OPERATIONS[name])
+    matches = [key for key in OPERATIONS if key.split("/", 1)[1] == name]
+    if len(matches) == 1:
+        return (matches[0], *OPERATIONS[matches[0]])
+    if matches:
+        raise KeyError(f"Operation '{name}' is ambiguous, use one of {matches}")
+    raise KeyError(f"Unknown operation '{name}'")
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from api.endpoints import cleaning, transformation, feature_engineering,data_reduction,data_validation
+from api.endpoints import cleaning, transformation, feature_engineering,data_reduction,data_validation, datasets, pipeline
 
 
 
@@ -11,3 +11,5 @@ api_router.include_router(transformation.router, prefix="/transformation", tags=
 api_router.include_router(feature_engineering.router, prefix="/feature-engineering", tags=["Feature Engineering"])
 api_router.include_router(data_reduction.router, prefix="/data-reduction", tags=["Data Reduction"])
 api_router.include_router(data_validation.router, prefix="/data-validation", tags=["Data Validation"])
+api_router.include_router(datasets.router, prefix="/datasets", tags=["Datasets"])
+api_router.include_router(pipeline.router, prefix="/pipeline", tags=["Pipeline"])
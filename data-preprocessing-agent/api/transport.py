@@ -0,0 +1,84 @@
+"""
+Binary transport helpers shared by the preprocessing endpoints.
+
+Files travel as raw multipart uploads and come back as streamed bodies, so the
+service never builds base64 copies of the dataset. Operation details that used
+to live next to `file_content_base64` in the JSON response are returned in the
+`X-Operation-Result` header as JSON.
+
+Callers negotiate the response format with the Accept header: asking for Parquet or
+Arrow IPC keeps typed columnar data between services, anything else returns the
+file in its original format.
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterator, Optional, Type, TypeVar
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from utils.cleaning_tools import get_media_type, interchange_filename
+
+RESULT_HEADER = "X-Operation-Result"
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+ACCEPTED_INTERCHANGE_TYPES = {
+    "application/vnd.apache.parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+}
+
+ParamsT = TypeVar("ParamsT", bound=BaseModel)
+
+def parse_params(raw: str, model: Type[ParamsT]) -> ParamsT:
+    """Validate the JSON `params` form field against an operation's parameter model."""
+    try:
+        return model.model_validate(json.loads(raw or "{}"))
+    except (json.JSONDecodeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid params: {e}")
+
+def negotiate_filename(filename: str, accept: Optional[str]) -> str:
+    """Return the filename to serialize the response as, based on the Accept header."""
+    for media_type in (accept or "").split(","):
+        interchange_format = ACCEPTED_INTERCHANGE_TYPES.get(media_type.split(";")[0].strip())
+        if interchange_format:
+            return interchange_filename(filename, interchange_format)
+    return filename
+
+async def read_upload(file: UploadFile) -> bytes:
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    return content
+
+async def save_upload_to_temp(file: UploadFile) -> str:
+    """Spool an upload to a temp file chunk by chunk, never holding the whole body in memory."""
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(file.filename or "")[1])
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(STREAM_CHUNK_SIZE):
+            out.write(chunk)
+    return path
+
+def remove_files(*paths: str) -> None:
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+def _iter_chunks(content: bytes) -> Iterator[bytes]:
+    view = memoryview(content)
+    for start in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield bytes(view[start:start + STREAM_CHUNK_SIZE])
+
+def binary_file_response(content: bytes, filename: str, result: Dict[str, Any]) -> StreamingResponse:
+    """Stream file bytes back with the operation details attached as a header."""
+    return StreamingResponse(
+        _iter_chunks(content),
+        media_type=get_media_type(filename),
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(len(content)),
+            RESULT_HEADER: json.dumps(result, default=str),
+        },
+    )
@@ -2,6 +2,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from api.routes import api_router
+from api.executor import worker_pool
+from utils.result_cache import result_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,10 +27,30 @@ app.add_middleware(
 # Include all routes
 app.include_router(api_router)
 
+@app.on_event("startup")
+async def start_worker_pool():
+    worker_pool.start()
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    worker_pool.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "Data Preprocessing API - Use /docs for API documentation"}
 
+@app.get("/workers")
+async def worker_stats():
+    return worker_pool.stats()
+
+@app.get("/cache")
+async def cache_stats():
+    return result_cache.stats()
+
+@app.delete("/cache")
+async def clear_cache():
+    return {"entries_removed": result_cache.clear()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
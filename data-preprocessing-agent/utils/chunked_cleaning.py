@@ -0,0 +1,379 @@
+"""
+Out-of-core cleaning operations for files larger than memory.
+
+Files are read and written in row chunks so peak memory is bounded by the chunk
+size rather than the file size. Operations that need global statistics make two
+passes: the first accumulates the statistics, the second applies them.
+
+- Means and standard deviations are exact (merged per-chunk moments).
+- Medians and IQR quantiles are estimated from a bounded uniform reservoir sample.
+- Duplicate detection is exact: a first pass finds which 64-bit row hashes repeat,
+  the second compares rows with a repeated hash against the rows kept so far, so a
+  hash collision never drops a distinct row. Memory is 8 bytes per row plus one copy
+  of each row that has duplicates.
+
+Only CSV and Parquet inputs are supported; the output uses the input's format.
+"""
+
+import logging
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import dedup
+from utils.cleaning_tools import clean_text_df, compile_text_operations, outlier_keep_mask, OutlierBounds
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE_ROWS = int(os.environ.get("CHUNK_SIZE_ROWS", "100000"))
+QUANTILE_SAMPLE_SIZE = int(os.environ.get("CHUNK_QUANTILE_SAMPLE_SIZE", "200000"))
+
+CHUNKED_EXTENSIONS = (".csv", ".parquet")
+
+def _extension(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in CHUNKED_EXTENSIONS:
+        raise ValueError(f"Chunked mode supports CSV and Parquet files, got '{extension or path}'")
+    return extension
+
+def iter_chunks(path: str, chunksize: int = CHUNK_SIZE_ROWS, **csv_kwargs) -> Iterator[pd.DataFrame]:
+    """Yield the file as DataFrames of at most chunksize rows."""
+    if _extension(path) == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, **csv_kwargs)
+
+def _unify_schemas(current, new):
+    """Schema that can hold both: null columns take the other side's type, other conflicts widen or fall back to string."""
+    import pyarrow as pa
+    fields = []
+    for field in current:
+        other = new.field(field.name) if field.name in new.names else field
+        if field.type == other.type or pa.types.is_null(other.type):
+            fields.append(field)
+        elif pa.types.is_null(field.type):
+            fields.append(other)
+        else:
+            try:
+                fields.append(pa.unify_schemas([pa.schema([field]), pa.schema([other])],
+                                               promote_options="permissive").field(0))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                fields.append(pa.field(field.name, pa.string()))
+    return pa.schema(fields, metadata=current.metadata)
+
+class ChunkWriter:
+    """Append DataFrame chunks to a CSV or Parquet file.
+
+    The Parquet schema comes from the first chunk. A later chunk whose types do not
+    fit (e.g. a column that was all null so far) widens it; what was written until
+    then is rewritten under the wider schema, batch by batch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.extension = _extension(path)
+        self.rows = 0
+        self._columns: Optional[List[str]] = None
+        self._parquet_writer = None
+        self._schema = None
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self._columns is None:
+            self._columns = chunk.columns.tolist()
+        if chunk.empty:
+            return
+        if self.extension == ".parquet":
+            self._write_parquet(chunk)
+        else:
+            chunk.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(chunk)
+
+    def _write_parquet(self, chunk: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._parquet_writer is None:
+            self._schema = table.schema
+            self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+        elif not table.schema.equals(self._schema):
+            try:
+                table = table.cast(self._schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                self._widen(_unify_schemas(self._schema, table.schema))
+                table = table.cast(self._schema)
+        self._parquet_writer.write_table(table)
+
+    def _widen(self, schema) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        logger.info(f"Widening Parquet schema of {self.path} after {self.rows} rows")
+        self._parquet_writer.close()
+        previous = f"{self.path}.narrow"
+        os.replace(self.path, previous)
+        try:
+            self._parquet_writer = pq.ParquetWriter(self.path, schema)
+            for batch in pq.ParquetFile(previous).iter_batches():
+                self._parquet_writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        finally:
+            os.remove(previous)
+        self._schema = schema
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        elif not self.rows:
+            # Nothing survived: still produce a valid file with the original columns
+            empty = pd.DataFrame(columns=self._columns or [])
+            if self.extension == ".parquet":
+                empty.to_parquet(self.path, index=False)
+            else:
+                empty.to_csv(self.path, index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _stream(src: str, dst: str, transform: Callable[[pd.DataFrame], pd.DataFrame],
+            chunksize: int, **csv_kwargs) -> Dict[str, Any]:
+    rows_before = chunks = 0
+    with ChunkWriter(dst) as writer:
+        for chunk in iter_chunks(src, chunksize, **csv_kwargs):
+            rows_before += len(chunk)
+            chunks += 1
+            writer.write(transform(chunk))
+    return {"rows_before": rows_before, "rows_after": writer.rows, "chunks": chunks, "chunk_size": chunksize}
+
+def _check_columns(chunk: pd.DataFrame, columns: Optional[List[str]]) -> None:
+    missing = [col for col in columns or [] if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Columns not found in dataset: {missing}")
+
+class _RunningMoments:
+    """Exact count/mean/variance per column, merged chunk by chunk (Chan et al.)."""
+
+    def __init__(self):
+        self.count = self.mean = self.m2 = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        count = chunk.count().astype(float)
+        mean = chunk.mean().fillna(0.0)
+        m2 = ((chunk - mean) ** 2).sum()
+        if self.count is None:
+            self.count, self.mean, self.m2 = count, mean, m2
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        weight = (count / total.replace(0, np.nan)).fillna(0.0)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * weight
+        self.count = total
+
+    def std(self) -> pd.Series:
+        return np.sqrt(self.m2 / (self.count - 1).where(self.count > 1))
+
+class _ReservoirSample:
+    """Bounded uniform sample of each column, used to estimate quantiles."""
+
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.values: Dict[str, np.ndarray] = {}
+        self.keys: Dict[str, np.ndarray] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        # Keep the `size` values with the smallest random keys: a uniform sample of everything seen
+        for col in chunk.columns:
+            values = chunk[col].dropna().to_numpy(dtype=float)
+            keys = self.rng.random(len(values))
+            if col in self.values:
+                values = np.concatenate([self.values[col], values])
+                keys = np.concatenate([self.keys[col], keys])
+            if len(values) > self.size:
+                keep = np.argpartition(keys, self.size)[:self.size]
+                values, keys = values[keep], keys[keep]
+            self.values[col], self.keys[col] = values, keys
+
+    def quantile(self, q: float) -> pd.Series:
+        return pd.Series({col: np.quantile(v, q) if len(v) else np.nan for col, v in self.values.items()})
+
+def _numeric(chunk: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    return chunk[columns].apply(pd.to_numeric, errors="coerce")
+
+def _row_tuples(df: pd.DataFrame) -> List[tuple]:
+    """Rows as tuples with every missing value as None, so equal rows compare equal."""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+def remove_duplicates_chunked(src: str, dst: str, subset: Optional[List[str]] = None, keep: str = "first",
+                              method: str = "exact", chunksize: int = CHUNK_SIZE_ROWS,
+                              **_: Any) -> Dict[str, Any]:
+    """Drop duplicate rows across the whole file, keeping the first occurrence.
+
+    The first pass hashes every row (8 bytes each) and finds the hashes that occur more
+    than once. The second pass keeps rows with a unique hash outright and compares the
+    others against the distinct rows kept so far for that hash, so only actual
+    duplicates are dropped. CSV cells are compared as text so dtype inference cannot
+    differ between chunks.
+    """
+    if method != "exact" or keep != "first":
+        raise ValueError("Chunked mode only supports method='exact' with keep='first'")
+    csv_kwargs = {"dtype": str, "keep_default_na": False}
+
+    hashes = []
+    for chunk in iter_chunks(src, chunksize, **csv_kwargs):
+        _check_columns(chunk, subset)
+        hashes.append(dedup.row_hashes(chunk[subset] if subset else chunk))
+    all_hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+    unique, counts = np.unique(all_hashes, return_counts=True)
+    repeated = unique[counts > 1]
+    del hashes, all_hashes, unique, counts
+
+    kept_rows: Dict[int, List[tuple]] = {}
+    collisions = 0
+
+    def transform(chunk: pd.DataFrame) -> pd.DataFrame:
+        nonlocal collisions
+        keyed = chunk[subset] if subset else chunk
+        chunk_hashes = dedup.row_hashes(keyed)
+        slots = np.minimum(np.searchsorted(repeated, chunk_hashes), max(len(repeated) - 1, 0))
+        candidates = np.flatnonzero(repeated[slots] == chunk_hashes) if len(repeated) else np.empty(0, dtype=int)
+        keep_mask = np.ones(len(chunk), dtype=bool)
+        for position, row in zip(candidates, _row_tuples(keyed.iloc[candidates])):
+            seen = kept_rows.setdefault(int(chunk_hashes[position]), [])
+            if row in seen:
+                keep_mask[position] = False
+            else:
+                collisions += bool(seen)
+                seen.append(row)
+        return chunk[keep_mask]
+
+    result = _stream(src, dst, transform, chunksize, **csv_kwargs)
+    if collisions:
+        logger.warning(f"{collisions} rows shared a hash with a different row; kept as distinct")
+    removed = result["rows_before"] - result["rows_after"]
+    result.update(message=f"Removed {removed} duplicate rows", duplicates_removed=removed, hash_collisions=collisions)
+    return result
+
+def handle_missing_values_chunked(src: str, dst: str, strategy: str, columns: Optional[List[str]] = None,
+                                  fill_value: Optional[Any] = None,
+                                  chunksize: int = CHUNK_SIZE_ROWS) -> Dict[str, Any]:
+    """Fill or drop missing values; mean/median/mode statistics come from a first pass over the file."""
+    if strategy not in ("mean", "median", "mode", "constant", "drop"):
+        raise ValueError(f"Unknown strategy '{strategy}'. Use mean, median, mode, constant or drop")
+    if strategy == "constant" and fill_value is None:
+        raise ValueError("fill_value is required when strategy is 'constant'")
+
+    first = next(iter_chunks(src, chunksize), None)
+    if first is None:
+        raise ValueError("File is empty")
+    _check_columns(first, columns)
+    columns = columns or first.columns.tolist()
+    numeric = first[columns].select_dtypes(include=np.number).columns.tolist()
+
+    fill: Any = fill_value
+    approximate = False
+    if strategy == "mean":
+        moments = _RunningMoments()
+        for chunk in iter_chunks(src, chunksize):
+            moments.update(_numeric(chunk, numeric))
+        fill = moments.mean.where(moments.count > 0)
+    elif strategy == "median":
+        sample = _ReservoirSample(QUANTILE_SAMPLE_SIZE)
+        for chunk in iter_chunks(src, chunksize):
+            sample.update(_numeric(chunk, numeric))
+        fill = sample.quantile(0.5)
+        approximate = any(len(v) >= QUANTILE_SAMPLE_SIZE for v in sample.values.values())
+    elif strategy == "mode":
+        counts: Dict[str, pd.Series] = {}
+        for chunk in iter_chunks(src, chunksize):
+            for col in columns:
+                vc = chunk[col].value_counts(dropna=True)
+                counts[col] = vc if col not in counts else counts[col].add(vc, fill_value=0)
+        fill = pd.Series({col: vc.idxmax() for col, vc in counts.items() if not vc.empty})
+
+    missing_before = 0
+
+    def transform(chunk: pd.DataFrame) -> pd.DataFrame:
+        nonlocal missing_before
+        missing_before += int(chunk[columns].isna().sum().sum())
+        if strategy == "drop":
+            return chunk.dropna(subset=columns)
+        chunk = chunk.copy()
+        targets = numeric if strategy in ("mean", "median") else columns
+        chunk[targets] = chunk[targets].fillna(fill)
+        return chunk
+
+    result = _stream(src, dst, transform, chunksize)
+    result.update(
+        message=f"Handled missing values using '{strategy}' strategy in {result['chunks']} chunks",
+        missing_before=missing_before,
+        approximate=approximate,
+    )
+    if isinstance(fill, pd.Series):
+        result["fill_values"] = {str(k): (None if pd.isna(v) else v) for k, v in fill.items()}
+    return result
+
+def remove_outliers_chunked(src: str, dst: str, method: str, threshold: float, columns: List[str],
+                            bounds: Optional[OutlierBounds] = None,
+                            chunksize: int = CHUNK_SIZE_ROWS) -> Dict[str, Any]:
+    """Remove outlier rows using bounds computed in a first pass over the file, or provided by the caller."""
+    bounds_source = "provided" if bounds else "computed"
+    if not bounds:
+        if method == "zscore":
+            moments = _RunningMoments()
+            for chunk in iter_chunks(src, chunksize):
+                _check_columns(chunk, columns)
+                moments.update(_numeric(chunk, columns))
+            std = moments.std().where(lambda spread: spread > 0)
+            lower, upper = moments.mean - threshold * std, moments.mean + threshold * std
+        elif method == "iqr":
+            sample = _ReservoirSample(QUANTILE_SAMPLE_SIZE)
+            for chunk in iter_chunks(src, chunksize):
+                _check_columns(chunk, columns)
+                sample.update(_numeric(chunk, columns))
+            q1, q3 = sample.quantile(0.25), sample.quantile(0.75)
+            lower, upper = q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1)
+        else:
+            raise ValueError(f"Unknown outlier method '{method}'. Use zscore or iqr")
+        bounds = {
+            col: {
+                "lower": None if pd.isna(lower[col]) else float(lower[col]),
+                "upper": None if pd.isna(upper[col]) else float(upper[col]),
+            }
+            for col in columns
+        }
+
+    def transform(chunk: pd.DataFrame) -> pd.DataFrame:
+        _check_columns(chunk, columns)
+        return chunk[outlier_keep_mask(_numeric(chunk, columns), bounds)]
+
+    result = _stream(src, dst, transform, chunksize)
+    removed = result["rows_before"] - result["rows_after"]
+    result.update(
+        message=f"Removed {removed} outlier rows using {bounds_source} '{method}' bounds in {result['chunks']} chunks",
+        outliers_removed=removed,
+        bounds={col: bounds[col] for col in columns},
+        bounds_source=bounds_source,
+    )
+    return result
+
+def clean_text_chunked(src: str, dst: str, column: Optional[str] = None, operation: Optional[str] = None,
+                       columns: Optional[List[str]] = None, operations: Optional[List[str]] = None,
+                       chunksize: int = CHUNK_SIZE_ROWS) -> Dict[str, Any]:
+    """Apply a chain of text operations chunk by chunk; no statistics are needed."""
+    columns = columns or ([column] if column else [])
+    operations = operations or ([operation] if operation else [])
+    if not columns:
+        raise ValueError("At least one column is required")
+    compile_text_operations(operations)
+
+    result = _stream(src, dst, lambda chunk: clean_text_df(chunk, columns=columns, operations=operations)[0],
+                     chunksize)
+    result.update(message=f"Applied {', '.join(operations)} to {', '.join(columns)} in {result['chunks']} chunks",
+                  columns=columns, operations=operations)
+    return result
@@ -1,32 +1,360 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional, Union
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, List, Any, Optional, Tuple, Union
 import base64
 import io
 import os
 
+from utils import dedup
+
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+ARROW_EXTENSIONS = (".arrow", ".feather")
+
+# Columnar formats used between services; user-facing formats are only produced on final export
+INTERCHANGE_EXTENSIONS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+MEDIA_TYPES = {
+    ".csv": "text/csv",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".xls": "application/vnd.ms-excel",
+    ".json": "application/json",
+    ".parquet": "application/vnd.apache.parquet",
+    ".arrow": "application/vnd.apache.arrow.file",
+    ".feather": "application/vnd.apache.arrow.file",
+}
+
+def _file_extension(original_filename: str) -> str:
+    return os.path.splitext(original_filename or "")[1].lower()
+
+def get_media_type(original_filename: str) -> str:
+    """Return the MIME type used when sending a file back to the caller."""
+    return MEDIA_TYPES.get(_file_extension(original_filename), "application/octet-stream")
+
+def interchange_filename(original_filename: str, interchange_format: str) -> str:
+    """Swap the extension of a filename for the given interchange format (parquet or arrow)."""
+    if interchange_format not in INTERCHANGE_EXTENSIONS:
+        raise ValueError(f"Unknown interchange format '{interchange_format}'. Use parquet or arrow")
+    return os.path.splitext(original_filename)[0] + INTERCHANGE_EXTENSIONS[interchange_format]
+
+def load_df_from_bytes(content: bytes, original_filename: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
+    """Parse raw file bytes into a DataFrame based on the original file extension."""
+    extension = _file_extension(original_filename)
+    buffer = io.BytesIO(content)
+    if extension == ".parquet":
+        return pd.read_parquet(buffer)
+    if extension in ARROW_EXTENSIONS:
+        return pd.read_feather(buffer)
+    if extension in EXCEL_EXTENSIONS:
+        return pd.read_excel(buffer, sheet_name=sheet_name or 0)
+    if extension == ".json":
+        return pd.read_json(buffer)
+    return pd.read_csv(buffer)
+
+def df_to_bytes(df: pd.DataFrame, original_filename: str, sheet_name: Optional[str] = None) -> bytes:
+    """Serialize a DataFrame to the format implied by the file extension."""
+    extension = _file_extension(original_filename)
+    buffer = io.BytesIO()
+    if extension == ".parquet":
+        df.to_parquet(buffer, index=False)
+    elif extension in ARROW_EXTENSIONS:
+        df.reset_index(drop=True).to_feather(buffer)
+    elif extension in EXCEL_EXTENSIONS:
+        df.to_excel(buffer, sheet_name=sheet_name or "Sheet1", index=False)
+    elif extension == ".json":
+        df.to_json(buffer, orient="records")
+    else:
+        df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
 def _load_df_from_base64(file_content_base64: str, original_filename: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
-    pass
+    return load_df_from_bytes(base64.b64decode(file_content_base64), original_filename, sheet_name)
 
 def _df_to_base64(df: pd.DataFrame, original_filename: str, sheet_name: Optional[str] = None) -> str:
-    pass
+    return base64.b64encode(df_to_bytes(df, original_filename, sheet_name)).decode("utf-8")
+
+def _check_columns(df: pd.DataFrame, columns: Optional[List[str]]) -> None:
+    missing = [col for col in columns or [] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found in dataset: {missing}")
+
+# DataFrame-level operations. Each returns the transformed frame and a dict of
+# details describing what changed, independently of how the file was transported.
+
+def remove_duplicates_df(df: pd.DataFrame, subset: Optional[List[str]] = None, keep: str = "first",
+                         method: str = "exact", text_column: Optional[str] = None,
+                         similarity_threshold: float = 0.8, num_perm: int = 64) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Drop exact duplicates over `subset`, or near-duplicate texts in `text_column` with method='near'."""
+    if keep not in ("first", "last", "none"):
+        raise ValueError("keep must be 'first', 'last' or 'none'")
+    rows_before = len(df)
+    if method == "exact":
+        _check_columns(df, subset)
+        mask, groups = dedup.find_exact_duplicates(df[subset] if subset else df, keep)
+    elif method == "near":
+        if not text_column:
+            raise ValueError("text_column is required when method is 'near'")
+        _check_columns(df, [text_column])
+        mask, groups = dedup.find_near_duplicates(df[text_column], similarity_threshold, num_perm, keep)
+    else:
+        raise ValueError(f"Unknown method '{method}'. Use exact or near")
+
+    df = df[mask].reset_index(drop=True)
+    removed = rows_before - len(df)
+    return df, {
+        "message": f"Removed {removed} {'near-' if method == 'near' else ''}duplicate rows",
+        "rows_before": rows_before,
+        "rows_after": len(df),
+        "duplicates_removed": removed,
+        "method": method,
+        **groups,
+    }
+
+def handle_missing_values_df(df: pd.DataFrame, strategy: str, columns: Optional[List[str]] = None,
+                             fill_value: Optional[Any] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    _check_columns(df, columns)
+    columns = columns or df.columns.tolist()
+    missing_before = int(df[columns].isna().sum().sum())
+    rows_before = len(df)
+    df = df.copy()
+
+    if strategy == "drop":
+        df = df.dropna(subset=columns).reset_index(drop=True)
+    elif strategy == "constant":
+        if fill_value is None:
+            raise ValueError("fill_value is required when strategy is 'constant'")
+        for col in columns:
+            value = fill_value
+            if isinstance(value, str) and pd.api.types.is_numeric_dtype(df[col]):
+                # Form values arrive as strings; keep typed (e.g. Parquet) numeric columns numeric
+                try:
+                    value = pd.to_numeric(value)
+                except ValueError:
+                    pass
+            df[col] = df[col].fillna(value)
+    elif strategy in ("mean", "median"):
+        numeric = df[columns].select_dtypes(include=np.number).columns.tolist()
+        stats = df[numeric].mean() if strategy == "mean" else df[numeric].median()
+        df[numeric] = df[numeric].fillna(stats)
+    elif strategy == "mode":
+        for col in columns:
+            mode = df[col].mode(dropna=True)
+            if not mode.empty:
+                df[col] = df[col].fillna(mode.iloc[0])
+    else:
+        raise ValueError(f"Unknown strategy '{strategy}'. Use mean, median, mode, constant or drop")
+
+    missing_after = int(df[columns].isna().sum().sum())
+    return df, {
+        "message": f"Handled missing values using '{strategy}' strategy",
+        "missing_before": missing_before,
+        "missing_after": missing_after,
+        "rows_before": rows_before,
+        "rows_after": len(df),
+    }
+
+def drop_rows_columns_df(df: pd.DataFrame, axis: int = 1, threshold: Optional[float] = None,
+                         to_drop: Optional[List[Union[str, int]]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    if axis not in (0, 1):
+        raise ValueError("axis must be 0 (rows) or 1 (columns)")
+    shape_before = df.shape
+
+    if to_drop:
+        if axis == 1:
+            _check_columns(df, to_drop)
+            df = df.drop(columns=to_drop)
+        else:
+            df = df.drop(index=[int(i) for i in to_drop]).reset_index(drop=True)
+    elif threshold is not None:
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError("threshold must be between 0.0 and 1.0")
+        if axis == 1:
+            df = df.loc[:, df.isna().mean(axis=0) <= threshold]
+        else:
+            df = df[df.isna().mean(axis=1) <= threshold].reset_index(drop=True)
+    else:
+        raise ValueError("Either threshold or to_drop must be provided")
+
+    dropped = (shape_before[1] - df.shape[1]) if axis == 1 else (shape_before[0] - df.shape[0])
+    label = "columns" if axis == 1 else "rows"
+    return df, {
+        "message": f"Dropped {dropped} {label}",
+        "shape_before": list(shape_before),
+        "shape_after": list(df.shape),
+        f"{label}_dropped": dropped,
+    }
+
+# Text operations run as pyarrow compute kernels. Patterns are RE2 and use Unicode
+# classes so non-ASCII letters, digits and spaces behave as they do in Python's re.
+TEXT_OPERATIONS = ("lowercase", "remove_punctuation", "remove_numbers", "remove_whitespace")
+_REMOVE_PATTERNS = {
+    "remove_punctuation": r"[^\p{L}\p{N}\p{M}_\s\v\p{Z}]",
+    "remove_numbers": r"\p{Nd}+",
+}
+_WHITESPACE_PATTERN = r"[\s\v\p{Z}]+"
+
+TextPlan = List[Tuple[str, Optional[str]]]
+
+def compile_text_operations(operations: List[str]) -> TextPlan:
+    """Turn an ordered list of operations into kernel steps, fusing adjacent removals into one regex pass."""
+    if not operations:
+        raise ValueError("At least one text operation is required")
+    plan: TextPlan = []
+    for operation in operations:
+        if operation not in TEXT_OPERATIONS:
+            raise ValueError(f"Unknown text operation '{operation}'. Use {', '.join(TEXT_OPERATIONS)}")
+        if operation in _REMOVE_PATTERNS:
+            pattern = _REMOVE_PATTERNS[operation]
+            if plan and plan[-1][0] == "remove":
+                pattern = f"{plan.pop()[1]}|{pattern}"
+            plan.append(("remove", pattern))
+        elif operation == "lowercase":
+            plan.append(("lower", None))
+        else:
+            plan.append(("whitespace", None))
+    return plan
+
+def _run_text_plan(values: pd.Series, plan: TextPlan) -> pd.Series:
+    text = pa.array(values.astype("string"), type=pa.large_string(), from_pandas=True)
+    for step, pattern in plan:
+        if step == "lower":
+            text = pc.utf8_lower(text)
+        elif step == "remove":
+            text = pc.replace_substring_regex(text, pattern=pattern, replacement="")
+        else:
+            text = pc.replace_substring_regex(pc.utf8_trim_whitespace(text), pattern=_WHITESPACE_PATTERN, replacement=" ")
+    return pd.Series(pd.arrays.ArrowStringArray(text.cast(pa.string())), index=values.index, name=values.name)
+
+def clean_text_df(df: pd.DataFrame, column: Optional[str] = None, operation: Optional[str] = None,
+                  columns: Optional[List[str]] = None,
+                  operations: Optional[List[str]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Apply a chain of text operations to one or more columns in a single vectorized pass per column."""
+    columns = columns or ([column] if column else [])
+    operations = operations or ([operation] if operation else [])
+    if not columns:
+        raise ValueError("At least one column is required")
+    _check_columns(df, columns)
+    plan = compile_text_operations(operations)
+
+    df = df.copy()
+    for col in columns:
+        df[col] = _run_text_plan(df[col], plan)
+    return df, {
+        "message": f"Applied {', '.join(operations)} to column{'s' if len(columns) > 1 else ''} {', '.join(columns)}",
+        "columns": columns,
+        "operations": operations,
+        "passes": len(plan),
+    }
+
+OutlierBounds = Dict[str, Dict[str, Optional[float]]]
+
+def compute_outlier_bounds(values: pd.DataFrame, method: str, threshold: float) -> OutlierBounds:
+    """Compute per-column {lower, upper} bounds for all columns at once.
+
+    Unbounded sides (no spread or no values) are reported as None so the bounds stay JSON-safe.
+    """
+    if method == "zscore":
+        center, spread = values.mean(), values.std()
+        lower, upper = center - threshold * spread, center + threshold * spread
+        lower, upper = lower.where(spread > 0), upper.where(spread > 0)
+    elif method == "iqr":
+        quartiles = values.quantile([0.25, 0.75])
+        q1, q3 = quartiles.loc[0.25], quartiles.loc[0.75]
+        lower, upper = q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1)
+    else:
+        raise ValueError(f"Unknown outlier method '{method}'. Use zscore or iqr")
+    return {
+        str(col): {
+            "lower": None if pd.isna(lower[col]) else float(lower[col]),
+            "upper": None if pd.isna(upper[col]) else float(upper[col]),
+        }
+        for col in values.columns
+    }
+
+def outlier_keep_mask(values: pd.DataFrame, bounds: OutlierBounds) -> np.ndarray:
+    """Boolean row mask of rows inside the bounds on every column, built in one NumPy pass."""
+    missing = [col for col in values.columns if col not in bounds]
+    if missing:
+        raise ValueError(f"No bounds provided for columns: {missing}")
+    lower = np.array([-np.inf if bounds[c].get("lower") is None else bounds[c]["lower"] for c in values.columns])
+    upper = np.array([np.inf if bounds[c].get("upper") is None else bounds[c]["upper"] for c in values.columns])
+    arr = values.to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        inside = (arr >= lower) & (arr <= upper)
+    return (inside | np.isnan(arr)).all(axis=1)
+
+def remove_outliers_df(df: pd.DataFrame, method: str, threshold: float, columns: List[str],
+                       bounds: Optional[OutlierBounds] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Remove rows outside the bounds of any column using a single combined mask.
+
+    Bounds computed here are returned so they can be passed back in to filter new
+    batches with the same thresholds (train/serve parity).
+    """
+    _check_columns(df, columns)
+    values = df[columns].apply(pd.to_numeric, errors="coerce")
+    bounds_source = "provided" if bounds else "computed"
+    if not bounds:
+        bounds = compute_outlier_bounds(values, method, threshold)
+
+    keep = outlier_keep_mask(values, bounds)
+    rows_before = len(df)
+    df = df[keep].reset_index(drop=True)
+    removed = rows_before - len(df)
+    return df, {
+        "message": f"Removed {removed} outlier rows using {bounds_source} '{method}' bounds",
+        "rows_before": rows_before,
+        "rows_after": len(df),
+        "outliers_removed": removed,
+        "bounds": {col: bounds[col] for col in columns},
+        "bounds_source": bounds_source,
+    }
+
+def apply_base64(func, file_content_base64: str, original_filename: str, sheet_name: Optional[str],
+                 **kwargs) -> Dict[str, Any]:
+    df = _load_df_from_base64(file_content_base64, original_filename, sheet_name)
+    df, details = func(df, **kwargs)
+    details["file_content_base64"] = _df_to_base64(df, original_filename, sheet_name)
+    return details
+
+def apply_binary(func, content: bytes, original_filename: str, sheet_name: Optional[str],
+                 output_filename: Optional[str] = None, **kwargs) -> Tuple[bytes, Dict[str, Any]]:
+    """Run a DataFrame-level operation on raw file bytes, returning raw bytes and details.
+
+    The result is written in the format of output_filename, defaulting to the input format.
+    """
+    df = load_df_from_bytes(content, original_filename, sheet_name)
+    df, details = func(df, **kwargs)
+    return df_to_bytes(df, output_filename or original_filename, sheet_name), details
 
-def remove_duplicates(file_content_base64: str, original_filename: str, sheet_name: Optional[str], subset: Optional[List[str]] = None) -> Dict[str, Any]:
-    pass
+def remove_duplicates(file_content_base64: str, original_filename: str, sheet_name: Optional[str], subset: Optional[List[str]] = None,
+                      keep: str = "first", method: str = "exact", text_column: Optional[str] = None,
+                      similarity_threshold: float = 0.8, num_perm: int = 64) -> Dict[str, Any]:
+    return apply_base64(remove_duplicates_df, file_content_base64, original_filename, sheet_name, subset=subset,
+                        keep=keep, method=method, text_column=text_column,
+                        similarity_threshold=similarity_threshold, num_perm=num_perm)
 
-def handle_missing_values(file_content_base64: str, original_filename: str, sheet_name: Optional[str], strategy: str, 
+def handle_missing_values(file_content_base64: str, original_filename: str, sheet_name: Optional[str], strategy: str,
                          columns: Optional[List[str]] = None, fill_value: Optional[Any] = None) -> Dict[str, Any]:
-    pass
+    return apply_base64(handle_missing_values_df, file_content_base64, original_filename, sheet_name,
+                        strategy=strategy, columns=columns, fill_value=fill_value)
 
-def drop_rows_columns(file_content_base64: str, original_filename: str, sheet_name: Optional[str], 
+def drop_rows_columns(file_content_base64: str, original_filename: str, sheet_name: Optional[str],
                      axis: int = 1, threshold: Optional[float] = None,
                      to_drop: Optional[List[Union[str, int]]] = None) -> Dict[str, Any]:
-    pass
+    return apply_base64(drop_rows_columns_df, file_content_base64, original_filename, sheet_name,
+                        axis=axis, threshold=threshold, to_drop=to_drop)
 
-def clean_text(file_content_base64: str, original_filename: str, sheet_name: Optional[str], column: str, 
-              operation: str) -> Dict[str, Any]:
-    pass
+def clean_text(file_content_base64: str, original_filename: str, sheet_name: Optional[str], column: Optional[str] = None,
+              operation: Optional[str] = None, columns: Optional[List[str]] = None,
+              operations: Optional[List[str]] = None) -> Dict[str, Any]:
+    return apply_base64(clean_text_df, file_content_base64, original_filename, sheet_name,
+                        column=column, operation=operation, columns=columns, operations=operations)
 
-def remove_outliers(file_content_base64: str, original_filename: str, sheet_name: Optional[str], method: str, 
-                   threshold: float, columns: List[str]) -> Dict[str, Any]:
-    pass
\ No newline at end of file
+def remove_outliers(file_content_base64: str, original_filename: str, sheet_name: Optional[str], method: str,
+                   threshold: float, columns: List[str], bounds: Optional[OutlierBounds] = None) -> Dict[str, Any]:
+    return apply_base64(remove_outliers_df, file_content_base64, original_filename, sheet_name,
+                        method=method, threshold=threshold, columns=columns, bounds=bounds)
@@ -0,0 +1,165 @@
+"""
+In-memory store of parsed DataFrames addressed by dataset handles.
+
+Chained preprocessing steps operate on the stored frame instead of re-uploading
+and re-parsing the file for every call. Entries expire after an idle TTL and the
+least recently used ones are evicted once the memory budget or entry limit is hit.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATASET_STORE_MAX_MB = int(os.environ.get("DATASET_STORE_MAX_MB", "1024"))
+DATASET_STORE_MAX_ENTRIES = int(os.environ.get("DATASET_STORE_MAX_ENTRIES", "32"))
+DATASET_TTL_SECONDS = int(os.environ.get("DATASET_TTL_SECONDS", "1800"))
+
+class StaleDatasetError(Exception):
+    """The stored frame changed since the caller read it."""
+
+def dataframe_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+@dataclass
+class DatasetEntry:
+    handle: str
+    df: pd.DataFrame
+    original_filename: str
+    sheet_name: Optional[str]
+    nbytes: int
+    created_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.time)
+    operations: List[str] = field(default_factory=list)
+    version: int = 0
+    # Serializes read-modify-write operations on this handle
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "handle": self.handle,
+            "original_filename": self.original_filename,
+            "sheet_name": self.sheet_name,
+            "rows": len(self.df),
+            "columns": self.df.columns.tolist(),
+            "memory_bytes": self.nbytes,
+            "operations": list(self.operations),
+            "version": self.version,
+            "created_at": self.created_at,
+            "last_access": self.last_access,
+        }
+
+class DatasetStore:
+    """Thread-safe LRU of DataFrames with idle TTL and a total memory budget."""
+
+    def __init__(self, max_bytes: int, max_entries: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, DatasetEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._evictions = 0
+
+    def put(self, df: pd.DataFrame, original_filename: str, sheet_name: Optional[str] = None) -> DatasetEntry:
+        nbytes = dataframe_nbytes(df)
+        if nbytes > self.max_bytes:
+            raise MemoryError(f"Dataset needs {nbytes} bytes, more than the store budget of {self.max_bytes}")
+        entry = DatasetEntry(uuid.uuid4().hex, df, original_filename, sheet_name, nbytes)
+        with self._lock:
+            self._entries[entry.handle] = entry
+            self._total_bytes += nbytes
+            self._evict_locked(keep=entry.handle)
+        return entry
+
+    def get(self, handle: str) -> DatasetEntry:
+        with self._lock:
+            self._expire_locked()
+            entry = self._entries.get(handle)
+            if entry is None:
+                raise KeyError(handle)
+            entry.last_access = time.time()
+            self._entries.move_to_end(handle)
+            return entry
+
+    def update(self, handle: str, df: pd.DataFrame, operation: Optional[str] = None,
+               expected_version: Optional[int] = None) -> DatasetEntry:
+        """Replace the frame stored under a handle after an operation has been applied.
+
+        With expected_version, raises StaleDatasetError if another update landed since
+        the caller read the frame, instead of silently overwriting it.
+        """
+        nbytes = dataframe_nbytes(df)
+        if nbytes > self.max_bytes:
+            raise MemoryError(f"Dataset needs {nbytes} bytes, more than the store budget of {self.max_bytes}")
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                raise KeyError(handle)
+            if expected_version is not None and entry.version != expected_version:
+                raise StaleDatasetError(f"Dataset {handle} is at version {entry.version}, expected {expected_version}")
+            self._total_bytes += nbytes - entry.nbytes
+            entry.df, entry.nbytes = df, nbytes
+            entry.version += 1
+            entry.last_access = time.time()
+            if operation:
+                entry.operations.append(operation)
+            self._entries.move_to_end(handle)
+            self._evict_locked(keep=handle)
+            return entry
+
+    def delete(self, handle: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+            if entry is None:
+                return False
+            self._total_bytes -= entry.nbytes
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire_locked()
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self._evictions,
+            }
+
+    def _remove_locked(self, handle: str, reason: str) -> None:
+        entry = self._entries.pop(handle)
+        self._total_bytes -= entry.nbytes
+        self._evictions += 1
+        logger.info(f"Evicted dataset {handle} ({reason}, {entry.nbytes} bytes)")
+
+    def _expire_locked(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for handle in [h for h, e in self._entries.items() if e.last_access < cutoff]:
+            self._remove_locked(handle, "expired")
+
+    def _evict_locked(self, keep: str) -> None:
+        self._expire_locked()
+        while len(self._entries) > 1 and (
+            self._total_bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove_locked(oldest, "lru")
+
+dataset_store = DatasetStore(
+    max_bytes=DATASET_STORE_MAX_MB * 1024 * 1024,
+    max_entries=DATASET_STORE_MAX_ENTRIES,
+    ttl_seconds=DATASET_TTL_SECONDS,
+)
@@ -0,0 +1,181 @@
+"""
+Duplicate detection engine.
+
+Exact mode hashes the subset columns of every row into one 64-bit value with
+vectorized per-column hashing, groups rows by hash and then verifies each
+candidate against its group representative, so a hash collision can never drop a
+distinct row.
+
+Near mode finds near-duplicate texts with MinHash signatures over character
+shingles and LSH banding. Candidate pairs sharing a band are confirmed by their
+estimated Jaccard similarity and merged into clusters. Signatures are built in
+blocks capped by shingle count, so memory stays bounded on large columns.
+"""
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAX_SHINGLES_PER_BLOCK = 200_000
+TOP_GROUPS = 5
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """One uint64 hash per row, combining vectorized per-column hashes."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def _rows_equal(df: pd.DataFrame, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Compare rows at positions left[i] and right[i] column by column, treating NaN as equal to NaN."""
+    equal = np.ones(len(left), dtype=bool)
+    for col in df.columns:
+        # Keep nullable/Arrow extension arrays: their `==` yields NA where a side is missing
+        values = df[col].array
+        a, b = pd.Series(values.take(left)), pd.Series(values.take(right))
+        both_na = (a.isna() & b.isna()).to_numpy(dtype=bool)
+        with np.errstate(invalid="ignore"):
+            equal &= a.eq(b).fillna(False).to_numpy(dtype=bool) | both_na
+    return equal
+
+def _group_summary(group_ids: np.ndarray) -> Dict[str, Any]:
+    """Summarize groups labelled by the row index of their representative."""
+    sizes = np.bincount(group_ids, minlength=len(group_ids))
+    duplicated = np.flatnonzero(sizes > 1)
+    top = duplicated[np.argsort(-sizes[duplicated], kind="stable")[:TOP_GROUPS]]
+    return {
+        "duplicate_groups": int(len(duplicated)),
+        "rows_in_duplicate_groups": int(sizes[duplicated].sum()),
+        "largest_groups": [{"row": int(g), "count": int(sizes[g])} for g in top],
+    }
+
+def _keep_mask(group_ids: np.ndarray, keep: str) -> np.ndarray:
+    if keep in ("first", "last"):
+        return group_ids == np.arange(len(group_ids))
+    if keep == "none":
+        sizes = np.bincount(group_ids, minlength=len(group_ids))
+        return sizes[group_ids] == 1
+    raise ValueError("keep must be 'first', 'last' or 'none'")
+
+def find_exact_duplicates(df: pd.DataFrame, keep: str = "first") -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Return a boolean mask of rows to keep and duplicate-group statistics."""
+    n = len(df)
+    order = np.arange(n)[::-1] if keep == "last" else np.arange(n)
+    positions = np.arange(n)
+
+    # Codes follow first appearance in `order`, so the first row of each code is its representative
+    codes, _ = pd.factorize(row_hashes(df)[order])
+    _, first_index = np.unique(codes, return_index=True)
+    representative = first_index[codes]
+
+    candidates = np.flatnonzero(representative != positions)
+    verified = _rows_equal(df, order[candidates], order[representative[candidates]])
+    collisions = int((~verified).sum())
+    if collisions:
+        logger.warning(f"{collisions} rows shared a hash with a different row; kept as distinct")
+
+    group = positions.copy()
+    group[candidates[verified]] = representative[candidates[verified]]
+    group_ids = np.empty(n, dtype=np.int64)
+    group_ids[order] = order[group]
+
+    summary = _group_summary(group_ids)
+    summary["hash_collisions"] = collisions
+    return _keep_mask(group_ids, keep), summary
+
+def _shingles(text: str, size: int) -> List[str]:
+    text = " ".join(text.lower().split())
+    if len(text) <= size:
+        return [text] if text else []
+    return [text[i:i + size] for i in range(len(text) - size + 1)]
+
+def minhash_signatures(texts: np.ndarray, num_perm: int = 64, shingle_size: int = 5,
+                       seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """MinHash signatures (texts x num_perm, uint32) and a mask of texts that produced any shingle.
+
+    Each permutation is a multiply-shift hash of the 64-bit shingle hash, which
+    avoids modular arithmetic and keeps signatures at 4 bytes per value.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    signatures = np.zeros((len(texts), num_perm), dtype=np.uint32)
+    has_text = np.zeros(len(texts), dtype=bool)
+
+    start = 0
+    while start < len(texts):
+        shingles, owners, end = [], [], start
+        while end < len(texts) and len(shingles) < MAX_SHINGLES_PER_BLOCK:
+            row_shingles = _shingles(texts[end], shingle_size)
+            shingles.extend(row_shingles)
+            owners.extend([end] * len(row_shingles))
+            end += 1
+        if shingles:
+            hashed = pd.util.hash_array(np.array(shingles, dtype=object))
+            # (num_perm x shingles) so the per-row minimum reduces over contiguous memory
+            permuted = ((a[:, None] * hashed + b[:, None]) >> np.uint64(32)).astype(np.uint32)
+            owners_arr = np.asarray(owners)
+            boundaries = np.flatnonzero(np.r_[True, owners_arr[1:] != owners_arr[:-1]])
+            signatures[owners_arr[boundaries]] = np.minimum.reduceat(permuted, boundaries, axis=1).T
+            has_text[owners_arr[boundaries]] = True
+        start = end
+    return signatures, has_text
+
+def _connected_components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Label each node with the smallest node of its component by label propagation with pointer jumping."""
+    labels = np.arange(n)
+    while True:
+        updated = labels.copy()
+        np.minimum.at(updated, left, labels[right])
+        np.minimum.at(updated, right, labels[left])
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+def find_near_duplicates(texts: pd.Series, threshold: float = 0.8, num_perm: int = 64,
+                         keep: str = "first") -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Cluster rows whose texts have estimated Jaccard similarity >= threshold; keep one per cluster.
+
+    Signatures are computed once per distinct text. Empty and missing texts are never clustered.
+    """
+    if not 0.0 < threshold <= 1.0:
+        raise ValueError("similarity_threshold must be in (0, 1]")
+    if num_perm < 1:
+        raise ValueError("num_perm must be positive")
+    n = len(texts)
+    codes, uniques = pd.factorize(texts.fillna("").astype(str).to_numpy())
+    signatures, has_text = minhash_signatures(np.asarray(uniques, dtype=object), num_perm)
+
+    # Choose bands x rows so that (1/bands)^(1/rows) sits close to the similarity threshold
+    bands = min((d for d in range(1, num_perm + 1) if num_perm % d == 0),
+                key=lambda d: abs((1 / d) ** (d / num_perm) - threshold))
+    rows_per_band = num_perm // bands
+
+    left, right = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    candidates = np.flatnonzero(has_text)
+    for band in range(bands):
+        block = signatures[candidates, band * rows_per_band:(band + 1) * rows_per_band]
+        band_codes, _ = pd.factorize(pd.util.hash_pandas_object(pd.DataFrame(block), index=False).to_numpy())
+        _, first_index = np.unique(band_codes, return_index=True)
+        representative = candidates[first_index[band_codes]]
+        paired = representative != candidates
+        left.append(candidates[paired])
+        right.append(representative[paired])
+
+    pairs = np.unique(np.stack([np.concatenate(left), np.concatenate(right)], axis=1), axis=0)
+    similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+    pairs = pairs[similarity >= threshold]
+
+    text_labels = _connected_components(len(uniques), pairs[:, 0], pairs[:, 1])
+    row_labels = np.where(has_text[codes], text_labels[codes], len(uniques) + np.arange(n))
+
+    # Label every cluster by its first (or last) row
+    order = np.arange(n)[::-1] if keep == "last" else np.arange(n)
+    labels, first_index = np.unique(row_labels[order], return_index=True)
+    group_ids = order[first_index][np.searchsorted(labels, row_labels)]
+
+    summary = _group_summary(group_ids)
+    summary.update(bands=bands, rows_per_band=rows_per_band, near_duplicate_pairs=int(len(pairs)))
+    return _keep_mask(group_ids, keep), summary
@@ -0,0 +1,158 @@
+"""
+Content-addressed cache of operation results on disk.
+
+Every preprocessing operation is deterministic, so the output only depends on the
+input bytes, the operation, its validated parameters and the output format. Those
+are hashed into the cache key; retries and re-planned calls on an unchanged file
+version are served from disk without parsing the file again.
+
+Entries are evicted least recently used first once the size budget is exceeded. The
+index is rebuilt from the cache directory on startup, ordered by modification time.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "preprocessing-result-cache"))
+RESULT_CACHE_MAX_MB = int(os.environ.get("RESULT_CACHE_MAX_MB", "2048"))
+
+def content_digest(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=20).hexdigest()
+
+def cache_key(digest: str, operation: str, params: Dict[str, Any], output_format: str) -> str:
+    """Key on the input digest, operation, validated params (defaults filled in) and output format."""
+    normalized = json.dumps(
+        {"input": digest, "operation": operation, "params": params, "format": output_format},
+        sort_keys=True, default=str, separators=(",", ":"),
+    )
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=20).hexdigest()
+
+class ResultCache:
+    """Thread-safe, size-bounded LRU of (output bytes, details) pairs stored as files."""
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled and max_bytes > 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.compute_ms_saved = 0.0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".bin", base + ".json"
+
+    def _load_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".bin"):
+                continue
+            data_path, meta_path = self._paths(name[:-4])
+            try:
+                stat = os.stat(data_path)
+                size = stat.st_size + os.path.getsize(meta_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-4], size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+        self._evict()
+        if self._index:
+            logger.info(f"Result cache restored {len(self._index)} entries from {self.directory}")
+
+    def _evict(self) -> None:
+        while self._index and self._bytes > self.max_bytes:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        if not self.enabled:
+            return None
+        data_path, meta_path = self._paths(key)
+        with self._lock:
+            known = key in self._index
+            if known:
+                self._index.move_to_end(key)
+        try:
+            if not known:
+                raise FileNotFoundError(key)
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+            os.utime(data_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(data)
+            self.compute_ms_saved += meta.get("compute_ms", 0.0)
+        return data, meta["details"]
+
+    def put(self, key: str, data: bytes, details: Dict[str, Any], compute_ms: float = 0.0) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        data_path, meta_path = self._paths(key)
+        meta = json.dumps({"details": details, "compute_ms": compute_ms}, default=str).encode("utf-8")
+        for path, payload in ((meta_path, meta), (data_path, data)):
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(data) + len(meta) - self._index.pop(key, 0)
+            self._index[key] = len(data) + len(meta)
+            self._evict()
+
+    def clear(self) -> int:
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+            self._bytes = 0
+            for key in keys:
+                for path in self._paths(key):
+                    if os.path.exists(path):
+                        os.remove(path)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "compute_ms_saved": round(self.compute_ms_saved, 3),
+                "evictions": self.evictions,
+            }
+
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB * 1024 * 1024, RESULT_CACHE_ENABLED)
@@ -5,12 +5,15 @@ import uuid
 import json
 import datetime
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from langchain_ollama import ChatOllama
 import io
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import math 
 import base64
+import tempfile
+
+from metadata import compute_metadata, metadata_by_digest, profile_file
 
 app = FastAPI(title="File Manager API", version="1.0")
 
@@ -25,8 +28,13 @@ app.add_middleware(
 
 # Constants
 UPLOAD_DIR = "./uploads"
-ALLOWED_TYPES = {"text/csv", "application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
-MAX_FILE_SIZE = 50 * 1024 * 1024
+ALLOWED_TYPES = {"text/csv", "application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/vnd.apache.parquet", "application/vnd.apache.arrow.file"}
+# Columnar formats used between services; user-facing formats are only produced on export
+INTERCHANGE_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE_MB", "50")) * 1024 * 1024
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -36,8 +44,13 @@ def get_ollama_client(model_name="gemma3:latest"):
 def get_user_dir(user_id):
     pass
 
-def extract_file_metadata(file_path):
-    pass
+def extract_file_metadata(file_path, previous: Optional[Dict[str, Any]] = None, changed_columns: Optional[List[str]] = None):
+    """Metadata of a stored version, computed once and kept next to it (see metadata.py).
+
+    Pass the previous version's metadata and the columns a transformation changed to
+    re-profile only those columns.
+    """
+    return profile_file(file_path, previous=previous, changed_columns=changed_columns)
 
 def save_file_snapshot(user_id, file_id, file_content, version, description, source="system"):
     pass
@@ -54,6 +67,46 @@ def replace_special_floats(obj):
 def convert_to_csv(file_content, original_filename):
     pass
 
+def read_tabular_bytes(file_content, filename):
+    """Parse tabular file bytes into a DataFrame based on the file extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    buffer = io.BytesIO(file_content)
+    if ext == ".parquet":
+        return pd.read_parquet(buffer)
+    if ext in (".arrow", ".feather"):
+        return pd.read_feather(buffer)
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(buffer)
+    if ext == ".json":
+        return pd.read_json(buffer)
+    return pd.read_csv(buffer)
+
+def write_tabular_bytes(df, filename):
+    """Serialize a DataFrame in the format given by the file extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    buffer = io.BytesIO()
+    if ext == ".parquet":
+        df.to_parquet(buffer, index=False)
+    elif ext in (".arrow", ".feather"):
+        df.reset_index(drop=True).to_feather(buffer)
+    elif ext in (".xlsx", ".xls"):
+        df.to_excel(buffer, index=False)
+    elif ext == ".json":
+        df.to_json(buffer, orient="records")
+    else:
+        df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+def convert_to_interchange(file_content, original_filename, interchange_format="parquet"):
+    """Convert a tabular file to Parquet or Arrow IPC bytes, preserving column types."""
+    if interchange_format not in INTERCHANGE_MEDIA_TYPES:
+        raise ValueError(f"Unknown interchange format '{interchange_format}'. Use parquet or arrow")
+    return write_tabular_bytes(read_tabular_bytes(file_content, original_filename), f"data.{interchange_format}")
+
+def export_from_interchange(file_content, interchange_filename, target_filename):
+    """Convert a Parquet/Arrow working copy back to the user's original file format."""
+    return write_tabular_bytes(read_tabular_bytes(file_content, interchange_filename), target_filename)
+
 @app.post("/api/upload")
 async def upload_file(
     user_id: str = Form(...),
@@ -97,6 +150,77 @@ async def llm_analyze_changes(
 ):
     pass
 
+@app.post("/api/convert/interchange")
+async def convert_file_to_interchange(
+    file: UploadFile = File(...),
+    interchange_format: str = Form("parquet")
+):
+    """Convert an uploaded file to the columnar format used between services."""
+    content = await file.read()
+    try:
+        converted = convert_to_interchange(content, file.filename, interchange_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Conversion failed: {e}")
+    filename = os.path.splitext(file.filename)[0] + f".{interchange_format}"
+    return Response(
+        content=converted,
+        media_type=INTERCHANGE_MEDIA_TYPES[interchange_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.post("/api/convert/export")
+async def export_interchange_file(
+    file: UploadFile = File(...),
+    target_filename: str = Form(...)
+):
+    """Convert a Parquet/Arrow working copy back to the format given by target_filename."""
+    content = await file.read()
+    try:
+        exported = export_from_interchange(content, file.filename, target_filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {e}")
+    return Response(
+        content=exported,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{target_filename}"'},
+    )
+
+@app.get("/api/metadata/{digest}")
+async def get_metadata(digest: str):
+    """Stored metadata of the file content with this digest (any stored version or file profiled before)."""
+    metadata = metadata_by_digest(digest)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail=f"No metadata for content {digest}")
+    return JSONResponse(metadata)
+
+@app.post("/api/metadata")
+async def profile_uploaded_file(
+    file: UploadFile = File(...),
+    previous: str = Form(None),
+    changed_columns: str = Form(None)
+):
+    """Profile a file that is not stored here, e.g. a working copy; the result is kept by content digest.
+
+    With the JSON `previous` metadata and the JSON list of `changed_columns`, only those columns are re-read.
+    """
+    try:
+        previous_metadata = json.loads(previous) if previous else None
+        columns = json.loads(changed_columns) if changed_columns else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid previous metadata or changed columns: {e}")
+    fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(file.filename or "")[1].lower() or ".csv")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(await file.read())
+        metadata = compute_metadata(tmp_path, previous_metadata, columns)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Profiling failed: {e}")
+    finally:
+        os.remove(tmp_path)
+    return JSONResponse(metadata)
+
 @app.get("/")
 async def read_root():
     pass
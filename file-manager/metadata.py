@@ -0,0 +1,280 @@
+"""
+Column profiles for stored file versions.
+
+Metadata is computed once per version and saved next to the snapshot as
+`<snapshot>.metadata.json`, tagged with the snapshot's size and mtime so a rewritten
+file is profiled again. It is also indexed by content digest (METADATA_INDEX_DIR), so
+other services can fetch the metadata of a copy of any stored version. Files are streamed in chunks of METADATA_CHUNK_ROWS; past
+METADATA_MAX_SCAN_ROWS only the first rows are profiled (`sampled`). A new version
+produced by a transformation can reuse the previous version's metadata and
+re-profile only the columns that changed.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+from pandas.core.dtypes.cast import find_common_type
+
+logger = logging.getLogger(__name__)
+
+METADATA_CHUNK_ROWS = int(os.environ.get("METADATA_CHUNK_ROWS", "200000"))
+METADATA_MAX_SCAN_ROWS = int(os.environ.get("METADATA_MAX_SCAN_ROWS", "1000000"))
+# Distinct values tracked per column before it is treated as high-cardinality
+MAX_TRACKED_VALUES = 1000
+TOP_VALUES = 5
+METADATA_SUFFIX = ".metadata.json"
+METADATA_INDEX_DIR = os.environ.get("METADATA_INDEX_DIR", os.path.join("uploads", "metadata"))
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+HASH_CHUNK_BYTES = 1024 * 1024
+
+class _ColumnProfile:
+    """Streaming statistics for one column."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.dtype: Optional[str] = None
+        self._dtype = None
+        self.count = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.numeric_count = 0
+        self.values: Optional[Counter] = Counter()
+
+    def update(self, series: pd.Series) -> None:
+        # Chunks can disagree (e.g. int64, then float64 once a null shows up); keep the common type
+        self._dtype = series.dtype if self._dtype is None else find_common_type([self._dtype, series.dtype])
+        self.dtype = str(self._dtype)
+        self.count += len(series)
+        non_null = series.dropna()
+        self.nulls += len(series) - len(non_null)
+        if non_null.empty:
+            return
+        if pd.api.types.is_numeric_dtype(non_null) and not pd.api.types.is_bool_dtype(non_null):
+            values = non_null.astype("float64")
+            self.numeric_count += len(values)
+            self.total += float(values.sum())
+            self.total_sq += float((values * values).sum())
+            self._bounds(non_null.min(), non_null.max())
+        elif pd.api.types.is_datetime64_any_dtype(non_null):
+            self._bounds(non_null.min(), non_null.max())
+        if self.values is not None:
+            self.values.update(non_null.astype(str).value_counts().to_dict())
+            if len(self.values) > MAX_TRACKED_VALUES:
+                self.values = None
+
+    def _bounds(self, low: Any, high: Any) -> None:
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    def result(self) -> Dict[str, Any]:
+        profile: Dict[str, Any] = {
+            "name": self.name,
+            "dtype": self.dtype,
+            "non_null": self.count - self.nulls,
+            "nulls": self.nulls,
+            "null_pct": round(100.0 * self.nulls / self.count, 2) if self.count else 0.0,
+        }
+        if self.values is not None:
+            profile["unique"] = len(self.values)
+            profile["top_values"] = [{"value": value, "count": count} for value, count in self.values.most_common(TOP_VALUES)]
+        else:
+            profile["unique"] = f">{MAX_TRACKED_VALUES}"
+        if self.minimum is not None:
+            profile["min"] = _plain(self.minimum)
+            profile["max"] = _plain(self.maximum)
+        if self.numeric_count:
+            mean = self.total / self.numeric_count
+            variance = max(0.0, self.total_sq / self.numeric_count - mean * mean)
+            profile["mean"] = _plain(mean)
+            profile["std"] = _plain(math.sqrt(variance))
+        return profile
+
+def _plain(value: Any) -> Any:
+    """JSON-friendly scalar."""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 6) if math.isfinite(value) else None
+    return value
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower()
+
+def _csv_sep(ext: str) -> str:
+    return "\t" if ext == ".tsv" else ","
+
+def _schema(path: str) -> List[str]:
+    """Column names without reading the data."""
+    ext = _extension(path)
+    if ext == ".parquet":
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    if ext in (".arrow", ".feather"):
+        import pyarrow.feather as feather
+        return list(feather.read_table(path, memory_map=True).column_names)
+    if ext in (".xlsx", ".xls"):
+        return [str(col) for col in pd.read_excel(path, nrows=0).columns]
+    if ext == ".json":
+        return [str(col) for col in pd.read_json(path).columns]
+    return [str(col) for col in pd.read_csv(path, nrows=0, sep=_csv_sep(ext)).columns]
+
+def _row_count(path: str) -> Optional[int]:
+    """Row count from the file footer (Parquet) or a line count (CSV), without parsing values."""
+    ext = _extension(path)
+    if ext == ".parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if ext in (".csv", ".txt", ".tsv"):
+        lines = 0
+        last = b"\n"
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                lines += block.count(b"\n")
+                last = block[-1:]
+        # Header line; a final line without a newline still counts
+        return max(0, lines - 1 + (0 if last == b"\n" else 1))
+    return None
+
+def _chunks(path: str, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    ext = _extension(path)
+    if ext == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=METADATA_CHUNK_ROWS, columns=columns):
+            yield batch.to_pandas()
+    elif ext in (".arrow", ".feather"):
+        import pyarrow.feather as feather
+        for batch in feather.read_table(path, columns=columns, memory_map=True).to_batches(METADATA_CHUNK_ROWS):
+            yield batch.to_pandas()
+    elif ext in (".xlsx", ".xls"):
+        yield pd.read_excel(path, usecols=columns)
+    elif ext == ".json":
+        df = pd.read_json(path)
+        yield df[columns] if columns else df
+    else:
+        yield from pd.read_csv(path, chunksize=METADATA_CHUNK_ROWS, usecols=columns, sep=_csv_sep(ext))
+
+def _profile(path: str, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Stream the file (or only `columns`) and return row counts and column profiles."""
+    profiles: Dict[str, _ColumnProfile] = {}
+    scanned = 0
+    sampled = False
+    for chunk in _chunks(path, columns):
+        if scanned + len(chunk) > METADATA_MAX_SCAN_ROWS:
+            chunk = chunk.iloc[:METADATA_MAX_SCAN_ROWS - scanned]
+            sampled = True
+        for col in chunk.columns:
+            profiles.setdefault(str(col), _ColumnProfile(str(col))).update(chunk[col])
+        scanned += len(chunk)
+        if sampled:
+            break
+    if not profiles and columns is None:
+        profiles = {name: _ColumnProfile(name) for name in _schema(path)}
+    rows = (_row_count(path) if sampled else None) or scanned
+    return {"rows": rows, "scanned_rows": scanned, "sampled": sampled,
+            "columns": [profile.result() for profile in profiles.values()]}
+
+def _delta(file_path: str, previous: Dict[str, Any], changed_columns: List[str]) -> Optional[Dict[str, Any]]:
+    """Re-profile only changed columns; None when a full pass is needed (row count or schema drift)."""
+    names = _schema(file_path)
+    known = {column["name"]: column for column in previous.get("columns", [])}
+    changed = [name for name in names if name in set(changed_columns) or name not in known]
+    if not changed:
+        changed = names[:1]
+    partial = _profile(file_path, changed)
+    if partial["sampled"] != previous.get("sampled") or partial["rows"] != previous.get("rows"):
+        return None
+    fresh = {column["name"]: column for column in partial["columns"]}
+    return {
+        "rows": partial["rows"],
+        "scanned_rows": partial["scanned_rows"],
+        "sampled": partial["sampled"],
+        "columns": [fresh.get(name) or known[name] for name in names],
+        "computed": f"delta ({len(fresh)} of {len(names)} columns)",
+    }
+
+def metadata_path(file_path: str) -> str:
+    return file_path + METADATA_SUFFIX
+
+def _stamp(file_path: str) -> Dict[str, int]:
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def load_metadata(file_path: str) -> Optional[Dict[str, Any]]:
+    """Saved metadata of a snapshot, or None if missing or stale."""
+    try:
+        with open(metadata_path(file_path), encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return saved.get("metadata") if saved.get("stamp") == _stamp(file_path) else None
+
+def save_metadata(file_path: str, metadata: Dict[str, Any]) -> None:
+    tmp_path = metadata_path(file_path) + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stamp": _stamp(file_path), "metadata": metadata}, f, default=str)
+        os.replace(tmp_path, metadata_path(file_path))
+    except OSError as e:
+        logger.warning(f"Could not save metadata for {file_path}: {e}")
+
+def file_digest(path: str) -> str:
+    """blake2b-160 of the content, the digest the orchestrator names its file refs after."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def metadata_by_digest(digest: str) -> Optional[Dict[str, Any]]:
+    """Metadata of content profiled before, or None."""
+    if not DIGEST_PATTERN.match(digest):
+        return None
+    try:
+        with open(os.path.join(METADATA_INDEX_DIR, f"{digest}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _index(digest: str, metadata: Dict[str, Any]) -> None:
+    try:
+        os.makedirs(METADATA_INDEX_DIR, exist_ok=True)
+        tmp_path = os.path.join(METADATA_INDEX_DIR, f"{digest}.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, default=str)
+        os.replace(tmp_path, os.path.join(METADATA_INDEX_DIR, f"{digest}.json"))
+    except OSError as e:
+        logger.warning(f"Could not index metadata for {digest}: {e}")
+
+def compute_metadata(file_path: str, previous: Optional[Dict[str, Any]] = None,
+                     changed_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Profile the file (only `changed_columns` when `previous` is given) and index the result by digest."""
+    metadata = _delta(file_path, previous, changed_columns) if previous and changed_columns else None
+    if metadata is None:
+        metadata = _profile(file_path)
+        metadata["computed"] = "full"
+    metadata.update(file_name=os.path.basename(file_path), file_size=os.path.getsize(file_path),
+                    format=_extension(file_path).lstrip("."), digest=file_digest(file_path))
+    _index(metadata["digest"], metadata)
+    return metadata
+
+def profile_file(file_path: str, previous: Optional[Dict[str, Any]] = None,
+                 changed_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Saved metadata of the file, or profile it (only `changed_columns` when `previous` is given) and save it."""
+    metadata = load_metadata(file_path)
+    if metadata is not None:
+        return metadata
+    metadata = compute_metadata(file_path, previous, changed_columns)
+    save_metadata(file_path, metadata)
+    return metadata
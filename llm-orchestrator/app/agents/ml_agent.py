@@ -9,9 +9,13 @@ from datetime import datetime
 from ..tools.ml_tools import tools as ml_tools
 from ..utils.file_utils import decode_base64_to_temp_file, cleanup_temp_file
 from ..utils.file_metadata import extract_file_metadata, format_metadata_for_prompt
+from .tool_node import ConcurrentToolNode
 
 logger = logging.getLogger(__name__)
 
+# Pass as create_react_agent(tools=...) so independent tool calls of one turn run concurrently
+tool_node = ConcurrentToolNode(ml_tools)
+
 def get_ml_system_prompt(data_path: str = None, file_metadata: str = None) -> str:
     pass
 
@@ -19,7 +23,7 @@ async def run_ml_task(
     llm: BaseLanguageModel, 
     input_text: str, 
     file_id: str = None,  
-    file_data_base64: str = None,
+    file_ref: str = None,
     file_format: str = "csv",
     file_metadata: str = None,
 ) -> Dict[str, Any]:
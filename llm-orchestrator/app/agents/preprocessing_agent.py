@@ -12,6 +12,7 @@ from ..tools.code_tools import code_tools
 import pandas as pd
 from langchain_core.tools import tool
 from ..utils.file_metadata import extract_file_metadata , format_metadata_for_prompt
+from .tool_node import ConcurrentToolNode
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +21,8 @@ def preview_data_tool(file_path: str) -> str:
     pass
 
 tools = [preview_data_tool, *preprocessing_tools, *code_tools]
+# Pass as create_react_agent(tools=...) so independent tool calls of one turn run concurrently
+tool_node = ConcurrentToolNode(tools)
 
 def get_preprocessing_prompt(data_path: str = None, file_metadata: str = None, conversation_history: str = None) -> str:
     pass
@@ -28,7 +31,7 @@ async def preprocess_data(
     llm: BaseLanguageModel, 
     input_text: str, 
     file_id: str = None,
-    file_data_base64: str = None,
+    file_ref: str = None,
     file_format: str = "csv",
     file_metadata: str = None,
     conversation_history: str = None
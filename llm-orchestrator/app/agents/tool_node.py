@@ -0,0 +1,163 @@
+"""
+Tool node that runs independent tool calls from one LLM turn concurrently.
+
+The stock ToolNode starts every tool call of a turn at once, which is unsafe when two
+calls touch the same file (`handle_missing_values` then `validate_range` on the same
+data_path must run in that order) and unbounded when the model emits many calls.
+
+Here each call is checked against the earlier calls of the same turn. It waits for an
+earlier call when both name the same resource (data_path, file_path, dataset handle,
+code session, saved-model directory...) and at least one of them may write it. Calls
+without such conflicts run side by side, at most AGENT_TOOL_CONCURRENCY at a time.
+Results keep the order of the tool calls.
+
+Use it with `create_react_agent(llm, tools=ConcurrentToolNode(tools))` and the default
+(v1) tool-calling version, where one node run sees every call of the turn.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.messages import ToolCall
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_config_list, get_executor_for_config
+from langgraph.prebuilt import ToolNode
+from langgraph.store.base import BaseStore
+
+logger = logging.getLogger(__name__)
+
+AGENT_TOOL_CONCURRENCY = int(os.environ.get("AGENT_TOOL_CONCURRENCY", "4"))
+
+# Arguments whose value names something a tool reads or writes
+RESOURCE_ARGS = ("data_path", "file_path", "output_path", "file_id", "dataset_handle", "session_id", "model_path", "model_name")
+# Arguments naming a local file; the same file under different argument names is one resource
+PATH_ARGS = ("data_path", "file_path", "output_path", "model_path")
+
+# Tools that only read their resources; any other tool is assumed to modify them
+READ_ONLY_TOOLS = frozenset({
+    "preview_data_tool",
+    "validate_non_negative",
+    "validate_range",
+    "execute_code",
+    "analyze_data_with_code",
+    "open_dataset",
+    "get_file_version",
+    "list_files",
+    "find_file",
+    "analyze_file_changes",
+    "evaluate_model",
+    "select_model",
+    "evaluate_saved_model",
+    "predict_with_model",
+    "list_saved_models",
+})
+
+# Read-only tools that write after all when called with one of these arguments (code run in
+# a session changes the session's dataset; an output path receives the modified data)
+WRITING_ARGS = {
+    "execute_code": ("session_id", "output_path"),
+    "analyze_data_with_code": ("session_id", "output_path"),
+}
+
+# Resources a tool touches without naming them in its arguments
+IMPLICIT_RESOURCES = {
+    "train_model": ("saved_models",),
+    "tune_hyperparameters": ("saved_models",),
+    "track_experiment": ("saved_models",),
+    "evaluate_saved_model": ("saved_models",),
+    "predict_with_model": ("saved_models",),
+    "list_saved_models": ("saved_models",),
+    "upload_file": ("file_index",),
+    "delete_file": ("file_index",),
+    "list_files": ("file_index",),
+    "find_file": ("file_index",),
+}
+
+def _resource(key: str, value: Any) -> str:
+    if key in PATH_ARGS and isinstance(value, str):
+        return f"path:{os.path.realpath(value)}"
+    return f"{key}:{value}"
+
+def call_resources(call: ToolCall) -> Set[str]:
+    """Resources named by a tool call, e.g. {'path:/tmp/data.csv'}."""
+    args = call.get("args") or {}
+    resources = {_resource(key, args[key]) for key in RESOURCE_ARGS if args.get(key)}
+    resources.update(IMPLICIT_RESOURCES.get(call["name"], ()))
+    return resources
+
+def is_read_only(call: ToolCall, read_only_tools: Iterable[str] = READ_ONLY_TOOLS) -> bool:
+    """True if the call cannot modify the resources it names."""
+    args = call.get("args") or {}
+    return call["name"] in read_only_tools and not any(args.get(key) for key in WRITING_ARGS.get(call["name"], ()))
+
+def plan_tool_calls(tool_calls: Sequence[ToolCall], read_only_tools: Iterable[str] = READ_ONLY_TOOLS) -> List[Set[int]]:
+    """For each call, the indexes of earlier calls it has to wait for."""
+    read_only_tools = set(read_only_tools)
+    accesses: List[Tuple[Set[str], bool]] = [
+        (call_resources(call), is_read_only(call, read_only_tools)) for call in tool_calls
+    ]
+    dependencies: List[Set[int]] = []
+    for i, (resources, reads_only) in enumerate(accesses):
+        dependencies.append({
+            j for j, (earlier, earlier_reads_only) in enumerate(accesses[:i])
+            if resources & earlier and not (reads_only and earlier_reads_only)
+        })
+    return dependencies
+
+class ConcurrentToolNode(ToolNode):
+    """ToolNode that bounds concurrency and serializes tool calls that touch the same resource."""
+
+    def __init__(self, tools: Sequence[Any], *, max_concurrency: int = AGENT_TOOL_CONCURRENCY,
+                 read_only_tools: Optional[Iterable[str]] = None, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max(1, max_concurrency)
+        self.read_only_tools = frozenset(READ_ONLY_TOOLS if read_only_tools is None else read_only_tools)
+
+    def _plan(self, tool_calls: Sequence[ToolCall]) -> List[Set[int]]:
+        dependencies = plan_tool_calls(tool_calls, self.read_only_tools)
+        if len(tool_calls) > 1:
+            serialized = sum(1 for deps in dependencies if deps)
+            logger.info(f"Running {len(tool_calls)} tool calls, {serialized} waiting on earlier calls")
+        return dependencies
+
+    def _func(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        dependencies = self._plan(tool_calls)
+        config_list = get_config_list(config, len(tool_calls))
+        # Run in waves: a call goes in the first wave after all of its dependencies
+        waves: List[int] = []
+        for deps in dependencies:
+            waves.append(1 + max((waves[j] for j in deps), default=-1))
+        outputs: List[Any] = [None] * len(tool_calls)
+        with get_executor_for_config({**config, "max_concurrency": self.max_concurrency}) as executor:
+            for wave in range(max(waves, default=-1) + 1):
+                indexes = [i for i, w in enumerate(waves) if w == wave]
+                results = executor.map(self._run_one, [tool_calls[i] for i in indexes],
+                                       [input_type] * len(indexes), [config_list[i] for i in indexes])
+                for i, result in zip(indexes, results):
+                    outputs[i] = result
+        return self._combine_tool_outputs(outputs, input_type)
+
+    async def _afunc(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        dependencies = self._plan(tool_calls)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks: List[asyncio.Task] = []
+
+        async def run(index: int) -> Any:
+            # A failed dependency returns an error ToolMessage; the dependent call still runs and reports its own result
+            await asyncio.gather(*(tasks[j] for j in dependencies[index]), return_exceptions=True)
+            async with semaphore:
+                return await self._arun_one(tool_calls[index], input_type, config)
+
+        for index in range(len(tool_calls)):
+            tasks.append(asyncio.ensure_future(run(index)))
+        try:
+            outputs = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return self._combine_tool_outputs(outputs, input_type)
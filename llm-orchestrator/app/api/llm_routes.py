@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from typing import Optional
 import logging
 
-from app.core.llm import set_provider, get_current_provider, get_llm
+from app.core.llm import set_provider, get_current_provider, get_llm, get_llm_cache_stats, llm_cache
 
 logger = logging.getLogger(__name__)
 
@@ -25,4 +25,15 @@ async def set_llm_provider(request: ProviderRequest):
 
 @router.get("/current-provider", response_model=ProviderResponse)
 async def get_current_llm_provider():
-    pass
\ No newline at end of file
+    pass
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return get_llm_cache_stats()
+
+@router.delete("/cache")
+async def clear_cache():
+    if llm_cache is None:
+        raise HTTPException(status_code=404, detail="LLM cache is disabled")
+    llm_cache.clear()
+    return {"success": True}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Request, File, UploadFile, Form
+from fastapi import APIRouter, Request, File, UploadFile, Form, HTTPException
 from typing import Dict, Any, Optional, List
 import uuid
 import json
@@ -7,11 +7,16 @@ import logging
 import traceback
 import tempfile
 import os
+from fastapi.responses import FileResponse
 from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel, Field
 from app.graphs.builder import create_orchestrator
-from langgraph.checkpoint.memory import MemorySaver
+from app.graphs.checkpointer import checkpoint_file_refs, create_checkpointer, checkpointer_stats
+from app.graphs.streaming import stream_graph_events, to_sse
 from app.graphs.utils import load_file_as_base64
+from app.tools.code_tools import stream_code_execution, cancel_code_execution
+from app.utils.content_store import blob_store
+from app.utils.interchange import export_to_original, is_interchange_file, to_interchange
 from colorama import Fore, Style
 
 from app.api.supervisor_routes import router as supervisor_router
@@ -20,16 +25,124 @@ router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
-memory_saver = MemorySaver()
+# SQLite-backed by default (CHECKPOINTER=memory for the in-process saver); bounded per thread and by TTL
+checkpointer = create_checkpointer()
+orchestrator = create_orchestrator(checkpointer)
+# Files of threads that still have checkpoints are not evicted from the blob store
+blob_store.live_refs = lambda: checkpoint_file_refs(checkpointer)
 
 class ChatRequest(BaseModel):
     message: str = Field(..., description="The user's message")
     data_path: Optional[str] = Field(None, description="Path to the file to upload, if any")
 
+class CodeStreamRequest(BaseModel):
+    code: str = Field(..., description="Python code to run")
+    data_path: Optional[str] = Field(None, description="Data file to load as `df`")
+    session_id: Optional[str] = Field(None, description="Run in this code session instead of a fresh sandbox")
+    timeout: int = Field(30, description="Execution timeout in seconds")
+    user_id: Optional[str] = Field(None, description="Caller identity for fair queuing in the code execution service")
+
+def _ingest_upload(content: bytes, filename: str) -> Dict[str, Any]:
+    """Store an upload in the blob store as a columnar working copy; the original format is kept for export."""
+    extension = os.path.splitext(filename)[1].lower()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        upload_path = os.path.join(tmp_dir, os.path.basename(filename))
+        with open(upload_path, "wb") as f:
+            f.write(content)
+        try:
+            working_path = to_interchange(upload_path)
+        except Exception as e:
+            logger.warning(f"Keeping {filename} in its original format, interchange conversion failed: {e}")
+            working_path = upload_path
+        working_extension = os.path.splitext(working_path)[1].lower()
+        return {
+            "file_ref": blob_store.put_file(working_path),
+            "file_format": working_extension.lstrip(".") or None,
+            "export_format": extension.lstrip(".") or None,
+        }
+
+def _export_file(file_ref: str, export_format: Optional[str]) -> str:
+    """Ref of the file in the user's original format, converting the working copy if needed."""
+    working_path = blob_store.path(file_ref)
+    if not export_format or not is_interchange_file(working_path) or working_path.endswith(f".{export_format}"):
+        return file_ref
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        return blob_store.put_file(export_to_original(working_path, os.path.join(tmp_dir, f"export.{export_format}")))
+
 @router.post("/chat/stream")
 async def chat_stream(
     req: Request,
     message: str = Form(..., description="The user's message"),
     file: Optional[UploadFile] = File(None, description="Optional file upload")
 ):
-    pass
\ No newline at end of file
+    """Run the orchestrator on a message, streaming LLM tokens, node and tool events as they happen.
+
+    Send `X-Thread-Id` to continue a conversation. Events are described in graphs/streaming.py;
+    the stream opens with `start` and ends with `done` (thread id, status, result) or `error`.
+    Uploads are kept as a Parquet working copy; `done` carries `export_ref`, the final file
+    in the upload's original format, downloadable from /files/{ref}.
+    """
+    thread_id = req.headers.get("X-Thread-Id") or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+    previous = (await orchestrator.aget_state(config)).values or {}
+    inputs = {
+        "session_id": previous.get("session_id") or thread_id,
+        "thread_id": thread_id,
+        "messages": list(previous.get("messages") or []) + [{"role": "user", "content": message}],
+        "status": "RUNNING",
+        "current_step": 0,
+    }
+    if file is not None:
+        inputs.update(await asyncio.to_thread(_ingest_upload, await file.read(), file.filename or "data.csv"))
+
+    async def events():
+        yield to_sse({"event": "start", "thread_id": thread_id})
+        async for event in stream_graph_events(orchestrator, inputs, config):
+            yield to_sse(event)
+            if event["event"] == "error":
+                return
+        final = (await orchestrator.aget_state(config)).values or {}
+        done = {"event": "done", "thread_id": thread_id, "status": final.get("status"), "result": final.get("result")}
+        if final.get("file_ref") and file is not None:
+            done["export_ref"] = await asyncio.to_thread(_export_file, final["file_ref"], final.get("export_format"))
+        yield to_sse(done)
+
+    return EventSourceResponse(events())
+
+@router.post("/code/stream")
+async def code_stream(body: CodeStreamRequest):
+    """Forward a code execution's live output (stdout, figures, progress, result) as server-sent events.
+
+    Disconnecting cancels the execution on the code execution service.
+    """
+    async def events():
+        async for event in stream_code_execution(body.code, body.data_path, body.timeout, body.session_id,
+                                                 body.user_id):
+            yield {"event": event.pop("event"), "data": json.dumps(event)}
+
+    return EventSourceResponse(events())
+
+@router.delete("/code/executions/{execution_id}")
+async def cancel_code_stream(execution_id: str):
+    return await cancel_code_execution(execution_id)
+
+@router.get("/checkpoints/stats")
+async def get_checkpoint_stats():
+    return await asyncio.to_thread(checkpointer_stats, checkpointer)
+
+@router.delete("/threads/{thread_id}")
+async def delete_thread(thread_id: str):
+    """Drop a conversation's checkpoints."""
+    await checkpointer.adelete_thread(thread_id)
+    return {"success": True, "thread_id": thread_id}
+
+@router.get("/files/{ref}")
+async def download_file(ref: str):
+    """Download a file from the blob store by ref, e.g. the `export_ref` of a chat stream."""
+    try:
+        path = blob_store.path(ref)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return FileResponse(path, filename=ref)
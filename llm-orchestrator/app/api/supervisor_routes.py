@@ -7,6 +7,7 @@ that includes a supervisor routing queries to specialized agents.
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Body, Query, Depends, File, UploadFile, Form
 from fastapi.responses import JSONResponse, PlainTextResponse
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel, ValidationError
 from typing import Optional, List, Dict, Any
 import os
@@ -19,7 +20,8 @@ import base64
 
 from app.tools.file_manager_tools import upload_file_tool, get_file_version_tool
 
-from app.graphs.supervisor_graph import process_query, DEFAULT_DATA_PATH
+from app.graphs.supervisor_graph import process_query, stream_query, DEFAULT_DATA_PATH
+from app.graphs.streaming import to_sse
 from app.graphs.supervisor_graph_alone import process_query as process_query_alone
 from app.graphs.supervisor_graph_with_analytics import process_query as process_query_analytics
 from app.graphs.supervisor_graph_with_ml import process_query as process_query_ml
@@ -71,7 +73,29 @@ async def query_supervisor(
 ):
     pass
 
-
-
-
-
+@router.post("/query/stream")
+async def query_supervisor_stream(
+    query: str = Form(..., description="Query to process"),
+    file: Optional[UploadFile] = File(None, description="Optional data file to upload and process"),
+    file_id: Optional[str] = Form(None, description="Optional file ID from file manager instead of uploading"),
+    thread_id: Optional[str] = Form(None, description="Conversation to continue")
+):
+    """Same as /query, but streams LLM tokens, agent handoffs and tool calls as server-sent events.
+
+    Ends with a `done` event, or `error` if the run failed.
+    """
+    data_path = None
+    if file is not None:
+        data_path = str(UPLOAD_DIR / f"{uuid.uuid4()}_{os.path.basename(file.filename or 'upload')}")
+        with open(data_path, "wb") as f:
+            while chunk := await file.read(1024 * 1024):
+                f.write(chunk)
+
+    async def events():
+        async for event in stream_query(query, data_path=data_path, file_id=file_id, thread_id=thread_id):
+            yield to_sse(event)
+            if event["event"] == "error":
+                return
+        yield to_sse({"event": "done", "file_id": file_id})
+
+    return EventSourceResponse(events())
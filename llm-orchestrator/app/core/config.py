@@ -30,6 +30,16 @@ class Settings(BaseSettings):
     TEMPERATURE: float = 0.7
     MAX_TOKENS: int = 5000
 
+    # Completion cache; only used at temperature 0 unless LLM_CACHE_NONZERO_TEMPERATURE is set
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: Optional[str] = None  # Defaults to uploads/llm_cache.sqlite
+    LLM_CACHE_TTL_SECONDS: int = 24 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 10000
+    LLM_CACHE_NONZERO_TEMPERATURE: bool = False
+
+    # How long Ollama keeps the model (and the KV cache of the last prompt prefix) loaded
+    OLLAMA_KEEP_ALIVE: str = "30m"
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
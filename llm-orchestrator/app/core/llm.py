@@ -3,10 +3,41 @@ from langchain_openai import AzureChatOpenAI
 from langchain_groq import ChatGroq  # Import for Groq
 from langchain.schema.language_model import BaseLanguageModel
 import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 from .config import settings
+from .llm_cache import SqliteLLMCache
 import os
 logger = logging.getLogger(__name__)
 
+llm_cache: Optional[SqliteLLMCache] = None
+if settings.LLM_CACHE_ENABLED:
+    llm_cache = SqliteLLMCache(
+        settings.LLM_CACHE_PATH or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "uploads", "llm_cache.sqlite"),
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    )
+
+# One client per (provider, model, temperature); building one sets up a fresh HTTP connection pool
+_clients: Dict[Tuple[str, str, float], BaseLanguageModel] = {}
+_clients_lock = threading.Lock()
+
+def _cache_for(temperature: float) -> Union[SqliteLLMCache, bool]:
+    """The completion cache for a client, or False to bypass it (sampled outputs are not cached by default)."""
+    if llm_cache is None or (temperature > 0 and not settings.LLM_CACHE_NONZERO_TEMPERATURE):
+        return False
+    return llm_cache
+
+def _shared_client(provider: str, model: str, factory: Callable[[], BaseLanguageModel]) -> BaseLanguageModel:
+    key = (provider, model, settings.TEMPERATURE)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
 # Global variables for simple LLM switching
 current_provider = os.getenv("DEFAULT_LLM_PROVIDER", "azure")  # Add this line
 current_ollama_model = "qwen2.5:14b"  # Default Ollama model
@@ -14,13 +45,16 @@ current_ollama_model = "qwen2.5:14b"  # Default Ollama model
 def get_ollama_llm(model_name: str = None) -> BaseLanguageModel:
     """Returns an instance of ChatOllama compatible with LangGraph tools."""
     model = model_name or current_ollama_model
-    return ChatOllama(
+    return _shared_client("ollama", model, lambda: ChatOllama(
         base_url=settings.OLLAMA_BASE_URL,
         model=model,
         temperature=settings.TEMPERATURE,
         max_tokens=8000,  # Specify maximum number of tokens for the response
+        # Keeping the model loaded lets Ollama reuse the KV cache of a repeated prompt prefix
+        keep_alive=settings.OLLAMA_KEEP_ALIVE,
+        cache=_cache_for(settings.TEMPERATURE),
         # You can add top_p, top_k, etc. if supported by ChatOllama
-    )
+    ))
 
 def get_azure_llm() -> BaseLanguageModel:
     """Returns an instance of Azure OpenAI LLM."""
@@ -28,29 +62,31 @@ def get_azure_llm() -> BaseLanguageModel:
         raise ValueError("Azure OpenAI API key and endpoint must be configured")
     if not settings.AZURE_OPENAI_DEPLOYMENT_NAME:
         raise ValueError("Azure OpenAI deployment name must be configured")
-    return AzureChatOpenAI(
+    return _shared_client("azure", settings.AZURE_OPENAI_DEPLOYMENT_NAME, lambda: AzureChatOpenAI(
         azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
         azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
         api_key=settings.AZURE_OPENAI_API_KEY,
         api_version=settings.AZURE_OPENAI_API_VERSION,
         temperature=settings.TEMPERATURE,
-        max_tokens=5000
-    )
+        max_tokens=5000,
+        cache=_cache_for(settings.TEMPERATURE),
+    ))
 
 def get_groq_llm() -> BaseLanguageModel:
     """Returns an instance of Groq LLM."""
     # if not settings.GROQ_API_KEY:
     #     raise ValueError("Groq API key must be configured to use Groq")
     api_key=""
-    return ChatGroq(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",  # Or another model like "mixtral-8x7b-32768"
+    model = "meta-llama/llama-4-scout-17b-16e-instruct"  # Or another model like "mixtral-8x7b-32768"
+    return _shared_client("groq", model, lambda: ChatGroq(
+        model=model,
         # model= "qwen-qwq-32b",
         groq_api_key=api_key,
         temperature=settings.TEMPERATURE,
         max_tokens=6000,
         max_retries=10,
-
-    )
+        cache=_cache_for(settings.TEMPERATURE),
+    ))
 
 def get_llm() -> BaseLanguageModel:
     """Returns an instance of the configured LLM based on current provider."""
@@ -87,4 +123,16 @@ def get_current_provider():
         "ollama_model": current_ollama_model if current_provider == "ollama" else None
     }
     
-    
\ No newline at end of file
+    
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """Hit-rate and size metrics of the completion cache."""
+    if llm_cache is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "cached_temperatures": "all" if settings.LLM_CACHE_NONZERO_TEMPERATURE else "0 only",
+        "clients": [{"provider": provider, "model": model, "temperature": temperature}
+                    for provider, model, temperature in _clients],
+        **llm_cache.stats(),
+    }
@@ -0,0 +1,134 @@
+"""
+Exact-match cache for chat completions, persisted in SQLite.
+
+Plugged into the LangChain chat models as their `cache`, so every invoke/ainvoke
+(including bound tools and structured output) checks it before calling the provider.
+Entries are keyed on the normalized message list plus the model's llm_string, which
+already contains the model name, temperature, max tokens, bound tools and stop words.
+Normalization drops per-message ids and trailing whitespace, so the same routing
+prompt built twice maps to the same entry.
+
+Entries expire after LLM_CACHE_TTL_SECONDS; past LLM_CACHE_MAX_ENTRIES the least
+recently used are dropped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from typing import Any, Dict, Optional
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# `loads` is marked beta; it is what LangChain's own caches use to restore generations
+warnings.filterwarnings("ignore", category=LangChainBetaWarning, module=__name__)
+
+def _normalize(node: Any) -> Any:
+    if isinstance(node, dict):
+        node = {key: _normalize(value) for key, value in node.items()}
+        kwargs = node.get("kwargs")
+        if node.get("lc") and isinstance(kwargs, dict) and isinstance(kwargs.get("id"), str):
+            # Message ids are fresh uuids on every call and say nothing about the content
+            kwargs.pop("id")
+        return node
+    if isinstance(node, list):
+        return [_normalize(value) for value in node]
+    if isinstance(node, str):
+        return node.rstrip()
+    return node
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    try:
+        prompt = json.dumps(_normalize(json.loads(prompt)), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        pass
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+class SqliteLLMCache(BaseCache):
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL, "
+            "hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self.conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE completions SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.hits += 1
+        try:
+            return [loads(generation) for generation in json.loads(row[0])]
+        except Exception as e:
+            logger.warning(f"Discarding unreadable LLM cache entry: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (cache_key(prompt, llm_string), value, now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        count = self.conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Drop a tenth at once so eviction does not run on every write
+        excess = count - self.max_entries + max(1, self.max_entries // 10)
+        self.conn.execute(
+            "DELETE FROM completions WHERE key IN (SELECT key FROM completions ORDER BY last_used LIMIT ?)", (excess,))
+        self.evicted += excess
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM completions")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "size_bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
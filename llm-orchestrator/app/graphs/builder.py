@@ -5,7 +5,9 @@ from .nodes import (
     preprocessing_node,
     analytics_node,
     reporter_node,
-    ml_node  
+    ml_node,
+    subtask_node,
+    join_subtasks,
 )
 from langgraph.checkpoint.memory import MemorySaver
 
@@ -18,11 +20,14 @@ def create_orchestrator(checkpointer=None) -> StateGraph:
     
     graph = (
         StateGraph(AgentState)
-        .add_node("ruya", ruya_node, destinations=("preprocessing_agent", "analytics_agent", "ml_agent", "reporter", END))
+        .add_node("ruya", ruya_node, destinations=("preprocessing_agent", "analytics_agent", "ml_agent", "reporter", "subtask", END))
         .add_node("preprocessing_agent", preprocessing_node)
         .add_node("analytics_agent", analytics_node)
         .add_node("ml_agent", ml_node)
         .add_node("reporter", reporter_node)
+        # Parallel plans: ruya sends independent subtasks to `subtask` branches, `join` merges them
+        .add_node("subtask", subtask_node)
+        .add_node("join", join_subtasks, destinations=("subtask", "ruya"))
         .add_edge(START, "ruya")
         # Conditional edges for agents
         .add_conditional_edges(
@@ -40,6 +45,7 @@ def create_orchestrator(checkpointer=None) -> StateGraph:
             route_after_agent,
             {"ruya": "ruya", END: END}
         )
+        .add_edge("subtask", "join")
         .add_edge("reporter", END)
     )
     return graph.compile(checkpointer=checkpointer)
\ No newline at end of file
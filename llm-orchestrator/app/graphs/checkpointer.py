@@ -0,0 +1,466 @@
+"""
+Bounded, persistent checkpointer for the orchestrator graph.
+
+MemorySaver keeps every checkpoint of every thread in process memory until restart.
+SqliteCheckpointSaver stores them in a local SQLite file instead, so threads survive a
+restart and memory stays flat, and bounds what it keeps:
+
+- Only the newest CHECKPOINT_MAX_PER_THREAD checkpoints (and their pending writes) of
+  each thread are kept; older ones are deleted as new ones arrive.
+- Channel values no remaining checkpoint refers to are compacted away.
+- Threads unused for CHECKPOINT_TTL_SECONDS are deleted by a periodic sweep.
+
+`checkpoint_file_refs()` lists the blob store refs the kept checkpoints point to, so the
+blob store does not evict files a thread can still resume from.
+
+`create_checkpointer()` picks the implementation from CHECKPOINTER ("sqlite" or "memory").
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+from app.utils.content_store import REF_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# State channels that hold blob store refs (directly or in nested entries)
+FILE_REF_CHANNELS = ("file_ref", "file_versions_history", "subtask_results")
+
+CHECKPOINTER = os.environ.get("CHECKPOINTER", "sqlite").lower()
+CHECKPOINT_DB_PATH = os.environ.get(
+    "CHECKPOINT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "uploads", "checkpoints.sqlite"))
+CHECKPOINT_MAX_PER_THREAD = int(os.environ.get("CHECKPOINT_MAX_PER_THREAD", "20"))
+CHECKPOINT_TTL_SECONDS = int(os.environ.get("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_SWEEP_SECONDS = int(os.environ.get("CHECKPOINT_SWEEP_SECONDS", "300"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """LangGraph checkpointer on a local SQLite file with per-thread retention and TTL eviction."""
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH, max_per_thread: int = CHECKPOINT_MAX_PER_THREAD,
+                 ttl_seconds: int = CHECKPOINT_TTL_SECONDS, sweep_seconds: int = CHECKPOINT_SWEEP_SECONDS, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        # The newest checkpoint's pending sends live in its parent's writes, so keep at least two
+        self.max_per_thread = max(2, max_per_thread)
+        self.ttl_seconds = ttl_seconds
+        self.sweep_seconds = sweep_seconds
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # Only takes effect on a new file; lets the TTL sweep hand freed pages back to the OS
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self.pruned_checkpoints = 0
+        self.compacted_blobs = 0
+        self.expired_threads = 0
+
+    # -- reads ---------------------------------------------------------------
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        channel_values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            row = self.conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                channel_values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return channel_values
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in rows]
+
+    def _load_sends(self, thread_id: str, checkpoint_ns: str, parent_checkpoint_id: Optional[str]) -> List[Any]:
+        if not parent_checkpoint_id:
+            return []
+        rows = self.conn.execute(
+            "SELECT type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "AND channel = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS),
+        ).fetchall()
+        return [self.serde.loads_typed((type_, value)) for type_, value in rows]
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: tuple,
+               metadata: Optional[CheckpointMetadata] = None) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint_b, metadata_type, metadata_b = row
+        checkpoint: Checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+                "pending_sends": self._load_sends(thread_id, checkpoint_ns, parent_checkpoint_id),
+            },
+            metadata=metadata if metadata is not None else self.serde.loads_typed((metadata_type, metadata_b)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                  "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            self._touch(thread_id)
+            return self._tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints")
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self.serde.loads_typed((row[4], row[5]))
+            if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                item = self._tuple(thread_id, checkpoint_ns, tuple(row), metadata)
+            yield item
+
+    # -- writes --------------------------------------------------------------
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)  # type: ignore[misc]
+        values: Dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+        blob_rows = []
+        for channel, version in new_versions.items():
+            type_, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)
+            blob_rows.append((thread_id, checkpoint_ns, channel, str(version), type_, blob))
+        type_, checkpoint_b = self.serde.dumps_typed(c)
+        metadata_type, metadata_b = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blob_rows)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     type_, checkpoint_b, metadata_type, metadata_b),
+                )
+                self._touch(thread_id)
+                self._prune(thread_id, checkpoint_ns)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._maybe_sweep()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special channels (errors, interrupts...) replace earlier writes; regular ones are written once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel,
+             *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock:
+            self.conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete_thread(thread_id)
+
+    def _delete_thread(self, thread_id: str) -> None:
+        for table in ("checkpoints", "blobs", "writes", "threads"):
+            self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: [*self.list(config, filter=filter, before=before, limit=limit)])
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # -- retention -----------------------------------------------------------
+
+    def _touch(self, thread_id: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()))
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drop checkpoints past the per-thread limit, their writes, and channel values nothing refers to."""
+        stale = [row[0] for row in self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_per_thread),
+        )]
+        if not stale:
+            return
+        placeholders = ", ".join("?" * len(stale))
+        for table in ("checkpoints", "writes"):
+            self.conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({placeholders})",
+                (thread_id, checkpoint_ns, *stale),
+            )
+        self.pruned_checkpoints += len(stale)
+        self.compacted_blobs += self._compact(thread_id, checkpoint_ns)
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> int:
+        referenced: Set[Tuple[str, str]] = set()
+        for type_, checkpoint_b in self.conn.execute(
+                "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns)):
+            checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+            referenced.update((channel, str(version)) for channel, version in checkpoint["channel_versions"].items())
+        unreferenced = [
+            (channel, version) for channel, version in self.conn.execute(
+                "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns))
+            if (channel, version) not in referenced
+        ]
+        self.conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in unreferenced],
+        )
+        return len(unreferenced)
+
+    def _maybe_sweep(self) -> None:
+        if time.time() - self._last_sweep >= self.sweep_seconds:
+            self._sweep()
+
+    def _sweep(self) -> int:
+        """Delete threads idle for longer than the TTL and return how many were removed."""
+        self._last_sweep = time.time()
+        cutoff = time.time() - self.ttl_seconds
+        expired = [row[0] for row in self.conn.execute("SELECT thread_id FROM threads WHERE last_used < ?", (cutoff,))]
+        if not expired:
+            return 0
+        self.conn.execute("BEGIN")
+        try:
+            for thread_id in expired:
+                self._delete_thread(thread_id)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("PRAGMA incremental_vacuum")
+        self.expired_threads += len(expired)
+        logger.info(f"Checkpointer removed {len(expired)} threads idle for more than {self.ttl_seconds}s")
+        return len(expired)
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._sweep()
+
+    def file_refs(self) -> Set[str]:
+        """Blob store refs held by any kept checkpoint."""
+        placeholders = ", ".join("?" * len(FILE_REF_CHANNELS))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT type, blob FROM blobs WHERE channel IN ({placeholders}) AND type != 'empty'", FILE_REF_CHANNELS,
+            ).fetchall()
+        refs: Set[str] = set()
+        for type_, blob in rows:
+            _collect_refs(self.serde.loads_typed((type_, blob)), refs)
+        return refs
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {
+                table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("threads", "checkpoints", "blobs", "writes")
+            }
+            payload_bytes = {
+                "checkpoints": self.conn.execute("SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints").fetchone()[0],
+                "blobs": self.conn.execute("SELECT COALESCE(SUM(LENGTH(blob)), 0) FROM blobs").fetchone()[0],
+                "writes": self.conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()[0],
+            }
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            cache_pages = self.conn.execute("PRAGMA cache_size").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            **counts,
+            "payload_bytes": payload_bytes,
+            "db_bytes": page_size * page_count,
+            # Negative cache_size is in KiB; this bounds the checkpointer's in-process memory
+            "cache_limit_bytes": -cache_pages * 1024 if cache_pages < 0 else cache_pages * page_size,
+            "max_per_thread": self.max_per_thread,
+            "ttl_seconds": self.ttl_seconds,
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "compacted_blobs": self.compacted_blobs,
+            "expired_threads": self.expired_threads,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+def _collect_refs(value: Any, refs: Set[str]) -> None:
+    if isinstance(value, str):
+        if REF_PATTERN.match(value):
+            refs.add(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_refs(item, refs)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_refs(item, refs)
+
+def checkpoint_file_refs(checkpointer: BaseCheckpointSaver) -> Set[str]:
+    """Blob store refs reachable from the checkpoints either checkpointer implementation keeps."""
+    if isinstance(checkpointer, SqliteCheckpointSaver):
+        return checkpointer.file_refs()
+    refs: Set[str] = set()
+    for key, typed in list(getattr(checkpointer, "blobs", {}).items()):
+        if key[2] in FILE_REF_CHANNELS and typed[0] != "empty":
+            _collect_refs(checkpointer.serde.loads_typed(typed), refs)
+    return refs
+
+def checkpointer_stats(checkpointer: BaseCheckpointSaver) -> Dict[str, Any]:
+    """Size metrics for either checkpointer implementation."""
+    if isinstance(checkpointer, SqliteCheckpointSaver):
+        return checkpointer.stats()
+    storage = getattr(checkpointer, "storage", {})
+    return {
+        "backend": "memory",
+        "threads": len(storage),
+        "checkpoints": sum(len(checkpoints) for namespaces in storage.values() for checkpoints in namespaces.values()),
+        "blobs": len(getattr(checkpointer, "blobs", {})),
+        "writes": sum(len(writes) for writes in getattr(checkpointer, "writes", {}).values()),
+    }
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    if CHECKPOINTER == "memory":
+        return MemorySaver()
+    return SqliteCheckpointSaver()
@@ -0,0 +1,137 @@
+"""
+Token-budgeted conversation context for agent prompts.
+
+Prompts used to include every earlier message, so they grew with the conversation.
+The history given to an agent is now:
+
+1. A running summary of older messages, kept in state (`conversation_summary`) and
+   extended incrementally: each message is digested once, when it leaves the window
+   of the last CONTEXT_KEEP_LAST_MESSAGES messages. The summary is capped at
+   CONTEXT_SUMMARY_MAX_TOKENS by dropping its oldest lines.
+2. The last CONTEXT_KEEP_LAST_MESSAGES messages verbatim (each cut to
+   max_len_per_message characters).
+
+The whole block is then held to the agent's token budget (CONTEXT_TOKEN_BUDGETS, e.g.
+"ruya=1500,preprocessing=2500", else CONTEXT_DEFAULT_TOKEN_BUDGET) by dropping summary
+lines first and then the oldest verbatim messages; the latest message is always kept.
+
+Tokens are counted with tiktoken's cl100k_base encoding, or estimated at four
+characters per token when the encoding is not available (e.g. offline).
+"""
+
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_KEEP_LAST_MESSAGES = int(os.environ.get("CONTEXT_KEEP_LAST_MESSAGES", "6"))
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.environ.get("CONTEXT_SUMMARY_MAX_TOKENS", "400"))
+CONTEXT_DEFAULT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_DEFAULT_TOKEN_BUDGET", "2000"))
+CONTEXT_TOKEN_BUDGETS = {
+    name.strip(): int(budget)
+    for name, _, budget in (
+        item.partition("=") for item in os.environ.get("CONTEXT_TOKEN_BUDGETS", "").split(",") if "=" in item
+    )
+}
+# Characters kept from each message in its summary line
+SUMMARY_LINE_CHARS = 160
+
+_encoder = None
+_encoder_failed = False
+
+def count_tokens(text: str) -> int:
+    global _encoder, _encoder_failed
+    if _encoder is None and not _encoder_failed:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            _encoder_failed = True
+            logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def token_budget(agent: Optional[str]) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(agent or "", CONTEXT_DEFAULT_TOKEN_BUDGET)
+
+def _role_content(message: Any) -> Tuple[str, str]:
+    """Role and text of a message given as a dict ({role|type, content|text}) or a LangChain message."""
+    if isinstance(message, dict):
+        role = message.get("role") or message.get("type") or message.get("name") or "message"
+        content = message.get("content", message.get("text", ""))
+    else:
+        role = getattr(message, "name", None) or getattr(message, "type", "message")
+        content = getattr(message, "content", "")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(role), str(content or "")
+
+def _digest(message: Any) -> str:
+    role, content = _role_content(message)
+    text = re.sub(r"\s+", " ", content).strip()
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS].rstrip() + "..."
+    return f"- {role}: {text}"
+
+def update_summary(summary: Optional[Dict[str, Any]], messages: List[Any],
+                   keep_last: int = CONTEXT_KEEP_LAST_MESSAGES) -> Dict[str, Any]:
+    """Fold messages that left the verbatim window into the summary; returns the new summary dict."""
+    summary = dict(summary or {})
+    done = summary.get("summarized_messages", 0)
+    lines: List[str] = list(summary.get("lines", []))
+    omitted = summary.get("omitted_messages", 0)
+    cutoff = max(0, len(messages) - keep_last)
+    if cutoff < done:
+        # History was replaced or cut; start over
+        done, lines, omitted = 0, [], 0
+    lines.extend(_digest(message) for message in messages[done:cutoff])
+    total = sum(count_tokens(line) for line in lines)
+    while lines and total > CONTEXT_SUMMARY_MAX_TOKENS:
+        total -= count_tokens(lines.pop(0))
+        omitted += 1
+    return {"lines": lines, "summarized_messages": cutoff, "omitted_messages": omitted}
+
+def build_context(messages: List[Any], summary: Optional[Dict[str, Any]] = None, agent: Optional[str] = None,
+                  max_len_per_message: int = 300, keep_last: int = CONTEXT_KEEP_LAST_MESSAGES,
+                  budget: Optional[int] = None) -> str:
+    """Conversation history for an agent prompt, within the agent's token budget."""
+    if not messages:
+        return ""
+    summary = update_summary(summary, messages, keep_last)
+    budget = budget if budget is not None else token_budget(agent)
+
+    recent = []
+    for message in messages[summary["summarized_messages"]:]:
+        role, content = _role_content(message)
+        if len(content) > max_len_per_message:
+            content = content[:max_len_per_message] + "..."
+        recent.append(f"{role}: {content}")
+    summary_lines = list(summary["lines"])
+    omitted = summary["omitted_messages"]
+
+    header = "Earlier conversation (summary):"
+    sizes = [count_tokens(line) for line in summary_lines]
+    recent_sizes = [count_tokens(line) for line in recent]
+    total = sum(sizes) + sum(recent_sizes) + (count_tokens(header) if summary_lines else 0)
+    while summary_lines and total > budget:
+        total -= sizes.pop(0)
+        summary_lines.pop(0)
+        omitted += 1
+    while len(recent) > 1 and total > budget:
+        total -= recent_sizes.pop(0)
+        recent.pop(0)
+        omitted += 1
+
+    parts = []
+    if summary_lines or omitted:
+        parts.append(header)
+        if omitted:
+            parts.append(f"({omitted} earlier messages omitted)")
+        parts.extend(summary_lines)
+        parts.append("")
+        parts.append("Recent messages:")
+    parts.extend(recent)
+    return "\n".join(parts)
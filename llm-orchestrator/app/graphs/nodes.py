@@ -1,40 +1,71 @@
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langgraph.types import Command
+from langgraph.types import Command, Send
 from langgraph.prebuilt import create_react_agent
-from .state import AgentState
+from .state import AgentState, externalize_files
+from .context import build_context, update_summary
 from .utils import  decode_csv_schema
 from app.agents.preprocessing_agent import preprocess_data
 from app.agents.ml_agent import run_ml_task
 from app.core.llm import get_llm
 from app.tools.file_manager_tools import upload_file_tool, list_files_tool, find_file_tool, delete_file_tool
-from typing import Dict, Any
+from typing import Dict, Any, List
 import json 
 import colorama
 from colorama import Fore, Back, Style
 from colorama import Fore, Style, init as colorama_init
 colorama_init(autoreset=True)
 
+import functools
 import logging
+import os
 from uuid import uuid4
 import datetime
 
 logger = logging.getLogger(__name__)
 
+# Most subtask branches started at once when ruya's plan fans out
+SUBTASK_MAX_PARALLEL = int(os.environ.get("SUBTASK_MAX_PARALLEL", "4"))
+
 ruya_agent = create_react_agent(
     model=get_llm(),
     tools=[],
     name="ruya",
 )
 
-def format_agent_conversation_history(messages: list, max_len_per_message: int = 300) -> str:
-    pass
+def format_agent_conversation_history(messages: list, max_len_per_message: int = 300,
+                                      summary: Dict[str, Any] = None, agent: str = None) -> str:
+    """Recent messages verbatim plus the running summary of older ones, within the agent's token budget."""
+    return build_context(messages, summary=summary, agent=agent, max_len_per_message=max_len_per_message)
+
+def state_conversation_history(state: AgentState, agent: str = None, max_len_per_message: int = 300) -> str:
+    """format_agent_conversation_history for a node's state, using the summary kept in it."""
+    return format_agent_conversation_history(state.get("messages") or [], max_len_per_message,
+                                             summary=state.get("conversation_summary"), agent=agent)
+
+def compact_conversation(state: AgentState) -> Dict[str, Any]:
+    """State update that folds messages leaving the verbatim window into `conversation_summary`."""
+    return {"conversation_summary": update_summary(state.get("conversation_summary"), state.get("messages") or [])}
 
+def compacts_conversation(node):
+    """Node decorator: an update that sets `messages` also advances `conversation_summary`."""
+    @functools.wraps(node)
+    async def wrapper(state: AgentState) -> Any:
+        result = await node(state)
+        update = result.update if isinstance(result, Command) else result
+        if isinstance(update, dict) and update.get("messages") is not None:
+            update.update(compact_conversation({**state, **update}))
+        return result
+    return wrapper
+
+@compacts_conversation
 async def ruya_node(state: AgentState) -> Dict[str, Any]:
     pass
 
+@compacts_conversation
 async def preprocessing_node(state: AgentState) -> Dict[str, Any]:
     pass
 
+@compacts_conversation
 async def analytics_node(state: AgentState) -> Dict[str, Any]:
     pass
 
@@ -53,8 +84,116 @@ reporter_agent = create_react_agent(
 def extract_message(msg: Any) -> str:
     pass
 
+@compacts_conversation
 async def reporter_node(state: AgentState) -> Dict[str, Any]:
     pass
 
+@compacts_conversation
 async def ml_node(state: AgentState) -> Dict[str, Any]:
-    pass
\ No newline at end of file
+    pass
+
+SUBTASK_AGENTS = {
+    "preprocessing_agent": preprocessing_node,
+    "analytics_agent": analytics_node,
+    "ml_agent": ml_node,
+}
+
+def ready_subtasks(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Pending subtasks of a plan whose dependencies are all done."""
+    subtasks = (plan or {}).get("subtasks") or []
+    done = {subtask["id"] for subtask in subtasks if subtask.get("status") == "done"}
+    return [
+        subtask for subtask in subtasks
+        if subtask.get("status", "pending") == "pending" and set(subtask.get("depends_on") or []) <= done
+    ][:SUBTASK_MAX_PARALLEL]
+
+def dispatch_subtasks(state: AgentState, plan: Dict[str, Any] = None) -> Command:
+    """Fan the ready subtasks of a plan out to parallel `subtask` branches.
+
+    ruya returns this when its plan has independent steps, e.g.
+    {"subtasks": [{"id": "profile", "agent": "analytics_agent", "task": "..."},
+                  {"id": "baseline", "agent": "ml_agent", "task": "...", "depends_on": []}]}.
+    Every branch sees the state as of dispatch, including the same immutable `file_ref`.
+    """
+    plan = plan or state.get("plan") or {}
+    ready = ready_subtasks(plan)
+    ready_ids = {subtask["id"] for subtask in ready}
+    plan = {**plan, "subtasks": [
+        {**subtask, "status": "running"} if subtask["id"] in ready_ids else subtask
+        for subtask in plan.get("subtasks") or []
+    ]}
+    snapshot = {key: value for key, value in state.items() if key not in ("subtask_results", "plan")}
+    logger.info(f"Dispatching {len(ready)} subtasks in parallel: {sorted(ready_ids)}")
+    return Command(update={"plan": plan}, goto=[Send("subtask", {"state": snapshot, "subtask": subtask}) for subtask in ready])
+
+async def subtask_node(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one subtask on its own branch; the outcome is only recorded in `subtask_results`."""
+    state, subtask = payload["state"], payload["subtask"]
+    branch_state = {**state, "current_subtask": subtask.get("task"), "produce_final_message": False}
+    outcome = {"id": subtask["id"], "agent": subtask.get("agent"), "base_file_ref": state.get("file_ref")}
+    try:
+        update = await SUBTASK_AGENTS[subtask.get("agent")](branch_state)
+        if isinstance(update, Command):
+            update = update.update or {}
+        update = externalize_files(update or {})
+        base_messages = state.get("messages") or []
+        messages = update.pop("messages", None) or base_messages
+        outcome.update(status="done", update=update, new_messages=messages[len(base_messages):])
+    except Exception as e:
+        logger.error(f"Subtask {subtask['id']} failed: {e}", exc_info=True)
+        outcome.update(status="error", error=str(e), update={}, new_messages=[
+            {"role": subtask.get("agent") or "system", "content": f"Subtask {subtask['id']} failed: {e}"}])
+    return {"subtask_results": [outcome]}
+
+def join_subtasks(state: AgentState) -> Command:
+    """Merge the finished branches in plan order, then start the next wave or hand back to ruya.
+
+    Branches ran against the same file version. A new file produced by a branch becomes
+    the current file; if several branches produced one, the last in plan order wins and
+    the others are kept in `file_versions_history`.
+    """
+    plan = state.get("plan") or {}
+    order = {subtask["id"]: index for index, subtask in enumerate(plan.get("subtasks") or [])}
+    results = sorted(state.get("subtask_results") or [], key=lambda result: order.get(result["id"], len(order)))
+    by_id = {result["id"]: result for result in results}
+
+    messages = list(state.get("messages") or [])
+    history = list(state.get("file_versions_history") or [])
+    update: Dict[str, Any] = {"subtask_results": None}
+    for result in results:
+        messages.extend(result.get("new_messages") or [])
+        changes = {key: value for key, value in result.get("update", {}).items()
+                   if key not in ("status", "file_versions_history", "plan", "current_subtask")}
+        # A branch that left the file alone echoes the base ref; only a new ref (with its format and metadata) counts
+        new_ref = changes.pop("file_ref", None)
+        file_fields = {key: changes.pop(key) for key in ("file_format", "file_metadata") if key in changes}
+        if new_ref and new_ref != result.get("base_file_ref"):
+            history.append({"version": len(history) + 1, "file_ref": new_ref, "subtask": result["id"],
+                            "agent": result.get("agent")})
+            update.update(file_ref=new_ref, **file_fields)
+        update.update(changes)
+    update["messages"] = messages
+    update.update(compact_conversation({**state, "messages": messages}))
+    if history:
+        update["file_versions_history"] = history
+
+    subtasks = [
+        {**subtask, "status": by_id[subtask["id"]]["status"]} if subtask["id"] in by_id else subtask
+        for subtask in plan.get("subtasks") or []
+    ]
+    # Subtasks that depend on a failed one cannot run
+    failed = {subtask["id"] for subtask in subtasks if subtask.get("status") in ("error", "skipped")}
+    while True:
+        blocked = {subtask["id"] for subtask in subtasks
+                   if subtask.get("status", "pending") == "pending" and set(subtask.get("depends_on") or []) & failed}
+        if not blocked:
+            break
+        subtasks = [{**subtask, "status": "skipped"} if subtask["id"] in blocked else subtask for subtask in subtasks]
+        failed |= blocked
+    plan = {**plan, "subtasks": subtasks}
+    update["plan"] = plan
+    merged = {**state, **update, "subtask_results": []}
+    if ready_subtasks(plan):
+        wave = dispatch_subtasks(merged, plan)
+        return Command(update={**update, **wave.update}, goto=wave.goto)
+    return Command(update=update, goto="ruya")
@@ -1,24 +1,73 @@
-from typing import Dict, Any, List, TypedDict, Literal, Optional
+import base64
+from typing import Annotated, Dict, Any, List, TypedDict, Literal, Optional
 
+from app.utils.content_store import blob_store
+
+
+def merge_subtask_results(current: Optional[List[Dict[str, Any]]], new: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Reducer for results of parallel subtask branches; an update of None clears them."""
+    if new is None:
+        return []
+    return (current or []) + new
 
 class AgentState(TypedDict):
-    """State schema for the agent workflow."""
+    """State schema for the agent workflow.
+
+    Files are never stored inline: `file_ref` and the `file_ref` of each
+    `file_versions_history` entry point into the blob store, so checkpoints stay small.
+    Use `state_file_path` / `blob_store.read_bytes` to get at the content; stored files
+    are never modified, a changed file is stored under a new ref.
+    """
     session_id: str
     thread_id: str
     messages: List[Dict[str, Any]]
-    file_data_base64: Optional[str]
+    conversation_summary: Optional[Dict[str, Any]]  # {lines, summarized_messages, omitted_messages}, see graphs/context.py
+    file_ref: Optional[str]
     file_format: Optional[str]
+    export_format: Optional[str]  # format of the user's upload; file_ref holds a Parquet working copy until export
     file_metadata: Optional[Dict[str, Any]]
     status: Literal["RUNNING", "DONE"]
     current_step: int
-    plan: Optional[Dict[str, Any]]
+    plan: Optional[Dict[str, Any]]  # {"subtasks": [{id, agent, task, depends_on, status}]} for parallel fan-out
+    subtask_results: Annotated[List[Dict[str, Any]], merge_subtask_results]  # written by parallel branches, drained by join
     current_subtask: Optional[str]
     result: Optional[Dict[str, Any]]  # {content, file_path, is_large}
     file_id: Optional[str]
     file_version: Optional[int]
-    file_versions_history: Optional[List[Dict[str, Any]]]
+    file_versions_history: Optional[List[Dict[str, Any]]]  # [{version, file_ref, ...}]
     model_path: Optional[str]
     model_metrics: Optional[Dict[str, Any]]
     tracking_uri: Optional[str]
     produce_final_message: Optional[bool]  # Flag indicating if current agent output should be final response
 
+def state_file_path(state: Dict[str, Any]) -> Optional[str]:
+    """Path of a private working copy of the state's current file, or None if it has none.
+
+    Tools may rewrite the copy in place. Store the result with `blob_store.put_file` and remove the copy.
+    """
+    ref = state.get("file_ref")
+    return blob_store.working_copy(ref) if ref else None
+
+def _ref_from_base64(content: str, file_format: Optional[str]) -> str:
+    return blob_store.put_bytes(base64.b64decode(content), file_format or "")
+
+def externalize_files(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace inline base64 file content in a state update with blob store refs.
+
+    Accepts the legacy `file_data_base64` key and `file_content_base64` in version history entries.
+    """
+    update = dict(update)
+    content = update.pop("file_data_base64", None)
+    if content:
+        update["file_ref"] = _ref_from_base64(content, update.get("file_format"))
+    history = update.get("file_versions_history")
+    if history:
+        entries = []
+        for entry in history:
+            entry = dict(entry)
+            entry_content = entry.pop("file_content_base64", None) or entry.pop("file_data_base64", None)
+            if entry_content:
+                entry["file_ref"] = _ref_from_base64(entry_content, entry.get("file_format") or update.get("file_format"))
+            entries.append(entry)
+        update["file_versions_history"] = entries
+    return update
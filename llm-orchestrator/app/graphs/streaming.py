@@ -0,0 +1,99 @@
+"""
+Live event stream of a LangGraph run, for server-sent events.
+
+Built on `astream_events(version="v2")`, so output reaches the client while nodes are
+still running instead of once per finished node:
+
+- token:       a chunk of LLM output, with the graph node and agent that produced it
+- message:     a full LLM message that was not streamed token by token (cache hits,
+               providers without streaming)
+- node_start / node_end: a graph node (or a node of an agent subgraph) started/finished
+- tool_start / tool_end: a tool call and its (truncated) result
+- progress:    custom events dispatched by tools with `adispatch_custom_event`
+- error:       the run failed; always the last event in that case
+"""
+
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Characters of tool input/output forwarded in tool events
+STREAM_PAYLOAD_CHARS = int(os.environ.get("STREAM_PAYLOAD_CHARS", "2000"))
+
+def _truncate(value: Any) -> str:
+    if not isinstance(value, str):
+        value = getattr(value, "content", value)
+        try:
+            value = value if isinstance(value, str) else json.dumps(value, default=str)
+        except (TypeError, ValueError):
+            value = str(value)
+    return value if len(value) <= STREAM_PAYLOAD_CHARS else value[:STREAM_PAYLOAD_CHARS] + "..."
+
+def _text(message: Any) -> str:
+    content = getattr(message, "content", "") or ""
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+def _source(event: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = event.get("metadata") or {}
+    return {
+        "node": metadata.get("langgraph_node"),
+        "agent": metadata.get("lc_agent_name") or metadata.get("langgraph_node"),
+        "namespace": metadata.get("langgraph_checkpoint_ns", ""),
+    }
+
+def _is_node_run(event: Dict[str, Any]) -> bool:
+    """True for the chain run of a graph node itself, not the runnables inside it."""
+    metadata = event.get("metadata") or {}
+    return bool(metadata.get("langgraph_node")) and event.get("name") == metadata["langgraph_node"]
+
+async def stream_graph_events(graph: Any, inputs: Any, config: Optional[Dict[str, Any]] = None,
+                              **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+    """Yield {"event": kind, ...} dicts for a graph run as it happens (see module docstring)."""
+    streamed_runs: Set[str] = set()
+    try:
+        async for event in graph.astream_events(inputs, config, version="v2", **kwargs):
+            kind = event["event"]
+            run_id = event.get("run_id")
+            if kind == "on_chat_model_stream":
+                text = _text(event["data"].get("chunk"))
+                if text:
+                    streamed_runs.add(run_id)
+                    yield {"event": "token", "run_id": run_id, "content": text, **_source(event)}
+            elif kind == "on_chat_model_end":
+                if run_id in streamed_runs:
+                    streamed_runs.discard(run_id)
+                    continue
+                text = _text(event["data"].get("output"))
+                if text:
+                    yield {"event": "message", "run_id": run_id, "content": text, **_source(event)}
+            elif kind == "on_tool_start":
+                yield {"event": "tool_start", "run_id": run_id, "tool": event.get("name"),
+                       "input": _truncate(event["data"].get("input")), **_source(event)}
+            elif kind == "on_tool_end":
+                yield {"event": "tool_end", "run_id": run_id, "tool": event.get("name"),
+                       "output": _truncate(event["data"].get("output")), **_source(event)}
+            elif kind == "on_custom_event":
+                yield {"event": "progress", "name": event.get("name"), "data": event["data"], **_source(event)}
+            elif kind == "on_chain_start" and _is_node_run(event):
+                yield {"event": "node_start", "run_id": run_id, **_source(event)}
+            elif kind == "on_chain_end" and _is_node_run(event):
+                output = event["data"].get("output")
+                done = {"event": "node_end", "run_id": run_id, **_source(event)}
+                if isinstance(output, dict):
+                    done["updated"] = sorted(output)
+                    if output.get("status"):
+                        done["status"] = output["status"]
+                yield done
+    except Exception as e:
+        logger.error(f"Graph stream failed: {e}", exc_info=True)
+        yield {"event": "error", "error": str(e)}
+
+def to_sse(event: Dict[str, Any]) -> Dict[str, str]:
+    """sse_starlette message for a stream event."""
+    event = dict(event)
+    return {"event": event.pop("event"), "data": json.dumps(event, default=str)}
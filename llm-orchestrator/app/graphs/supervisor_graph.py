@@ -9,7 +9,7 @@ import uuid
 import tempfile
 from pathlib import Path
 import re
-from typing import List, Dict, Any, Optional, Union, Annotated, Sequence, TypedDict, Tuple
+from typing import List, Dict, Any, AsyncIterator, Optional, Union, Annotated, Sequence, TypedDict, Tuple
 from datetime import datetime
 
 import pandas as pd
@@ -31,6 +31,7 @@ from app.agents.preprocessing_agent import preprocess_data
 from app.agents.ml_agent import run_ml_task
 from app.utils.file_metadata import extract_file_metadata, format_metadata_for_prompt
 from app.tools.file_manager_tools import get_file_version_tool
+from app.graphs.streaming import stream_graph_events
 
 def extract_file_paths_from_response(response_text: str) -> Dict[str, Any]:
     pass
@@ -43,9 +44,21 @@ _GLOBAL_STATE_STORE = {}
 class StateInjectingSupervisor:
     def __init__(self, base_app):
         self.base_app = base_app
-        
+
+    def _inject_state(self, input_state):
+        """Publish the run's file context (data_path, file_id, ...) in _GLOBAL_STATE_STORE for the agents.
+
+        Every entry point goes through here, so invoked and streamed runs see the same context.
+        """
+        _GLOBAL_STATE_STORE.update({key: value for key, value in input_state.items()
+                                    if key != "messages" and value is not None})
+        return input_state
+
     async def ainvoke(self, input_state, config=None):
-        pass
+        return await self.base_app.ainvoke(self._inject_state(input_state), config)
+
+    def astream_events(self, input_state, config=None, **kwargs):
+        return self.base_app.astream_events(self._inject_state(input_state), config, **kwargs)
 
 model = get_llm()
 logger = logging.getLogger(__name__)
@@ -135,4 +148,12 @@ app = StateInjectingSupervisor(_base_app)
 from app.tools.file_manager_tools import get_file_version
 
 async def process_query(query: str, data_path: str = None, existing_context: dict = None, file_id: str = None):
-    pass
\ No newline at end of file
+    pass
+
+async def stream_query(query: str, data_path: str = None, file_id: str = None,
+                       thread_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming counterpart of process_query: token, node and tool events as they happen (see graphs/streaming.py)."""
+    input_state = {"messages": [HumanMessage(content=query)], "data_path": data_path, "file_id": file_id}
+    config = {"configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+    async for event in stream_graph_events(app, input_state, config):
+        yield event
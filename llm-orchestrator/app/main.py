@@ -12,6 +12,7 @@ from .core.config import settings
 from .api.routes import router as api_router
 from .api.supervisor_routes import router as supervisor_router
 from .api.llm_routes import router as llm_router
+from .utils.http_clients import close_clients
 
 from colorama import Fore, Style, init as colorama_init
 colorama_init(autoreset=True)
@@ -120,6 +121,10 @@ app.include_router(supervisor_router, prefix=settings.API_V1_STR)
 # Include simple LLM routes
 app.include_router(llm_router, prefix=settings.API_V1_STR + "/llm", tags=["LLM Provider"])
 
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    await close_clients()
+
 # Health check endpoint
 @app.get("/health")
 async def health():
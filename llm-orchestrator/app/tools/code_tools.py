@@ -1,18 +1,68 @@
+import asyncio
+import contextlib
 import httpx
+import json
 import logging
 import base64
 import os
 import random
 import string
 import time
-from typing import Dict, Any, Optional
-from langchain.tools import tool
+from typing import AsyncIterator, Dict, Any, Optional
+from httpx_sse import aconnect_sse
+from langchain.tools import StructuredTool, tool
 from app.utils.base64_store import base64_store
+from app.utils.content_store import content_store
+from app.utils.http_clients import async_client, sync_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 CODE_EXECUTION_URL = "http://localhost:1000"
+CODE_STREAM_TIMEOUT = 300.0
+
+def _shared_file_ref(data_path: str) -> Optional[str]:
+    """Put data_path in the store shared with CES and return its ref, or None to upload the file instead."""
+    if not content_store.enabled:
+        return None
+    try:
+        return content_store.put_file(data_path)
+    except OSError as e:
+        logger.warning(f"Shared store unavailable for {data_path}, uploading instead: {e}")
+        return None
+
+def decode_result(value: Any) -> Any:
+    """Turn a typed CES result back into plain JSON: frames into records, series into {index: value}, arrays into lists.
+
+    CES encodes frames column by column (see ces/serialization.py). Cut-down results keep their
+    `truncated` flag, shape and summary next to the decoded rows.
+    """
+    if isinstance(value, list):
+        return [decode_result(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get("type")
+    if kind not in ("dataframe", "series", "index", "ndarray", "list") or "truncated" not in value:
+        return {key: decode_result(item) for key, item in value.items()}
+    if "data" not in value:
+        # Over the size budget: only the summary came back
+        return value
+    if kind == "dataframe":
+        rows = [dict(zip(value["columns"], row)) for row in zip(*value["data"])]
+        if "index" in value:
+            rows = [{"index": index, **row} for index, row in zip(value["index"], rows)]
+        data: Any = rows
+    elif kind == "series":
+        index = value.get("index", range(len(value["data"])))
+        data = {str(key): item for key, item in zip(index, value["data"])}
+    elif kind == "list":
+        data = [decode_result(item) for item in value["data"]]
+    else:
+        data = value["data"]
+    if not value["truncated"]:
+        return data
+    return {"data": data, "truncated": True,
+            **{key: value[key] for key in ("shape", "length", "summary") if key in value}}
 
 @tool
 def execute_code(code: str, timeout: int = 10) -> Dict[str, Any]:
@@ -45,10 +95,222 @@ def transform_dataset_with_code(code: str, data_path: str, timeout: int = 30) ->
     """Execute Python code to modify a dataset file and save changes back to the original file."""
     pass
 
+def _session_open_kwargs(data_path: Optional[str], sheet_name: Optional[str], file) -> Dict[str, Any]:
+    """Request arguments for POST /sessions: a shared-store ref, an upload of `file`, or an empty session."""
+    file_ref = _shared_file_ref(data_path) if data_path else None
+    if file_ref:
+        return {"data": {"file_ref": file_ref, **({"sheet_name": sheet_name} if sheet_name else {})}}
+    if file is not None:
+        return {"files": {"file": (os.path.basename(data_path), file, "application/octet-stream")},
+                "data": {"sheet_name": sheet_name} if sheet_name else None}
+    return {}
+
+def _session_started(response: httpx.Response) -> Dict[str, Any]:
+    if response.status_code != 200:
+        return {"success": False, "error": f"Failed to start session ({response.status_code}): {response.text}"}
+    return {"success": True, **response.json()}
+
+def start_code_session(data_path: Optional[str] = None, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Start a persistent Python session, loading the data file once as `df`. Later snippets in the session reuse it and any variables they define."""
+    if data_path and not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        with open(data_path, "rb") if data_path else contextlib.nullcontext() as f:
+            response = sync_client("code_execution").post(
+                f"{CODE_EXECUTION_URL}/sessions", **_session_open_kwargs(data_path, sheet_name, f))
+    except Exception as e:
+        logger.error(f"Failed to start code session for {data_path}: {e}")
+        return {"success": False, "error": str(e)}
+    return _session_started(response)
+
+async def astart_code_session(data_path: Optional[str] = None, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Async version of start_code_session."""
+    if data_path and not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        with open(data_path, "rb") if data_path else contextlib.nullcontext() as f:
+            # Hashing and copying into the shared store is file I/O; keep it off the event loop
+            kwargs = await asyncio.to_thread(_session_open_kwargs, data_path, sheet_name, f)
+            response = await async_client("code_execution").post(f"{CODE_EXECUTION_URL}/sessions", **kwargs)
+    except Exception as e:
+        logger.error(f"Failed to start code session for {data_path}: {e}")
+        return {"success": False, "error": str(e)}
+    return _session_started(response)
+
+def _session_executed(response: httpx.Response) -> Dict[str, Any]:
+    if response.status_code != 200:
+        return {"success": False, "error": f"Session execution failed ({response.status_code}): {response.text}"}
+    body = response.json()
+    if "result" in body:
+        body["result"] = decode_result(body["result"])
+    return body
+
+def run_session_code(session_id: str, code: str, timeout: int = 30) -> Dict[str, Any]:
+    """Run Python code in an open session. `df` and earlier variables are still in memory; assign `result` to return a value."""
+    try:
+        response = sync_client("code_execution").post(
+            f"{CODE_EXECUTION_URL}/sessions/{session_id}/execute",
+            json={"code": code, "timeout": timeout},
+            timeout=timeout + 30,
+        )
+    except Exception as e:
+        logger.error(f"Code execution in session {session_id} failed: {e}")
+        return {"success": False, "error": str(e)}
+    return _session_executed(response)
+
+async def arun_session_code(session_id: str, code: str, timeout: int = 30) -> Dict[str, Any]:
+    """Async version of run_session_code."""
+    try:
+        response = await async_client("code_execution").post(
+            f"{CODE_EXECUTION_URL}/sessions/{session_id}/execute",
+            json={"code": code, "timeout": timeout},
+            timeout=timeout + 30,
+        )
+    except Exception as e:
+        logger.error(f"Code execution in session {session_id} failed: {e}")
+        return {"success": False, "error": str(e)}
+    return _session_executed(response)
+
+def save_session_dataset(session_id: str, data_path: str) -> Dict[str, Any]:
+    """Write the session's current `df` to data_path, in the format given by its extension."""
+    try:
+        with sync_client("code_execution").stream(
+            "GET",
+            f"{CODE_EXECUTION_URL}/sessions/{session_id}/export",
+            params={"file_name": os.path.basename(data_path)},
+        ) as response:
+            if response.status_code != 200:
+                response.read()
+                return {"success": False, "error": f"Export failed ({response.status_code}): {response.text}"}
+            fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(data_path)[1], dir=os.path.dirname(os.path.abspath(data_path)))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in response.iter_bytes():
+                        f.write(chunk)
+                os.replace(tmp_path, data_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    except Exception as e:
+        logger.error(f"Failed to save session {session_id} to {data_path}: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "session_id": session_id, "data_path": data_path}
+
+async def asave_session_dataset(session_id: str, data_path: str) -> Dict[str, Any]:
+    """Async version of save_session_dataset."""
+    try:
+        async with async_client("code_execution").stream(
+            "GET",
+            f"{CODE_EXECUTION_URL}/sessions/{session_id}/export",
+            params={"file_name": os.path.basename(data_path)},
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return {"success": False, "error": f"Export failed ({response.status_code}): {response.text}"}
+            fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(data_path)[1], dir=os.path.dirname(os.path.abspath(data_path)))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
+                os.replace(tmp_path, data_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    except Exception as e:
+        logger.error(f"Failed to save session {session_id} to {data_path}: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "session_id": session_id, "data_path": data_path}
+
+def _session_closed(response: httpx.Response) -> Dict[str, Any]:
+    if response.status_code != 200:
+        return {"success": False, "error": f"Failed to close session ({response.status_code}): {response.text}"}
+    return response.json()
+
+def close_code_session(session_id: str) -> Dict[str, Any]:
+    """Close a code session and free its memory. Sessions also close on their own after a period of inactivity."""
+    try:
+        response = sync_client("code_execution").delete(f"{CODE_EXECUTION_URL}/sessions/{session_id}")
+    except Exception as e:
+        logger.error(f"Failed to close code session {session_id}: {e}")
+        return {"success": False, "error": str(e)}
+    return _session_closed(response)
+
+async def aclose_code_session(session_id: str) -> Dict[str, Any]:
+    """Async version of close_code_session."""
+    try:
+        response = await async_client("code_execution").delete(f"{CODE_EXECUTION_URL}/sessions/{session_id}")
+    except Exception as e:
+        logger.error(f"Failed to close code session {session_id}: {e}")
+        return {"success": False, "error": str(e)}
+    return _session_closed(response)
+
+start_code_session_tool = StructuredTool.from_function(func=start_code_session, coroutine=astart_code_session)
+run_session_code_tool = StructuredTool.from_function(func=run_session_code, coroutine=arun_session_code)
+save_session_dataset_tool = StructuredTool.from_function(func=save_session_dataset, coroutine=asave_session_dataset)
+close_code_session_tool = StructuredTool.from_function(func=close_code_session, coroutine=aclose_code_session)
+
+async def stream_code_execution(code: str, data_path: Optional[str] = None, timeout: int = 30,
+                                session_id: Optional[str] = None,
+                                user_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Run code on the code execution service and yield its events as they happen.
+
+    Events are dicts with an "event" key: start, stdout, stderr, figure, progress, then result (or error).
+    Runs in the code session when session_id is given. Closing the generator early cancels the execution.
+    user_id is the key CES uses to queue executions fairly between users.
+    """
+    if data_path and not os.path.exists(data_path):
+        yield {"event": "error", "status_code": 404, "detail": f"File not found: {data_path}"}
+        return
+    headers = {"X-User-Id": user_id} if user_id else {}
+    if session_id:
+        # The session already holds its dataset
+        data_path = None
+        request = {"method": "POST", "url": f"{CODE_EXECUTION_URL}/sessions/{session_id}/execute_stream",
+                   "json": {"code": code, "timeout": timeout}}
+    else:
+        params = {"code": code, "timeout": timeout}
+        file_ref = await asyncio.to_thread(_shared_file_ref, data_path) if data_path else None
+        if file_ref:
+            params.update(file_ref=file_ref, file_name=os.path.basename(data_path))
+            data_path = None
+        request = {"method": "POST", "url": f"{CODE_EXECUTION_URL}/execute_stream",
+                   "data": {"request": json.dumps(params)}}
+    file = open(data_path, "rb") if data_path else None
+    try:
+        if file is not None:
+            request["files"] = {"file": (os.path.basename(data_path), file, "application/octet-stream")}
+        # Output can pause for as long as the snippet runs, so there is no read timeout on the stream
+        async with aconnect_sse(async_client("code_execution"), headers=headers,
+                                timeout=httpx.Timeout(CODE_STREAM_TIMEOUT, read=None), **request) as event_source:
+            if event_source.response.status_code != 200:
+                await event_source.response.aread()
+                yield {"event": "error", "status_code": event_source.response.status_code,
+                       "detail": event_source.response.text}
+                return
+            async for sse in event_source.aiter_sse():
+                event = {"event": sse.event, **json.loads(sse.data)}
+                if sse.event == "result" and "result" in event:
+                    event["result"] = decode_result(event["result"])
+                yield event
+    finally:
+        if file is not None:
+            file.close()
+
+async def cancel_code_execution(execution_id: str) -> Dict[str, Any]:
+    """Stop a streaming execution started by stream_code_execution before its timeout."""
+    response = await async_client("code_execution").delete(f"{CODE_EXECUTION_URL}/executions/{execution_id}")
+    if response.status_code != 200:
+        return {"success": False, "error": f"Cancel failed ({response.status_code}): {response.text}"}
+    return response.json()
+
 code_tools = [
     execute_code,
     analyze_data_with_code,
-    transform_dataset_with_code
+    transform_dataset_with_code,
+    start_code_session_tool,
+    run_session_code_tool,
+    save_session_dataset_tool,
+    close_code_session_tool
 ]
 
 tool_map = {tool.name: tool for tool in code_tools}
\ No newline at end of file
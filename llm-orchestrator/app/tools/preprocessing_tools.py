@@ -5,24 +5,39 @@ Preprocessing Tools
 This module provides tools for data preprocessing operations that can be used with LangGraph.
 """
 
+import asyncio
 import base64
-import httpx
+import json
 import logging
 import os
+import shutil
 import tempfile
 import traceback
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from enum import Enum
 from pydantic import BaseModel, Field
 from datetime import datetime
 from langchain.tools import StructuredTool
 
 from ..tools.file_manager_tools import get_file_version_tool, update_file_from_data_tool, analyze_file_changes_tool
+from ..utils.http_clients import async_client, sync_client
+from ..utils.interchange import INTERCHANGE_MEDIA_TYPES, export_to_original, to_interchange
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DATA_PREPROCESSING_URL = "http://localhost:10003/"
+# "binary" streams raw file bytes (multipart in, octet-stream out); "base64" uses the legacy JSON endpoints
+PREPROCESSING_TRANSPORT = os.environ.get("PREPROCESSING_TRANSPORT", "binary").lower()
+RESULT_HEADER = "X-Operation-Result"
+# Files above this size use the service's out-of-core /stream endpoints where available
+PREPROCESSING_CHUNKED_THRESHOLD_MB = float(os.environ.get("PREPROCESSING_CHUNKED_THRESHOLD_MB", "200"))
+CHUNKED_ENDPOINTS = {
+    "cleaning/remove-duplicates",
+    "cleaning/handle-missing-values",
+    "cleaning/clean-text",
+    "cleaning/remove-outliers",
+}
 
 class CleaningOperation(str, Enum):
     REMOVE_DUPLICATES = "remove-duplicates"
@@ -85,6 +100,146 @@ class ScoreFunction(str, Enum):
     F_CLASSIF = "f_classif"
     MUTUAL_INFO_CLASSIF = "mutual_info_classif"
 
+def _split_list(value: Optional[str]) -> Optional[List[str]]:
+    """Turn a comma-separated tool argument into a list of stripped names."""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _download_target(target_path: str, request_kwargs: Dict[str, Any]) -> Tuple[int, str]:
+    """Open a temp file next to target_path for a download.
+
+    Parquet/Arrow targets ask the service for that format, so columnar working copies stay columnar.
+    """
+    media_type = INTERCHANGE_MEDIA_TYPES.get(os.path.splitext(target_path)[1].lower())
+    if media_type:
+        request_kwargs.setdefault("headers", {})["Accept"] = media_type
+    return tempfile.mkstemp(suffix=os.path.splitext(target_path)[1], dir=os.path.dirname(os.path.abspath(target_path)))
+
+def _stream_to_path(method: str, url: str, target_path: str, **request_kwargs) -> Dict[str, Any]:
+    """Stream a binary response body onto target_path atomically and return the operation details header."""
+    fd, tmp_path = _download_target(target_path, request_kwargs)
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            with sync_client("preprocessing").stream(method, url, **request_kwargs) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise RuntimeError(f"{url} failed ({response.status_code}): {response.text}")
+                result = json.loads(response.headers.get(RESULT_HEADER, "{}"))
+                for chunk in response.iter_bytes():
+                    dst.write(chunk)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
+
+async def _astream_to_path(method: str, url: str, target_path: str, **request_kwargs) -> Dict[str, Any]:
+    """Async version of _stream_to_path on the shared connection pool."""
+    fd, tmp_path = _download_target(target_path, request_kwargs)
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            async with async_client("preprocessing").stream(method, url, **request_kwargs) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise RuntimeError(f"{url} failed ({response.status_code}): {response.text}")
+                result = json.loads(response.headers.get(RESULT_HEADER, "{}"))
+                async for chunk in response.aiter_bytes():
+                    dst.write(chunk)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
+
+def _binary_url(endpoint: str, data_path: str, params: Dict[str, Any]) -> str:
+    """Binary endpoint for the operation: the out-of-core /stream variant for large files where it applies."""
+    mode = "binary"
+    if (endpoint in CHUNKED_ENDPOINTS
+            and params.get("method") != "near" and params.get("keep", "first") == "first"
+            and os.path.splitext(data_path)[1].lower() in (".csv", ".parquet")
+            and os.path.getsize(data_path) > PREPROCESSING_CHUNKED_THRESHOLD_MB * 1024 * 1024):
+        mode = "stream"
+    return f"{DATA_PREPROCESSING_URL.rstrip('/')}/{endpoint}/{mode}"
+
+def _post_binary(endpoint: str, data_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Upload the file as multipart and stream the processed file back over data_path."""
+    with open(data_path, "rb") as src:
+        return _stream_to_path(
+            "POST", _binary_url(endpoint, data_path, params), data_path,
+            files={"file": (os.path.basename(data_path), src, "application/octet-stream")},
+            data={"params": json.dumps(params)},
+        )
+
+async def _apost_binary(endpoint: str, data_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Async version of _post_binary."""
+    with open(data_path, "rb") as src:
+        return await _astream_to_path(
+            "POST", _binary_url(endpoint, data_path, params), data_path,
+            files={"file": (os.path.basename(data_path), src, "application/octet-stream")},
+            data={"params": json.dumps(params)},
+        )
+
+def _base64_payload(data_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    with open(data_path, "rb") as f:
+        return {
+            "file_content_base64": base64.b64encode(f.read()).decode("utf-8"),
+            "original_filename": os.path.basename(data_path),
+            **params,
+        }
+
+def _base64_result(endpoint: str, data_path: str, response) -> Dict[str, Any]:
+    """Write the file content of a base64 reply back to data_path and return the operation details."""
+    if response.status_code != 200:
+        raise RuntimeError(f"{endpoint} failed ({response.status_code}): {response.text}")
+    result = response.json().get("data") or {}
+    content = result.pop("file_content_base64", None)
+    if content:
+        with open(data_path, "wb") as f:
+            f.write(base64.b64decode(content))
+    return result
+
+def _post_base64(endpoint: str, data_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Legacy JSON transport: send the file as base64 and write the returned content back."""
+    response = sync_client("preprocessing").post(f"{DATA_PREPROCESSING_URL.rstrip('/')}/{endpoint}",
+                                                 json=_base64_payload(data_path, params))
+    return _base64_result(endpoint, data_path, response)
+
+async def _apost_base64(endpoint: str, data_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Async version of _post_base64; encoding and decoding the file run off the event loop."""
+    payload = await asyncio.to_thread(_base64_payload, data_path, params)
+    response = await async_client("preprocessing").post(f"{DATA_PREPROCESSING_URL.rstrip('/')}/{endpoint}",
+                                                        json=payload)
+    return await asyncio.to_thread(_base64_result, endpoint, data_path, response)
+
+def _call_preprocessing_endpoint(endpoint: str, data_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a preprocessing operation on data_path in place and return the operation details."""
+    if not data_path or not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        if PREPROCESSING_TRANSPORT == "base64":
+            result = _post_base64(endpoint, data_path, params)
+        else:
+            result = _post_binary(endpoint, data_path, params)
+    except Exception as e:
+        logger.error(f"Preprocessing call {endpoint} failed: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "data_path": data_path, **result}
+
+async def _acall_preprocessing_endpoint(endpoint: str, data_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Async version of _call_preprocessing_endpoint on the shared connection pool."""
+    if not data_path or not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        if PREPROCESSING_TRANSPORT == "base64":
+            result = await _apost_base64(endpoint, data_path, params)
+        else:
+            result = await _apost_binary(endpoint, data_path, params)
+    except Exception as e:
+        logger.error(f"Preprocessing call {endpoint} failed: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "data_path": data_path, **result}
+
 def handle_missing_values(
     data_path: str, 
     sheet_name: Optional[str] = None,
@@ -92,12 +247,66 @@ def handle_missing_values(
     columns: Optional[str] = None,
     fill_value: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Send an HTTP request to handle missing values by sending file content as base64."""
-    pass
+    """Send an HTTP request to handle missing values, streaming the file to the preprocessing service."""
+    return _call_preprocessing_endpoint("cleaning/handle-missing-values", data_path, {
+        "sheet_name": sheet_name,
+        "strategy": strategy,
+        "columns": _split_list(columns),
+        "fill_value": fill_value,
+    })
 
-def remove_duplicates(data_path: str, sheet_name: Optional[str] = None, subset: Optional[str] = None) -> Dict[str, Any]:
-    """Send an HTTP request to remove duplicate rows from the dataset by sending file content as base64."""
-    pass
+async def ahandle_missing_values(
+    data_path: str,
+    sheet_name: Optional[str] = None,
+    strategy: Optional[str] = "mean",
+    columns: Optional[str] = None,
+    fill_value: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async version of handle_missing_values."""
+    return await _acall_preprocessing_endpoint("cleaning/handle-missing-values", data_path, {
+        "sheet_name": sheet_name,
+        "strategy": strategy,
+        "columns": _split_list(columns),
+        "fill_value": fill_value,
+    })
+
+def remove_duplicates(
+    data_path: str,
+    sheet_name: Optional[str] = None,
+    subset: Optional[str] = None,
+    keep: Optional[str] = "first",
+    method: Optional[str] = "exact",
+    text_column: Optional[str] = None,
+    similarity_threshold: Optional[float] = 0.8
+) -> Dict[str, Any]:
+    """Send an HTTP request to remove exact or near-duplicate rows, streaming the file to the preprocessing service."""
+    return _call_preprocessing_endpoint("cleaning/remove-duplicates", data_path, {
+        "sheet_name": sheet_name,
+        "subset": _split_list(subset),
+        "keep": keep,
+        "method": method,
+        "text_column": text_column,
+        "similarity_threshold": similarity_threshold,
+    })
+
+async def aremove_duplicates(
+    data_path: str,
+    sheet_name: Optional[str] = None,
+    subset: Optional[str] = None,
+    keep: Optional[str] = "first",
+    method: Optional[str] = "exact",
+    text_column: Optional[str] = None,
+    similarity_threshold: Optional[float] = 0.8
+) -> Dict[str, Any]:
+    """Async version of remove_duplicates."""
+    return await _acall_preprocessing_endpoint("cleaning/remove-duplicates", data_path, {
+        "sheet_name": sheet_name,
+        "subset": _split_list(subset),
+        "keep": keep,
+        "method": method,
+        "text_column": text_column,
+        "similarity_threshold": similarity_threshold,
+    })
 
 def drop_rows_columns(
     data_path: str,
@@ -106,8 +315,28 @@ def drop_rows_columns(
     threshold: Optional[float] = None,
     to_drop: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Send an HTTP request to drop rows or columns using base64 file content."""
-    pass
+    """Send an HTTP request to drop rows or columns, streaming the file to the preprocessing service."""
+    return _call_preprocessing_endpoint("cleaning/drop-rows-columns", data_path, {
+        "sheet_name": sheet_name,
+        "axis": axis,
+        "threshold": threshold,
+        "to_drop": _split_list(to_drop),
+    })
+
+async def adrop_rows_columns(
+    data_path: str,
+    sheet_name: Optional[str] = None,
+    axis: Optional[int] = 0,
+    threshold: Optional[float] = None,
+    to_drop: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async version of drop_rows_columns."""
+    return await _acall_preprocessing_endpoint("cleaning/drop-rows-columns", data_path, {
+        "sheet_name": sheet_name,
+        "axis": axis,
+        "threshold": threshold,
+        "to_drop": _split_list(to_drop),
+    })
 
 def clean_text(
     data_path: str,
@@ -115,18 +344,65 @@ def clean_text(
     operation: str,
     sheet_name: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Send an HTTP request to clean text data in a specific column."""
-    pass
+    """Send an HTTP request to clean text columns.
+
+    `column` and `operation` accept comma-separated lists; every operation is applied in order to every column in one request.
+    """
+    return _call_preprocessing_endpoint("cleaning/clean-text", data_path, {
+        "sheet_name": sheet_name,
+        "columns": _split_list(column),
+        "operations": _split_list(operation),
+    })
+
+async def aclean_text(
+    data_path: str,
+    column: str,
+    operation: str,
+    sheet_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async version of clean_text."""
+    return await _acall_preprocessing_endpoint("cleaning/clean-text", data_path, {
+        "sheet_name": sheet_name,
+        "columns": _split_list(column),
+        "operations": _split_list(operation),
+    })
 
 def remove_outliers(
     data_path: str,
     columns: str,
     method: Optional[str] = "zscore",
     threshold: Optional[float] = 3.0,
-    sheet_name: Optional[str] = None
+    sheet_name: Optional[str] = None,
+    bounds: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Send an HTTP request to remove outliers from specified columns."""
-    pass
+    """Send an HTTP request to remove outliers from specified columns.
+
+    The response includes the bounds used; pass them back as `bounds` (JSON) to apply the same thresholds to new data.
+    """
+    return _call_preprocessing_endpoint("cleaning/remove-outliers", data_path, {
+        "sheet_name": sheet_name,
+        "method": method,
+        "threshold": threshold,
+        "columns": _split_list(columns),
+        "bounds": json.loads(bounds) if bounds else None,
+    })
+
+async def aremove_outliers(
+    data_path: str,
+    columns: str,
+    method: Optional[str] = "zscore",
+    threshold: Optional[float] = 3.0,
+    sheet_name: Optional[str] = None,
+    bounds: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async version of remove_outliers."""
+    return await _acall_preprocessing_endpoint("cleaning/remove-outliers", data_path, {
+        "sheet_name": sheet_name,
+        "method": method,
+        "threshold": threshold,
+        "columns": _split_list(columns),
+        "bounds": json.loads(bounds) if bounds else None,
+    })
 
 def normalisation(
     data_path: str,
@@ -180,19 +456,259 @@ def validate_range(
     """Send an HTTP request to validate that values in a column are within a specified range."""
     pass
 
+def open_dataset(data_path: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Upload a file once to the preprocessing service and get a dataset handle for chained operations."""
+    if not data_path or not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        with open(data_path, "rb") as f:
+            response = sync_client("preprocessing").post(
+                f"{DATA_PREPROCESSING_URL.rstrip('/')}/datasets",
+                files={"file": (os.path.basename(data_path), f, "application/octet-stream")},
+                data={"sheet_name": sheet_name} if sheet_name else None,
+            )
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Failed to open dataset {data_path}: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, **response.json()["data"]}
+
+async def aopen_dataset(data_path: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Async version of open_dataset."""
+    if not data_path or not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        with open(data_path, "rb") as f:
+            response = await async_client("preprocessing").post(
+                f"{DATA_PREPROCESSING_URL.rstrip('/')}/datasets",
+                files={"file": (os.path.basename(data_path), f, "application/octet-stream")},
+                data={"sheet_name": sheet_name} if sheet_name else None,
+            )
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Failed to open dataset {data_path}: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, **response.json()["data"]}
+
+def apply_dataset_operation(dataset_handle: str, operation: str, params: Optional[str] = None) -> Dict[str, Any]:
+    """Apply a cleaning operation to a dataset handle; only the operation summary travels over the wire."""
+    try:
+        response = sync_client("preprocessing").post(
+            f"{DATA_PREPROCESSING_URL.rstrip('/')}/datasets/{dataset_handle}/operations",
+            json={"operation": operation, "params": json.loads(params) if params else {}},
+        )
+        if response.status_code != 200:
+            return {"success": False, "error": f"{operation} failed ({response.status_code}): {response.text}"}
+    except Exception as e:
+        logger.error(f"Dataset operation {operation} on {dataset_handle} failed: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, **response.json()["data"]}
+
+async def aapply_dataset_operation(dataset_handle: str, operation: str, params: Optional[str] = None) -> Dict[str, Any]:
+    """Async version of apply_dataset_operation."""
+    try:
+        response = await async_client("preprocessing").post(
+            f"{DATA_PREPROCESSING_URL.rstrip('/')}/datasets/{dataset_handle}/operations",
+            json={"operation": operation, "params": json.loads(params) if params else {}},
+        )
+        if response.status_code != 200:
+            return {"success": False, "error": f"{operation} failed ({response.status_code}): {response.text}"}
+    except Exception as e:
+        logger.error(f"Dataset operation {operation} on {dataset_handle} failed: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, **response.json()["data"]}
+
+def materialize_dataset(dataset_handle: str, data_path: str, release: bool = True) -> Dict[str, Any]:
+    """Download the current state of a dataset handle to data_path, optionally releasing the handle."""
+    base_url = f"{DATA_PREPROCESSING_URL.rstrip('/')}/datasets/{dataset_handle}"
+    try:
+        result = _stream_to_path("GET", base_url, data_path)
+        if release:
+            sync_client("preprocessing").delete(base_url)
+    except Exception as e:
+        logger.error(f"Failed to materialize dataset {dataset_handle}: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "data_path": data_path, "released": release, **result}
+
+async def amaterialize_dataset(dataset_handle: str, data_path: str, release: bool = True) -> Dict[str, Any]:
+    """Async version of materialize_dataset."""
+    base_url = f"{DATA_PREPROCESSING_URL.rstrip('/')}/datasets/{dataset_handle}"
+    try:
+        result = await _astream_to_path("GET", base_url, data_path)
+        if release:
+            await async_client("preprocessing").delete(base_url)
+    except Exception as e:
+        logger.error(f"Failed to materialize dataset {dataset_handle}: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "data_path": data_path, "released": release, **result}
+
+def _pipeline_form(steps: str, sheet_name: Optional[str]) -> Dict[str, str]:
+    parsed_steps = json.loads(steps) if isinstance(steps, str) else steps
+    form = {"steps": json.dumps(parsed_steps)}
+    if sheet_name:
+        form["sheet_name"] = sheet_name
+    return form
+
+def run_preprocessing_pipeline(data_path: str, steps: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Run several preprocessing operations in one request and write the final file back to data_path."""
+    if not data_path or not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        form = _pipeline_form(steps, sheet_name)
+        with open(data_path, "rb") as src:
+            result = _stream_to_path(
+                "POST", f"{DATA_PREPROCESSING_URL.rstrip('/')}/pipeline/binary", data_path,
+                files={"file": (os.path.basename(data_path), src, "application/octet-stream")},
+                data=form,
+            )
+    except Exception as e:
+        logger.error(f"Preprocessing pipeline failed: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "data_path": data_path, **result}
+
+async def arun_preprocessing_pipeline(data_path: str, steps: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Async version of run_preprocessing_pipeline."""
+    if not data_path or not os.path.exists(data_path):
+        return {"success": False, "error": f"File not found: {data_path}"}
+    try:
+        form = _pipeline_form(steps, sheet_name)
+        with open(data_path, "rb") as src:
+            result = await _astream_to_path(
+                "POST", f"{DATA_PREPROCESSING_URL.rstrip('/')}/pipeline/binary", data_path,
+                files={"file": (os.path.basename(data_path), src, "application/octet-stream")},
+                data=form,
+            )
+    except Exception as e:
+        logger.error(f"Preprocessing pipeline failed: {e}")
+        return {"success": False, "error": str(e)}
+    return {"success": True, "data_path": data_path, **result}
+
+def _file_manager_copy(file_id: str) -> str:
+    """Copy the latest version of a file manager file to a temporary working path."""
+    result = get_file_version_tool.invoke({"file_id": file_id}) or {}
+    if result.get("success") is False:
+        raise RuntimeError(result.get("error") or f"File {file_id} not found")
+    info = result.get("data") or result
+    name = info.get("original_filename") or info.get("filename") or info.get("file_path") or ""
+    fd, working_path = tempfile.mkstemp(suffix=os.path.splitext(name)[1] or ".csv")
+    os.close(fd)
+    if info.get("file_content_base64"):
+        with open(working_path, "wb") as f:
+            f.write(base64.b64decode(info["file_content_base64"]))
+    elif info.get("file_path") and os.path.exists(info["file_path"]):
+        # Work on a copy: stored versions are never modified in place
+        shutil.copyfile(info["file_path"], working_path)
+    else:
+        os.remove(working_path)
+        raise RuntimeError(f"File manager returned no content for {file_id}")
+    return working_path
+
+def _store_new_version(file_id: str, working_path: str, original_path: str) -> Dict[str, Any]:
+    """Write the processed copy back in the file's original format and save it as a new file manager version."""
+    export_to_original(working_path, original_path)
+    with open(original_path, "rb") as f:
+        content = base64.b64encode(f.read()).decode("utf-8")
+    return update_file_from_data_tool.invoke(
+        {"file_id": file_id, "file_content_base64": content, "source": "preprocessing_agent"})
+
+def _remove_working_files(*paths: str) -> None:
+    for path in set(paths):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _run_structured(client, data_path: Optional[str], file_id: Optional[str], /, **params) -> Dict[str, Any]:
+    """Run a client operation on data_path, or on a file manager file which gets a new version with the result."""
+    if data_path:
+        return client(data_path, **params)
+    if not file_id:
+        return {"success": False, "error": "Either data_path or file_id is required"}
+    try:
+        original_path = _file_manager_copy(file_id)
+    except Exception as e:
+        logger.error(f"Could not load file {file_id}: {e}")
+        return {"success": False, "error": f"Could not load file {file_id}: {e}"}
+    working_path = original_path
+    try:
+        # The operation runs on a columnar copy; the original format is only written back for the new version
+        working_path = to_interchange(original_path)
+        result = client(working_path, **params)
+        result.pop("data_path", None)
+        if result.get("success"):
+            result["file_update"] = _store_new_version(file_id, working_path, original_path)
+        result["file_id"] = file_id
+        return result
+    except Exception as e:
+        logger.error(f"Preprocessing file {file_id} failed: {e}")
+        return {"success": False, "error": str(e), "file_id": file_id}
+    finally:
+        _remove_working_files(original_path, working_path)
+
+async def _arun_structured(client, data_path: Optional[str], file_id: Optional[str], /, **params) -> Dict[str, Any]:
+    """Async version of _run_structured; file conversions and file manager calls run off the event loop."""
+    if data_path:
+        return await client(data_path, **params)
+    if not file_id:
+        return {"success": False, "error": "Either data_path or file_id is required"}
+    try:
+        original_path = await asyncio.to_thread(_file_manager_copy, file_id)
+    except Exception as e:
+        logger.error(f"Could not load file {file_id}: {e}")
+        return {"success": False, "error": f"Could not load file {file_id}: {e}"}
+    working_path = original_path
+    try:
+        working_path = await asyncio.to_thread(to_interchange, original_path)
+        result = await client(working_path, **params)
+        result.pop("data_path", None)
+        if result.get("success"):
+            result["file_update"] = await asyncio.to_thread(_store_new_version, file_id, working_path, original_path)
+        result["file_id"] = file_id
+        return result
+    except Exception as e:
+        logger.error(f"Preprocessing file {file_id} failed: {e}")
+        return {"success": False, "error": str(e), "file_id": file_id}
+    finally:
+        _remove_working_files(original_path, working_path)
+
 class RemoveDuplicatesInput(BaseModel):
     data_path: Optional[str] = Field(None, description="Path to the data file (CSV or Excel)")
     file_id: Optional[str] = Field(None, description="ID of the file in the file manager (use instead of data_path)")
     sheet_name: Optional[str] = Field(None, description="Optional name of the sheet to process (defaults to first sheet)")
     subset: Optional[str] = Field(None, description="Optional comma-separated list of column names to consider for identifying duplicates")
+    keep: Optional[str] = Field("first", description="Which row of each duplicate group to keep (first, last, none)")
+    method: Optional[str] = Field("exact", description="exact compares whole rows; near finds similar texts in text_column")
+    text_column: Optional[str] = Field(None, description="Text column to compare when method is near")
+    similarity_threshold: Optional[float] = Field(0.8, description="Minimum estimated Jaccard similarity for near-duplicates (0-1)")
 
 def remove_duplicates_structured(
     data_path: Optional[str] = None,
     file_id: Optional[str] = None,
     sheet_name: Optional[str] = None,
-    subset: Optional[str] = None
+    subset: Optional[str] = None,
+    keep: Optional[str] = "first",
+    method: Optional[str] = "exact",
+    text_column: Optional[str] = None,
+    similarity_threshold: Optional[float] = 0.8
 ) -> dict:
-    pass
+    if method == "near" and not text_column:
+        return {"success": False, "error": "text_column is required when method is 'near'"}
+    return _run_structured(remove_duplicates, data_path, file_id, sheet_name=sheet_name, subset=subset, keep=keep,
+                           method=method, text_column=text_column, similarity_threshold=similarity_threshold)
+
+async def aremove_duplicates_structured(
+    data_path: Optional[str] = None,
+    file_id: Optional[str] = None,
+    sheet_name: Optional[str] = None,
+    subset: Optional[str] = None,
+    keep: Optional[str] = "first",
+    method: Optional[str] = "exact",
+    text_column: Optional[str] = None,
+    similarity_threshold: Optional[float] = 0.8
+) -> dict:
+    if method == "near" and not text_column:
+        return {"success": False, "error": "text_column is required when method is 'near'"}
+    return await _arun_structured(aremove_duplicates, data_path, file_id, sheet_name=sheet_name, subset=subset,
+                                  keep=keep, method=method, text_column=text_column,
+                                  similarity_threshold=similarity_threshold)
 
 class HandleMissingValuesInput(BaseModel):
     data_path: Optional[str] = Field(None, description="Path to the data file (CSV or Excel)")
@@ -210,7 +726,19 @@ def handle_missing_values_structured(
     columns: Optional[str] = None,
     fill_value: Optional[str] = None
 ) -> dict:
-    pass
+    return _run_structured(handle_missing_values, data_path, file_id, sheet_name=sheet_name,
+                           strategy=strategy, columns=columns, fill_value=fill_value)
+
+async def ahandle_missing_values_structured(
+    data_path: Optional[str] = None,
+    file_id: Optional[str] = None,
+    sheet_name: Optional[str] = None,
+    strategy: Optional[str] = "mean",
+    columns: Optional[str] = None,
+    fill_value: Optional[str] = None
+) -> dict:
+    return await _arun_structured(ahandle_missing_values, data_path, file_id, sheet_name=sheet_name,
+                                  strategy=strategy, columns=columns, fill_value=fill_value)
 
 class DropRowsColumnsInput(BaseModel):
     data_path: Optional[str] = Field(None, description="Path to the data file (CSV or Excel)")
@@ -222,18 +750,31 @@ class DropRowsColumnsInput(BaseModel):
 
 def drop_rows_columns_structured(
     data_path: Optional[str] = None,
+    file_id: Optional[str] = None,
     sheet_name: Optional[str] = None,
     axis: Optional[int] = 0,
     threshold: Optional[float] = None,
     to_drop: Optional[str] = None
 ) -> dict:
-    pass
+    return _run_structured(drop_rows_columns, data_path, file_id, sheet_name=sheet_name,
+                           axis=axis, threshold=threshold, to_drop=to_drop)
+
+async def adrop_rows_columns_structured(
+    data_path: Optional[str] = None,
+    file_id: Optional[str] = None,
+    sheet_name: Optional[str] = None,
+    axis: Optional[int] = 0,
+    threshold: Optional[float] = None,
+    to_drop: Optional[str] = None
+) -> dict:
+    return await _arun_structured(adrop_rows_columns, data_path, file_id, sheet_name=sheet_name,
+                                  axis=axis, threshold=threshold, to_drop=to_drop)
 
 class CleanTextInput(BaseModel):
     data_path: Optional[str] = Field(None, description="Path to the data file (CSV or Excel)")
     file_id: Optional[str] = Field(None, description="ID of the file in the file manager (use instead of data_path)")
-    column: str = Field(..., description="Name of the column containing text to clean")
-    operation: str = Field(..., description="Text cleaning operation (lowercase, remove_punctuation, remove_numbers, remove_whitespace)")
+    column: str = Field(..., description="Name of the text column to clean, or a comma-separated list of columns")
+    operation: str = Field(..., description="Text cleaning operation (lowercase, remove_punctuation, remove_numbers, remove_whitespace), or a comma-separated chain applied in order")
     sheet_name: Optional[str] = Field(None, description="Optional name of the sheet to process (defaults to first sheet)")
 
 def clean_text_structured(
@@ -243,7 +784,21 @@ def clean_text_structured(
     operation: str = None,
     sheet_name: Optional[str] = None
 ) -> dict:
-    pass
+    if not column or not operation:
+        return {"success": False, "error": "column and operation are required"}
+    return _run_structured(clean_text, data_path, file_id, column=column, operation=operation, sheet_name=sheet_name)
+
+async def aclean_text_structured(
+    data_path: Optional[str] = None,
+    file_id: Optional[str] = None,
+    column: str = None,
+    operation: str = None,
+    sheet_name: Optional[str] = None
+) -> dict:
+    if not column or not operation:
+        return {"success": False, "error": "column and operation are required"}
+    return await _arun_structured(aclean_text, data_path, file_id, column=column, operation=operation,
+                                  sheet_name=sheet_name)
 
 class RemoveOutliersInput(BaseModel):
     data_path: Optional[str] = Field(None, description="Path to the data file (CSV or Excel)")
@@ -252,6 +807,7 @@ class RemoveOutliersInput(BaseModel):
     method: Optional[str] = Field("zscore", description="Method for outlier detection (zscore, iqr, isolation-forest)")
     threshold: Optional[float] = Field(3.0, description="Threshold for outlier detection (e.g. zscore > 3.0)")
     sheet_name: Optional[str] = Field(None, description="Optional name of the sheet to process (defaults to first sheet)")
+    bounds: Optional[str] = Field(None, description='Optional JSON bounds from a previous remove_outliers result, e.g. {"age": {"lower": 0, "upper": 90}}, to reuse the same thresholds')
 
 def remove_outliers_structured(
     data_path: Optional[str] = None,
@@ -259,9 +815,37 @@ def remove_outliers_structured(
     columns: str = None,
     method: Optional[str] = "zscore",
     threshold: Optional[float] = 3.0,
-    sheet_name: Optional[str] = None
+    sheet_name: Optional[str] = None,
+    bounds: Optional[str] = None
 ) -> dict:
-    pass
+    if not columns:
+        return {"success": False, "error": "columns is required"}
+    try:
+        if bounds:
+            json.loads(bounds)
+    except ValueError as e:
+        return {"success": False, "error": f"bounds must be a JSON object: {e}"}
+    return _run_structured(remove_outliers, data_path, file_id, columns=columns, method=method,
+                           threshold=threshold, sheet_name=sheet_name, bounds=bounds)
+
+async def aremove_outliers_structured(
+    data_path: Optional[str] = None,
+    file_id: Optional[str] = None,
+    columns: str = None,
+    method: Optional[str] = "zscore",
+    threshold: Optional[float] = 3.0,
+    sheet_name: Optional[str] = None,
+    bounds: Optional[str] = None
+) -> dict:
+    if not columns:
+        return {"success": False, "error": "columns is required"}
+    try:
+        if bounds:
+            json.loads(bounds)
+    except ValueError as e:
+        return {"success": False, "error": f"bounds must be a JSON object: {e}"}
+    return await _arun_structured(aremove_outliers, data_path, file_id, columns=columns, method=method,
+                                  threshold=threshold, sheet_name=sheet_name, bounds=bounds)
 
 class NormalisationInput(BaseModel):
     data_path: Optional[str] = Field(None, description="Path to the data file (CSV or Excel)")
@@ -355,15 +939,36 @@ def validate_range_structured(
 ) -> dict:
     pass
 
+class RunPipelineInput(BaseModel):
+    data_path: str = Field(..., description="Path to the data file (CSV or Excel)")
+    steps: str = Field(..., description='JSON list of steps to run in order, e.g. [{"operation": "cleaning/remove-duplicates", "params": {}}, {"operation": "cleaning/handle-missing-values", "params": {"strategy": "median"}}]')
+    sheet_name: Optional[str] = Field(None, description="Optional name of the sheet to process (defaults to first sheet)")
+
+class OpenDatasetInput(BaseModel):
+    data_path: str = Field(..., description="Path to the data file (CSV or Excel) to load on the preprocessing service")
+    sheet_name: Optional[str] = Field(None, description="Optional name of the sheet to process (defaults to first sheet)")
+
+class ApplyDatasetOperationInput(BaseModel):
+    dataset_handle: str = Field(..., description="Handle returned by open_dataset")
+    operation: str = Field(..., description="Operation name such as cleaning/remove-duplicates or cleaning/handle-missing-values")
+    params: Optional[str] = Field(None, description='JSON object of operation parameters, e.g. {"strategy": "mean", "columns": ["age"]}')
+
+class MaterializeDatasetInput(BaseModel):
+    dataset_handle: str = Field(..., description="Handle returned by open_dataset")
+    data_path: str = Field(..., description="Path where the processed file should be written")
+    release: bool = Field(True, description="Release the handle on the service after downloading")
+
 remove_duplicates_tool = StructuredTool.from_function(
     remove_duplicates_structured,
+    coroutine=aremove_duplicates_structured,
     args_schema=RemoveDuplicatesInput,
     name="remove_duplicates",
-    description="Remove duplicate rows from the dataset."
+    description="Remove duplicate rows from the dataset, or near-duplicate texts with method='near'. Reports duplicate-group counts."
 )
 
 handle_missing_values_tool = StructuredTool.from_function(
     handle_missing_values_structured,
+    coroutine=ahandle_missing_values_structured,
     args_schema=HandleMissingValuesInput,
     name="handle_missing_values",
     description="Handle missing values in the dataset using various strategies (mean, median, mode, constant, drop)."
@@ -371,6 +976,7 @@ handle_missing_values_tool = StructuredTool.from_function(
 
 drop_rows_columns_tool = StructuredTool.from_function(
     drop_rows_columns_structured,
+    coroutine=adrop_rows_columns_structured,
     args_schema=DropRowsColumnsInput,
     name="drop_rows_columns",
     description="Drop rows or columns with too many missing values based on a threshold, or drop specific rows/columns."
@@ -378,13 +984,15 @@ drop_rows_columns_tool = StructuredTool.from_function(
 
 clean_text_tool = StructuredTool.from_function(
     clean_text_structured,
+    coroutine=aclean_text_structured,
     args_schema=CleanTextInput,
     name="clean_text",
-    description="Clean text data in a specific column using operations like lowercase, remove punctuation, etc."
+    description="Clean text data in one or more columns using a chain of operations like lowercase, remove punctuation, etc. in a single pass."
 )
 
 remove_outliers_tool = StructuredTool.from_function(
     remove_outliers_structured,
+    coroutine=aremove_outliers_structured,
     args_schema=RemoveOutliersInput,
     name="remove_outliers",
     description="Remove outliers from the dataset using statistical methods."
@@ -432,6 +1040,38 @@ validate_range_tool = StructuredTool.from_function(
     description="Validate that values in a column fall within a specified range."
 )
 
+run_preprocessing_pipeline_tool = StructuredTool.from_function(
+    run_preprocessing_pipeline,
+    coroutine=arun_preprocessing_pipeline,
+    args_schema=RunPipelineInput,
+    name="run_preprocessing_pipeline",
+    description="Run an ordered list of preprocessing operations in a single request. Prefer this over separate tool calls when the cleaning plan is known; returns per-step timing."
+)
+
+open_dataset_tool = StructuredTool.from_function(
+    open_dataset,
+    coroutine=aopen_dataset,
+    args_schema=OpenDatasetInput,
+    name="open_dataset",
+    description="Load a dataset once on the preprocessing service and return a handle. Use it to chain several cleaning operations without re-uploading the file."
+)
+
+apply_dataset_operation_tool = StructuredTool.from_function(
+    apply_dataset_operation,
+    coroutine=aapply_dataset_operation,
+    args_schema=ApplyDatasetOperationInput,
+    name="apply_dataset_operation",
+    description="Apply a cleaning operation to a dataset handle in memory on the preprocessing service."
+)
+
+materialize_dataset_tool = StructuredTool.from_function(
+    materialize_dataset,
+    coroutine=amaterialize_dataset,
+    args_schema=MaterializeDatasetInput,
+    name="materialize_dataset",
+    description="Write the processed dataset behind a handle back to a file once all operations are applied."
+)
+
 tools = [
     remove_duplicates_tool,
     handle_missing_values_tool,
@@ -444,6 +1084,10 @@ tools = [
     feature_reduction_pca_tool,
     validate_non_negative_tool,
     validate_range_tool,
+    run_preprocessing_pipeline_tool,
+    open_dataset_tool,
+    apply_dataset_operation_tool,
+    materialize_dataset_tool,
 ]
 
 tool_map = {tool.name: tool for tool in tools}
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Content-addressed file store shared with the code execution service.
+
+The orchestrator and CES run on the same host, so instead of base64-encoding a file
+into every execution request, the file is copied once into a shared directory under
+the name `<blake2b-160 hex digest><extension>` and only that name (the file ref) is
+sent. CES mounts the directory read-only and memory-maps the file in place.
+
+Unchanged files are hashed once: digests are remembered per (path, size, mtime).
+When the store outgrows SHARED_STORE_MAX_MB, the least recently used files are removed;
+reads count as use, and refs reported by the store's `live_refs` callback are never removed.
+
+`blob_store` is a second store of the same kind, private to the orchestrator, that
+backs the file references kept in the graph state: the state (and every checkpoint of
+it) holds a short ref, and nodes read the bytes only when they need them. Its
+`live_refs` is wired to the checkpointer, so files of threads that still have
+checkpoints survive eviction.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SHARED_STORE_DIR = os.environ.get("SHARED_STORE_DIR", "")
+SHARED_STORE_MAX_MB = int(os.environ.get("SHARED_STORE_MAX_MB", "4096"))
+BLOB_STORE_DIR = os.environ.get(
+    "BLOB_STORE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "uploads", "blobs"))
+BLOB_STORE_MAX_MB = int(os.environ.get("BLOB_STORE_MAX_MB", "20480"))
+HASH_CHUNK_BYTES = 1024 * 1024
+REF_PATTERN = re.compile(r"^[0-9a-f]{40}(\.[A-Za-z0-9]{1,10})?$")
+EXTENSION_PATTERN = re.compile(r"^\.[a-z0-9]{1,10}$")
+# Stored files are immutable: their name is the digest of their content
+BLOB_MODE = 0o444
+
+def file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _ref_extension(extension: str) -> str:
+    """Extension part of a ref: lower case with a leading dot, or empty if REF_PATTERN would reject it."""
+    if extension and not extension.startswith("."):
+        extension = f".{extension}"
+    extension = extension.lower()
+    if extension and not EXTENSION_PATTERN.match(extension):
+        logger.warning(f"Storing content without its unsupported extension {extension!r}")
+        return ""
+    return extension
+
+class ContentStore:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Refs still in use elsewhere (e.g. by checkpoints); they are kept even when the store is over its limit
+        self.live_refs: Optional[Callable[[], Set[str]]] = None
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and os.path.isdir(self.directory)
+
+    def put_file(self, path: str) -> str:
+        """Return the file ref for path, copying the file into the store if this content is new."""
+        stat = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            ref = known[2]
+        else:
+            ref = file_digest(path) + _ref_extension(os.path.splitext(path)[1])
+            with self._lock:
+                self._digests[path] = (stat.st_size, stat.st_mtime_ns, ref)
+
+        target = os.path.join(self.directory, ref)
+        try:
+            if os.path.getsize(target) == stat.st_size:
+                os.utime(target)
+                return ref
+        except OSError:
+            pass
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dst, open(path, "rb") as src:
+                shutil.copyfileobj(src, dst, HASH_CHUNK_BYTES)
+            os.chmod(tmp_path, BLOB_MODE)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._prune()
+        return ref
+
+    def put_bytes(self, data: bytes, extension: str = "") -> str:
+        """Return the ref for data, writing it into the store if this content is new."""
+        ref = hashlib.blake2b(data, digest_size=20).hexdigest() + _ref_extension(extension)
+        target = os.path.join(self.directory, ref)
+        try:
+            if os.path.getsize(target) == len(data):
+                os.utime(target)
+                return ref
+        except OSError:
+            pass
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                dst.write(data)
+            os.chmod(tmp_path, BLOB_MODE)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._prune()
+        return ref
+
+    def path(self, ref: str) -> str:
+        """Local path of the file behind ref; raises FileNotFoundError if it is unknown or was evicted.
+
+        Marks the file as recently used, so eviction does not pick files that are being read.
+        """
+        if not REF_PATTERN.match(ref or ""):
+            raise ValueError(f"Invalid file ref: {ref!r}")
+        path = os.path.join(self.directory, ref)
+        try:
+            os.utime(path)
+        except OSError:
+            raise FileNotFoundError(f"File ref {ref} is not in the store (it may have been evicted)")
+        return path
+
+    def working_copy(self, ref: str) -> str:
+        """Private, writable copy of the file behind ref, for tools that rewrite their input in place.
+
+        The caller owns the copy: remove it when done, or `put_file` it to store the result.
+        """
+        source = self.path(ref)
+        fd, copy_path = tempfile.mkstemp(suffix=os.path.splitext(ref)[1])
+        with os.fdopen(fd, "wb") as dst, open(source, "rb") as src:
+            shutil.copyfileobj(src, dst, HASH_CHUNK_BYTES)
+        return copy_path
+
+    def read_bytes(self, ref: str) -> bytes:
+        with open(self.path(ref), "rb") as f:
+            return f.read()
+
+    def _prune(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        live = self._live_refs()
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if os.path.basename(path) in live:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            logger.info(f"Shared store evicted {os.path.basename(path)}")
+        if total > self.max_bytes:
+            logger.warning(f"Store {self.directory} is over its limit; the remaining files are in use")
+
+    def _live_refs(self) -> Set[str]:
+        if self.live_refs is None:
+            return set()
+        try:
+            return set(self.live_refs())
+        except Exception as e:
+            # Without the live set nothing can be evicted safely
+            logger.error(f"Could not list live file refs, skipping eviction: {e}")
+            return {entry.name for entry in os.scandir(self.directory)}
+
+content_store = ContentStore(SHARED_STORE_DIR, SHARED_STORE_MAX_MB * 1024 * 1024)
+
+os.makedirs(BLOB_STORE_DIR, exist_ok=True)
+blob_store = ContentStore(BLOB_STORE_DIR, BLOB_STORE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,100 @@
+"""
+File metadata (schema and column profiles) for agent prompts.
+
+Profiles are computed by the file manager (file-manager/metadata.py), which stores them
+with every file version and indexes them by content digest. The orchestrator fetches
+them instead of profiling files itself:
+
+- Looked up by content digest (the one blob store refs are named after), so a copy of
+  any version the file manager stores is never profiled again.
+- A file the file manager has not seen (e.g. a working copy after a transformation) is
+  uploaded once for profiling. Pass the previous metadata and `changed_columns` so only
+  those columns are re-read, as long as the row count is unchanged.
+- Cached in memory per (path, size, mtime).
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.tools.file_manager_tools import FILE_MANAGER_URL
+from .content_store import file_digest
+from .http_clients import sync_client
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CACHE_ENTRIES = 256
+
+_memory_cache: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+_memory_lock = threading.Lock()
+
+def _fetch(file_path: str, previous: Optional[Dict[str, Any]], changed_columns: Optional[List[str]]) -> Dict[str, Any]:
+    """Stored metadata for the file's content, or the file manager's profile of an upload of it."""
+    client = sync_client("file_manager")
+    response = client.get(f"{FILE_MANAGER_URL}/metadata/{file_digest(file_path)}")
+    if response.status_code == 404:
+        data = {}
+        if previous and changed_columns:
+            data = {"previous": json.dumps(previous, default=str), "changed_columns": json.dumps(changed_columns)}
+        with open(file_path, "rb") as f:
+            response = client.post(f"{FILE_MANAGER_URL}/metadata",
+                                   files={"file": (os.path.basename(file_path), f)}, data=data)
+    response.raise_for_status()
+    return response.json()
+
+def extract_file_metadata(file_path: str, previous: Optional[Dict[str, Any]] = None,
+                          changed_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Schema and per-column profile of a data file, computed once per file version.
+
+    With `previous` metadata of the same file and the `changed_columns` a transformation
+    touched, only those columns are re-profiled.
+    """
+    stat = os.stat(file_path)
+    memory_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _memory_lock:
+        cached = _memory_cache.get(memory_key)
+    if cached is not None:
+        return cached
+
+    local = {"file_name": os.path.basename(file_path), "file_size": stat.st_size,
+             "format": os.path.splitext(file_path)[1].lower().lstrip(".")}
+    try:
+        metadata = _fetch(file_path, previous, changed_columns)
+    except Exception as e:
+        logger.warning(f"Could not get metadata for {file_path} from the file manager: {e}")
+        return {**local, "error": str(e)}
+    metadata.update(local)
+    with _memory_lock:
+        _memory_cache[memory_key] = metadata
+        while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+            _memory_cache.pop(next(iter(_memory_cache)))
+    return metadata
+
+def format_metadata_for_prompt(metadata: Optional[Dict[str, Any]], max_columns: int = 40) -> str:
+    """Compact text description of file metadata for an LLM prompt."""
+    if not metadata:
+        return "No file metadata available."
+    if metadata.get("error"):
+        return f"File: {metadata.get('file_name', 'unknown')} (metadata unavailable: {metadata['error']})"
+    columns = metadata.get("columns", [])
+    rows = metadata.get("rows")
+    lines = [f"File: {metadata.get('file_name', 'unknown')} ({metadata.get('format', '?')}), "
+             f"{rows} rows x {len(columns)} columns"
+             + (f" (profiled on the first {metadata.get('scanned_rows')} rows)" if metadata.get("sampled") else "")]
+    for column in columns[:max_columns]:
+        parts = [f"- {column['name']} [{column.get('dtype')}]"]
+        if column.get("nulls"):
+            parts.append(f"nulls {column['nulls']} ({column.get('null_pct')}%)")
+        parts.append(f"unique {column.get('unique')}")
+        if "mean" in column:
+            parts.append(f"min {column.get('min')}, max {column.get('max')}, mean {column.get('mean')}")
+        elif "min" in column:
+            parts.append(f"range {column.get('min')} .. {column.get('max')}")
+        elif column.get("top_values"):
+            parts.append("top " + ", ".join(f"{item['value']!s:.30} ({item['count']})" for item in column["top_values"][:3]))
+        lines.append("; ".join(parts))
+    if len(columns) > max_columns:
+        lines.append(f"... and {len(columns) - max_columns} more columns")
+    return "\n".join(lines)
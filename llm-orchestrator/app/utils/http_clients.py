@@ -0,0 +1,118 @@
+"""
+Shared HTTP clients for calls to the backend services.
+
+Tools used to open a new connection for every request (`httpx.post(...)`), and the
+synchronous calls blocked the event loop the LangGraph nodes run on. Each service now
+has one long-lived client with a keep-alive pool and its own timeouts:
+
+- `async_client(service)` for async tool implementations. Clients are bound to the
+  event loop that created them, so one is kept per loop.
+- `sync_client(service)` for the remaining synchronous callers.
+
+HTTP/2 is enabled when the `h2` package is installed. httpx negotiates it through ALPN on
+TLS connections; plain HTTP would need prior knowledge (`http1=False`), which the
+uvicorn-served backends do not speak, so those keep using HTTP/1.1 keep-alive.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Set, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.environ.get("HTTP2_ENABLED", "true").lower() == "true"
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+
+# Default read/write timeout per service; single requests can still pass their own `timeout=`
+SERVICE_TIMEOUTS = {
+    "preprocessing": float(os.environ.get("PREPROCESSING_TIMEOUT_SECONDS", "300")),
+    "code_execution": float(os.environ.get("CODE_EXECUTION_TIMEOUT_SECONDS", "300")),
+    "file_manager": float(os.environ.get("FILE_MANAGER_TIMEOUT_SECONDS", "60")),
+}
+
+_async_clients: Dict[Tuple[str, int], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+_sync_clients: Dict[str, httpx.Client] = {}
+_closing: Set[asyncio.Task] = set()
+_lock = threading.Lock()
+
+def service_timeout(service: str) -> httpx.Timeout:
+    return httpx.Timeout(SERVICE_TIMEOUTS[service], connect=HTTP_CONNECT_TIMEOUT)
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+def async_client(service: str) -> httpx.AsyncClient:
+    """The pooled async client for `service` on the running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (service, id(loop))
+    entry = _async_clients.get(key)
+    if entry is None or entry[0] is not loop or entry[1].is_closed:
+        # Close clients of loops that have since been closed (e.g. earlier asyncio.run calls)
+        for stale_key, (stale_loop, stale_client) in list(_async_clients.items()):
+            if stale_loop.is_closed() or stale_key == key:
+                _async_clients.pop(stale_key, None)
+                if not stale_client.is_closed:
+                    _close_stale(stale_loop, stale_client, loop)
+        client = httpx.AsyncClient(timeout=service_timeout(service), limits=_limits(), http2=HTTP2_ENABLED)
+        _async_clients[key] = (loop, client)
+        return client
+    return entry[1]
+
+def _close_stale(client_loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient,
+                 loop: asyncio.AbstractEventLoop) -> None:
+    """Close a client left behind by another event loop: on that loop if it still runs, else on this one."""
+    if client_loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+        return
+    task = loop.create_task(_aclose_quietly(client))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+async def _aclose_quietly(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as e:
+        # Transports of a closed loop cannot be closed through it any more; the sockets
+        # are released when the client is garbage collected
+        logger.debug(f"Could not close a client from a closed event loop: {e}")
+
+def sync_client(service: str) -> httpx.Client:
+    """The pooled synchronous client for `service`; safe to share between threads."""
+    client = _sync_clients.get(service)
+    if client is None or client.is_closed:
+        with _lock:
+            client = _sync_clients.get(service)
+            if client is None or client.is_closed:
+                client = httpx.Client(timeout=service_timeout(service), limits=_limits(), http2=HTTP2_ENABLED)
+                _sync_clients[service] = client
+    return client
+
+async def close_clients() -> None:
+    """Close the clients of the running loop and all synchronous clients."""
+    loop = asyncio.get_running_loop()
+    for key, (client_loop, client) in list(_async_clients.items()):
+        if client_loop is loop:
+            del _async_clients[key]
+            await client.aclose()
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        client.close()
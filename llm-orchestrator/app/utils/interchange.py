@@ -0,0 +1,72 @@
+"""
+Columnar interchange helpers.
+
+Working copies passed between the orchestrator, the preprocessing service, CES and
+the file manager are kept as Parquet (or Arrow IPC) so column types survive every
+hop and serialization stays cheap. A dataset is converted once when it enters the
+orchestrator (chat upload, file manager download) and the user's original format
+(CSV/Excel/JSON) is only produced again when it leaves. Conversion is delegated to
+the file manager's /convert endpoints.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+from ..tools.file_manager_tools import FILE_MANAGER_URL
+from .http_clients import sync_client
+
+logger = logging.getLogger(__name__)
+
+INTERCHANGE_FORMAT = os.environ.get("INTERCHANGE_FORMAT", "parquet").lower()
+
+INTERCHANGE_EXTENSIONS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+INTERCHANGE_MEDIA_TYPES = {
+    ".parquet": "application/vnd.apache.parquet",
+    ".arrow": "application/vnd.apache.arrow.file",
+    ".feather": "application/vnd.apache.arrow.file",
+}
+
+def is_interchange_file(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in INTERCHANGE_MEDIA_TYPES
+
+def _convert(endpoint: str, source_path: str, form: Dict[str, str], target_path: str) -> str:
+    """Have the file manager convert source_path and write the result to target_path."""
+    with open(source_path, "rb") as f:
+        response = sync_client("file_manager").post(
+            f"{FILE_MANAGER_URL.rstrip('/')}/{endpoint}",
+            files={"file": (os.path.basename(source_path), f, "application/octet-stream")},
+            data=form,
+        )
+    if response.status_code != 200:
+        raise RuntimeError(f"{endpoint} failed ({response.status_code}): {response.text}")
+    tmp_path = f"{target_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(response.content)
+    os.replace(tmp_path, target_path)
+    return target_path
+
+def to_interchange(data_path: str, interchange_format: str = INTERCHANGE_FORMAT,
+                   target_path: Optional[str] = None) -> str:
+    """Create a columnar working copy of data_path (next to it unless target_path is given) and return its path.
+
+    The conversion is done by the file manager, which owns the format handling.
+    """
+    if is_interchange_file(data_path):
+        return data_path
+    if interchange_format not in INTERCHANGE_EXTENSIONS:
+        raise ValueError(f"Unknown interchange format '{interchange_format}'. Use parquet or arrow")
+    target = target_path or os.path.splitext(data_path)[0] + INTERCHANGE_EXTENSIONS[interchange_format]
+    _convert("convert/interchange", data_path, {"interchange_format": interchange_format}, target)
+    logger.info(f"Converted {data_path} to {interchange_format} working copy {target}")
+    return target
+
+def export_to_original(working_path: str, original_path: str) -> str:
+    """Write a columnar working copy back out in the format of the user's original file."""
+    if working_path == original_path:
+        return original_path
+    return _convert("convert/export", working_path, {"target_filename": os.path.basename(original_path)}, original_path)
@@ -0,0 +1,111 @@
+"""
+Parallel subtask fan-out: dispatch_subtasks -> subtask_node -> join_subtasks.
+
+ruya_node does not emit plans in this tree yet, so these tests drive the fan-out
+directly with fake agents, running each wave the way the graph would.
+
+Run from llm-orchestrator/: python -m pytest tests
+"""
+
+import asyncio
+
+import pytest
+from langgraph.types import Send
+
+from app.graphs import nodes
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace the subtask agents with fakes; returns the (agent, task, file_ref) of every call."""
+    calls = []
+
+    def agent(name, file_ref=None):
+        async def run(state):
+            calls.append((name, state["current_subtask"], state["file_ref"]))
+            if state["current_subtask"] == "fail":
+                raise RuntimeError("boom")
+            update = {"messages": state["messages"] + [{"role": name, "content": f"{name}: {state['current_subtask']}"}]}
+            if file_ref:
+                # "echo" returns the file the branch started from, as agents that only read it do
+                update["file_ref"] = state["file_ref"] if file_ref == "echo" else file_ref
+                update["file_format"] = "parquet"
+            return update
+        return run
+
+    monkeypatch.setitem(nodes.SUBTASK_AGENTS, "preprocessing_agent", agent("preprocessing", "ref_v2"))
+    monkeypatch.setitem(nodes.SUBTASK_AGENTS, "analytics_agent", agent("analytics", "echo"))
+    monkeypatch.setitem(nodes.SUBTASK_AGENTS, "ml_agent", agent("ml"))
+    return calls
+
+
+def initial_state():
+    return {"messages": [{"role": "user", "content": "clean, profile and train"}], "file_ref": "ref_v1",
+            "file_format": "csv", "status": "RUNNING", "current_step": 0}
+
+
+PLAN = {"subtasks": [
+    {"id": "clean", "agent": "preprocessing_agent", "task": "clean"},
+    {"id": "profile", "agent": "analytics_agent", "task": "profile"},
+    {"id": "train", "agent": "ml_agent", "task": "train", "depends_on": ["clean"]},
+]}
+
+
+def run_wave(state, command):
+    """Run the branches a dispatch sends out concurrently, then join them like the graph's `join` node."""
+    async def branches():
+        return await asyncio.gather(*(nodes.subtask_node(send.arg) for send in command.goto))
+
+    results = [result for outcome in asyncio.run(branches()) for result in outcome["subtask_results"]]
+    state = {**state, **command.update, "subtask_results": results}
+    joined = nodes.join_subtasks(state)
+    return {**state, **joined.update, "subtask_results": []}, joined
+
+
+def test_dispatch_sends_ready_subtasks(calls):
+    command = nodes.dispatch_subtasks(initial_state(), PLAN)
+
+    assert [send.node for send in command.goto] == ["subtask", "subtask"]
+    assert [send.arg["subtask"]["id"] for send in command.goto] == ["clean", "profile"]
+    assert [subtask.get("status") for subtask in command.update["plan"]["subtasks"]] == ["running", "running", None]
+    assert all("plan" not in send.arg["state"] for send in command.goto)
+
+
+def test_dispatch_respects_max_parallel(calls, monkeypatch):
+    monkeypatch.setattr(nodes, "SUBTASK_MAX_PARALLEL", 1)
+
+    assert len(nodes.dispatch_subtasks(initial_state(), PLAN).goto) == 1
+
+
+def test_join_keeps_new_file_and_runs_next_wave(calls):
+    state, joined = run_wave(initial_state(), nodes.dispatch_subtasks(initial_state(), PLAN))
+
+    # profile ran after clean in plan order but only echoed ref_v1
+    assert state["file_ref"] == "ref_v2"
+    assert state["file_versions_history"] == [
+        {"version": 1, "file_ref": "ref_v2", "subtask": "clean", "agent": "preprocessing_agent"}]
+    assert [message["content"] for message in state["messages"][1:]] == ["preprocessing: clean", "analytics: profile"]
+    assert [send.arg["subtask"]["id"] for send in joined.goto] == ["train"]
+    assert joined.goto[0].arg["state"]["file_ref"] == "ref_v2"
+
+    state, joined = run_wave(state, joined)
+
+    assert joined.goto == "ruya"
+    assert [subtask["status"] for subtask in state["plan"]["subtasks"]] == ["done", "done", "done"]
+    assert ("ml", "train", "ref_v2") in calls
+
+
+def test_failed_subtask_skips_dependents(calls):
+    plan = {"subtasks": [
+        {"id": "clean", "agent": "preprocessing_agent", "task": "fail"},
+        {"id": "profile", "agent": "analytics_agent", "task": "profile"},
+        {"id": "train", "agent": "ml_agent", "task": "train", "depends_on": ["clean"]},
+    ]}
+
+    state, joined = run_wave(initial_state(), nodes.dispatch_subtasks(initial_state(), plan))
+
+    assert joined.goto == "ruya"
+    assert [subtask["status"] for subtask in state["plan"]["subtasks"]] == ["error", "done", "skipped"]
+    assert state["file_ref"] == "ref_v1"
+    assert "Subtask clean failed: boom" in state["messages"][1]["content"]
+    assert not any(name == "ml" for name, _, _ in calls)